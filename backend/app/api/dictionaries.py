@@ -2,106 +2,337 @@
 字典管理 API
 """
 
-from fastapi import APIRouter, HTTPException
-from typing import List, Dict, Any
-import json
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import List, Dict, Any, Literal, Optional
+import asyncio
+import hashlib
 import logging
+import time
 
 from app.core.config import settings
+from app.core.dictionary_cache import CachedDictionary, dictionary_cache
+from app.core.dictionary_store import (
+    DictionaryEditError,
+    DictionaryStore,
+    DuplicateTermError,
+    RevisionConflictError,
+    TermNotFoundError,
+    correction_store,
+    shielding_store
+)
+from app.core.engine_registry import engine_registry
 from app.core.stats_manager import get_overall_stats, get_top_terms
+from app.core.stats_store import stats_store
+from app.core.term_search import (
+    SEARCH_MODES,
+    MAX_EDIT_DISTANCE,
+    correction_search,
+    search_dictionaries,
+    shielding_search,
+    warm_up_search
+)
+from app.core.worker_pool import preload_snapshot
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def _rebuild_engine() -> None:
+    """建立新版本的字典快照，并让工作进程预先编译"""
+    preload_snapshot(engine_registry.rebuild())
+
+
+def _refresh_engine() -> None:
+    """字典更新后切换引擎版本，并在后台让工作进程预先编译，进行中的任务不受影响"""
+    engine_registry.invalidate()
+    loop = asyncio.get_running_loop()
+    loop.run_in_executor(None, _rebuild_engine)
+    # 同时在后台同步检索索引，编辑后的首次检索不需要等待
+    loop.run_in_executor(None, warm_up_search)
+
+
+def _is_not_modified(request: Request, etag: str, last_modified: Optional[str] = None) -> bool:
+    """按 If-None-Match（优先）或 If-Modified-Since 判断客户端缓存是否仍然有效"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def _cache_headers(etag: str, last_modified: Optional[str] = None) -> Dict[str, str]:
+    """缓存验证响应头：每次使用前都向服务端验证（no-cache），未变化时返回 304"""
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding"
+    }
+    if last_modified:
+        headers["Last-Modified"] = last_modified
+    return headers
+
+
+async def _get_cached_dictionary(path: Path, name: str) -> CachedDictionary:
+    """获取字典的缓存（文件未变化时不读取文件）"""
+    cached = await asyncio.to_thread(dictionary_cache.get, path)
+    if cached is None:
+        raise HTTPException(status_code=404, detail=f"{name}不存在")
+    return cached
+
+
+async def _dictionary_response(request: Request, path: Path, name: str) -> Response:
+    """返回完整字典：直接使用缓存的文件内容与预先压缩的内容，支持条件请求"""
+    cached = await _get_cached_dictionary(path, name)
+    headers = _cache_headers(cached.etag, cached.last_modified)
+
+    if _is_not_modified(request, cached.etag, cached.last_modified):
+        return Response(status_code=304, headers=headers)
+
+    body, encoding = cached.encoded_body(request.headers.get("accept-encoding", ""))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
 @router.get("/correction")
-async def get_correction_dictionary() -> Dict[str, Any]:
+async def get_correction_dictionary(request: Request) -> Response:
     """获取修正规则库"""
     try:
-        if settings.CORRECTION_DICT_PATH.exists():
-            with open(settings.CORRECTION_DICT_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
-            raise HTTPException(
-                status_code=404,
-                detail="修正规则库不存在"
-            )
+        return await _dictionary_response(request, settings.CORRECTION_DICT_PATH, "修正规则库")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"读取修正规则库失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/correction/terms")
+async def get_correction_terms(
+    request: Request,
+    offset: int = Query(0, ge=0, description="起始位置"),
+    limit: int = Query(50, ge=1, le=1000, description="每页条数"),
+    category: Optional[str] = Query(None, description="只返回该分类的规则")
+):
+    """分页获取修正规则"""
+    try:
+        cached = await _get_cached_dictionary(settings.CORRECTION_DICT_PATH, "修正规则库")
+
+        # 同一字典版本下相同的查询结果不变，ETag 由版本与查询参数组成
+        query_digest = hashlib.sha256(f"{offset}:{limit}:{category}".encode()).hexdigest()[:8]
+        etag = f'W/"{cached.version}-{query_digest}"'
+        headers = _cache_headers(etag)
+
+        if _is_not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+
+        categories = cached.terms_by_category()
+        if category is not None:
+            terms = categories.get(category, [])
+        else:
+            terms = cached.data.get("terms", [])
+
+        return JSONResponse(
+            {
+                "version": cached.version,
+                "total": len(terms),
+                "offset": offset,
+                "limit": limit,
+                "category": category,
+                "categories": {name: len(items) for name, items in categories.items()},
+                "terms": terms[offset:offset + limit]
+            },
+            headers=headers
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"读取修正规则失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/shielding")
-async def get_shielding_dictionary() -> Dict[str, Any]:
+async def get_shielding_dictionary(request: Request) -> Response:
     """获取保护词库"""
     try:
-        if settings.SHIELDING_DICT_PATH.exists():
-            with open(settings.SHIELDING_DICT_PATH, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        else:
-            raise HTTPException(
-                status_code=404,
-                detail="保护词库不存在"
-            )
+        return await _dictionary_response(request, settings.SHIELDING_DICT_PATH, "保护词库")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"读取保护词库失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.put("/correction")
-async def update_correction_dictionary(data: Dict[str, Any]):
-    """更新修正规则库"""
+class DictionaryOperation(BaseModel):
+    """单条修改操作"""
+    op: Literal["add", "update", "delete"]
+    key: Optional[str] = None  # 要修改或删除的条目（修正规则的 source / 保护词）
+    value: Optional[Any] = None  # 新条目：修正规则为 {source, target, category}（修改时可只含变化的字段），保护词为字符串
+
+
+class DictionaryPatch(BaseModel):
+    """增量修改请求"""
+    revision: int  # 客户端读取字典时的修订号
+    operations: List[DictionaryOperation] = Field(min_length=1)
+
+
+async def _replace_dictionary(store: DictionaryStore, data: Dict[str, Any], name: str):
+    """整体替换字典"""
     try:
-        with open(settings.CORRECTION_DICT_PATH, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        revision = await asyncio.to_thread(store.replace, data)
+    except RevisionConflictError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "revision": e.revision})
+    except Exception as e:
+        logger.error(f"更新{name}失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    _refresh_engine()
+
+    logger.info(f"{name}已更新")
+    return {"success": True, "message": f"{name}已更新", "revision": revision}
+
+
+async def _patch_dictionary(store: DictionaryStore, patch: DictionaryPatch, name: str):
+    """按条目增量修改字典"""
+    operations = [operation.model_dump() for operation in patch.operations]
+    try:
+        result = await asyncio.to_thread(store.apply, operations, patch.revision)
+    except RevisionConflictError as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "revision": e.revision})
+    except TermNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except DuplicateTermError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except DictionaryEditError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"修改{name}失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    _refresh_engine()
 
-        logger.info("修正规则库已更新")
-        return {"success": True, "message": "修正规则库已更新"}
+    return {"success": True, **result}
 
+
+async def _dictionary_changes(store: DictionaryStore, since: int, name: str):
+    """某个修订号之后的修改记录"""
+    try:
+        revision, changes = await asyncio.gather(
+            asyncio.to_thread(store.revision),
+            asyncio.to_thread(store.changes_since, since)
+        )
     except Exception as e:
-        logger.error(f"更新修正规则库失败: {str(e)}")
+        logger.error(f"读取{name}修改记录失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    if changes is None:
+        raise HTTPException(status_code=410, detail="修改记录不完整，请重新获取整个字典")
+    return {"revision": revision, "changes": changes}
+
+
+@router.put("/correction")
+async def update_correction_dictionary(data: Dict[str, Any]):
+    """更新修正规则库（整体替换）"""
+    return await _replace_dictionary(correction_store, data, "修正规则库")
+
+
+@router.patch("/correction")
+async def patch_correction_dictionary(patch: DictionaryPatch):
+    """增量修改修正规则"""
+    return await _patch_dictionary(correction_store, patch, "修正规则库")
+
+
+@router.get("/correction/changes")
+async def get_correction_changes(since: int = Query(..., ge=0, description="客户端当前的修订号")):
+    """获取修正规则库在某个修订号之后的修改记录"""
+    return await _dictionary_changes(correction_store, since, "修正规则库")
+
 
 @router.put("/shielding")
 async def update_shielding_dictionary(data: Dict[str, Any]):
-    """更新保护词库"""
-    try:
-        with open(settings.SHIELDING_DICT_PATH, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    """更新保护词库（整体替换）"""
+    return await _replace_dictionary(shielding_store, data, "保护词库")
+
+
+@router.patch("/shielding")
+async def patch_shielding_dictionary(patch: DictionaryPatch):
+    """增量修改保护词"""
+    return await _patch_dictionary(shielding_store, patch, "保护词库")
+
+
+@router.get("/shielding/changes")
+async def get_shielding_changes(since: int = Query(..., ge=0, description="客户端当前的修订号")):
+    """获取保护词库在某个修订号之后的修改记录"""
+    return await _dictionary_changes(shielding_store, since, "保护词库")
+
+
+@router.get("/search")
+async def search_dictionary_terms(
+    q: str = Query(..., min_length=1, max_length=100, description="查询文本（不区分大小写）"),
+    mode: str = Query("substring", description="匹配方式: " + " / ".join(SEARCH_MODES)),
+    dictionary: Optional[Literal["correction", "shielding"]] = Query(None, description="只检索该字典，不提供时检索全部"),
+    limit: int = Query(50, ge=1, le=500, description="最多返回的条目数"),
+    max_distance: Optional[int] = Query(None, ge=0, le=MAX_EDIT_DISTANCE, description="模糊匹配的最大编辑距离")
+):
+    """检索修正规则（source / target）与保护词"""
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"不支持的匹配方式: {mode}")
 
-        logger.info("保护词库已更新")
-        return {"success": True, "message": "保护词库已更新"}
+    query = q.strip()
+    if not query:
+        return {"query": q, "mode": mode, "total": 0, "results": []}
 
+    dictionaries = {"correction": correction_search, "shielding": shielding_search}
+    selected = [dictionaries[dictionary]] if dictionary else list(dictionaries.values())
+
+    try:
+        result = await asyncio.to_thread(search_dictionaries, query, mode, selected, limit, max_distance)
     except Exception as e:
-        logger.error(f"更新保护词库失败: {str(e)}")
+        logger.error(f"检索字典失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    return {"query": query, "mode": mode, **result}
+
 
 @router.get("/stats")
-async def get_dictionary_stats():
-    """获取字典统计信息"""
+async def get_dictionary_stats(request: Request):
+    """获取字典统计信息（按字典版本缓存，字典未修改时不读取文件）"""
     try:
-        correction_count = 0
-        shielding_count = 0
-        noise_patterns = 0
-
-        if settings.CORRECTION_DICT_PATH.exists():
-            with open(settings.CORRECTION_DICT_PATH, 'r', encoding='utf-8') as f:
-                correction_data = json.load(f)
-                correction_count = len(correction_data.get('terms', []))
-                noise_patterns = len(correction_data.get('noise_patterns', []))
+        correction, shielding = await asyncio.gather(
+            asyncio.to_thread(dictionary_cache.get, settings.CORRECTION_DICT_PATH),
+            asyncio.to_thread(dictionary_cache.get, settings.SHIELDING_DICT_PATH)
+        )
+        correction_stats = correction.stats() if correction is not None else {}
+        shielding_stats = shielding.stats() if shielding is not None else {}
 
-        if settings.SHIELDING_DICT_PATH.exists():
-            with open(settings.SHIELDING_DICT_PATH, 'r', encoding='utf-8') as f:
-                shielding_data = json.load(f)
-                shielding_count = len(shielding_data.get('protected_words', []))
+        etag = f'"{correction_stats.get("version", "")}-{shielding_stats.get("version", "")}"'
+        headers = _cache_headers(etag)
+        if _is_not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
 
-        return {
-            "correction_terms": correction_count,
-            "protected_words": shielding_count,
-            "noise_patterns": noise_patterns
-        }
+        return JSONResponse(
+            content={
+                "correction_terms": correction_stats.get("terms", 0),
+                "protected_words": shielding_stats.get("protected_words", 0),
+                "noise_patterns": correction_stats.get("noise_patterns", 0),
+                "categories": correction_stats.get("categories", {}),
+                "correction_version": correction_stats.get("version"),
+                "shielding_version": shielding_stats.get("version")
+            },
+            headers=headers
+        )
 
     except Exception as e:
         logger.error(f"获取字典统计失败: {str(e)}")
@@ -109,19 +340,39 @@ async def get_dictionary_stats():
 
 
 @router.get("/historical-stats")
-async def get_historical_stats():
+async def get_historical_stats(
+    days: Optional[int] = Query(None, ge=1, le=3650, description="只统计最近 N 天，不提供时为全部历史")
+):
     """获取历史累计统计信息（包含高频替换词排行）"""
     try:
-        return get_overall_stats()
+        if days is None:
+            return get_overall_stats()
+
+        since = time.time() - days * 86400
+        totals, top_terms = await asyncio.gather(
+            asyncio.to_thread(stats_store.totals, since),
+            asyncio.to_thread(stats_store.top_terms, since, None, 10)
+        )
+        return {**totals, "days": days, "top_terms": top_terms}
     except Exception as e:
         logger.error(f"获取历史统计失败: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/top-terms")
-async def get_top_replacement_terms(limit: int = 10):
+async def get_top_replacement_terms(
+    limit: int = Query(10, ge=1, le=10000, description="返回前 N 个"),
+    days: Optional[int] = Query(None, ge=1, le=3650, description="只统计最近 N 天，不提供时为全部历史")
+):
     """获取高频替换词排行"""
     try:
+        if days is not None:
+            since = time.time() - days * 86400
+            return {
+                "days": days,
+                "top_terms": await asyncio.to_thread(stats_store.top_terms, since, None, limit)
+            }
+
         return {
             "top_terms": get_top_terms(limit)
         }
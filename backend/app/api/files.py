@@ -2,17 +2,125 @@
 文件管理 API
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from typing import Any, Callable, Coroutine, Dict, List, Tuple
+import asyncio
+import hashlib
 import logging
 import uuid
 from pathlib import Path
 
+import aiofiles
+import aiofiles.os
+
 from app.core.config import settings
+from app.core.result_cache import save_file_digest
 
-router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# 上传文件分块读写的大小
+_UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class _UploadLimitRoute(APIRoute):
+    """
+    在解析请求体之前限制上传请求的大小
+
+    UploadFile 参数在调用端点之前就已由 Starlette 把整个 multipart 请求体读入临时文件，
+    端点内的大小检查只能在读完之后生效。因此在解析之前：
+    - Content-Length 超过 MAX_UPLOAD_REQUEST_SIZE 时不读取请求体，直接返回 413；
+    - 未声明大小（分块传输）或声明的大小与实际不符时，边接收边计数，超过上限即中止
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request) -> Response:
+            limit = settings.MAX_UPLOAD_REQUEST_SIZE
+            content_length = request.headers.get('content-length', '')
+            if content_length.isdigit() and int(content_length) > limit:
+                raise _request_too_large()
+
+            receive = request.receive
+            received = 0
+
+            async def limited_receive() -> Dict[str, Any]:
+                nonlocal received
+                message = await receive()
+                if message['type'] == 'http.request':
+                    received += len(message.get('body', b''))
+                    if received > limit:
+                        raise _request_too_large()
+                return message
+
+            return await handler(Request(request.scope, limited_receive))
+
+        return limited_handler
+
+
+router = APIRouter(route_class=_UploadLimitRoute)
+
+
+async def _save_upload(file: UploadFile, file_path: Path) -> Tuple[int, str]:
+    """
+    分块流式保存上传文件，同时计算 SHA-256
+
+    文件已由 Starlette 接收到临时文件（请求大小的上限见 _UploadLimitRoute），
+    这里按单个文件的 MAX_UPLOAD_SIZE 检查：超过时停止写入并删除已写入的部分
+
+    Args:
+        file: 上传的文件
+        file_path: 保存路径
+
+    Returns:
+        (文件大小, SHA-256 十六进制摘要)
+    """
+    # multipart 解析时已得到文件大小，无需再读取即可拒绝
+    if file.size is not None and file.size > settings.MAX_UPLOAD_SIZE:
+        raise _too_large(file.filename)
+
+    size = 0
+    digest = hashlib.sha256()
+
+    try:
+        async with aiofiles.open(file_path, 'wb') as f:
+            while True:
+                chunk = await file.read(_UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+
+                size += len(chunk)
+                if size > settings.MAX_UPLOAD_SIZE:
+                    raise _too_large(file.filename)
+
+                digest.update(chunk)
+                await f.write(chunk)
+
+    except BaseException:
+        # 删除不完整的文件
+        if await aiofiles.os.path.exists(file_path):
+            await aiofiles.os.remove(file_path)
+        raise
+
+    return size, digest.hexdigest()
+
+
+def _too_large(filename: str) -> HTTPException:
+    limit_mb = settings.MAX_UPLOAD_SIZE / (1024 * 1024)
+    return HTTPException(
+        status_code=413,
+        detail=f"文件过大: {filename}（上限 {limit_mb:g} MB）"
+    )
+
+
+def _request_too_large() -> HTTPException:
+    limit_mb = settings.MAX_UPLOAD_REQUEST_SIZE / (1024 * 1024)
+    return HTTPException(
+        status_code=413,
+        detail=f"上传内容过大（单次上传上限 {limit_mb:g} MB）"
+    )
+
 
 @router.post("/upload")
 async def upload_files(files: List[UploadFile] = File(...)):
@@ -35,18 +143,17 @@ async def upload_files(files: List[UploadFile] = File(...)):
         # 生成唯一文件ID
         file_id = str(uuid.uuid4())
 
-        # 读取文件内容
-        content = await file.read()
-
-        # 保存文件到磁盘
+        # 分块写入磁盘
         file_path = settings.UPLOADS_DIR / f"{file_id}.srt"
-        with open(file_path, 'wb') as f:
-            f.write(content)
+        size, sha256 = await _save_upload(file, file_path)
+        # 保存摘要，处理时查找结果缓存无需重新读取文件
+        await asyncio.to_thread(save_file_digest, file_path, sha256)
 
         uploaded_files.append({
             "file_id": file_id,
             "filename": file.filename,
-            "size": len(content),
+            "size": size,
+            "sha256": sha256,
             "path": str(file_path)
         })
 
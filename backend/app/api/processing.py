@@ -2,25 +2,46 @@
 字幕处理 API
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import logging
 import uuid
 import asyncio
 import shutil
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from datetime import datetime
 
 from app.core.config import settings
-from app.core.processor import create_default_processor
+from app.core.diff_store import read_diff_page
+from app.core.engine_registry import engine_registry
+from app.core.result_cache import cache_key, link_or_copy, result_cache, stored_file_digest
+from app.core.scheduler import JobScheduler, QueueFullError
+from app.core.task_store import task_store
+from app.core.worker_pool import (
+    get_process_pool,
+    process_file_job,
+    process_large_file,
+    run_job,
+    shutdown_process_pool
+)
 from app.core.stats_manager import record_replacements
+from app.core.stats_store import stats_store
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# 存储任务状态的字典
-tasks: Dict[str, Dict[str, Any]] = {}
+# 任务调度器：限制并发任务数、排队长度与单个任务的运行时间
+scheduler = JobScheduler(
+    max_concurrent=settings.MAX_CONCURRENT_TASKS,
+    max_queued=settings.MAX_QUEUED_TASKS,
+    timeout=settings.TASK_TIMEOUT,
+    cost_weight=settings.TASK_COST_WEIGHT
+)
+
+# 只在分页获取差异数据时使用、不随 /result 返回的字段
+_DIFF_FIELDS = ("diff_path", "diff_rules")
 
 
 class FileInfo(BaseModel):
@@ -48,90 +69,184 @@ class ProcessResponse(BaseModel):
 async def process_files_task(task_id: str, file_infos: List[Dict[str, str]], options: ProcessRequest):
     """后台处理文件任务
 
+    文件处理在进程池中并行执行，事件循环只负责调度和汇总结果
+
     Args:
         task_id: 任务ID
         file_infos: 文件信息列表 [{"file_id": "...", "filename": "..."}]
         options: 处理选项
     """
+    pin = None
     try:
         logger.info(f"任务 {task_id}: 开始处理 {len(file_infos)} 个文件")
 
-        # 更新任务状态
-        tasks[task_id]["status"] = "processing"
-        tasks[task_id]["total_files"] = len(file_infos)
+        # 固定本任务使用的字典版本，字典在处理期间更新也不影响本任务；
+        # 任务结束前快照不会被清理
+        snapshot, pin = await asyncio.to_thread(engine_registry.acquire)
+
+        # 更新任务状态（数据库读写都在线程中执行，不阻塞事件循环）
+        await asyncio.to_thread(
+            task_store.update,
+            task_id,
+            status="processing",
+            total_files=len(file_infos),
+            dictionary_version=snapshot.version
+        )
+
+        # 处理结果缓存键中的选项；处理代码的版本也计入，升级后不使用旧结果
+        cache_options = {
+            "app_version": settings.APP_VERSION,
+            **options.model_dump(include={"use_correction", "use_shielding", "use_noise_removal"})
+        }
 
-        # 创建处理器
-        processor = create_default_processor()
+        # 获取进程池（工作进程内缓存已编译的字典）
+        pool = await asyncio.to_thread(get_process_pool)
 
-        # 确保处理输出目录和备份目录存在
-        settings.PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
+        # 确保处理输出目录和备份目录存在；处理结果保存在任务自己的目录中，
+        # 同一文件再次处理时不覆盖此前任务的结果（差异数据与任务保存的规则表一一对应）
+        output_dir = task_store.output_dir(task_id)
+        output_dir.mkdir(parents=True, exist_ok=True)
         settings.BACKUP_DIR.mkdir(parents=True, exist_ok=True)
 
-        processed_files = []
-        total_stats = {
-            "total_replacements": 0,
-            "term_corrections": 0,
-            "noise_removals": 0,
-            "replacement_details": []
-        }
+        completed = 0
+
+        async def process_one(file_info: Dict[str, str]) -> Optional[Dict[str, Any]]:
+            """处理单个文件，失败时返回 None"""
+            nonlocal completed
 
-        for idx, file_info in enumerate(file_infos):
             file_id = file_info["file_id"]
             original_filename = file_info.get("filename", f"{file_id}.srt")
             try:
-                # 读取原始文件
                 input_path = settings.UPLOADS_DIR / f"{file_id}.srt"
 
                 if not input_path.exists():
                     logger.error(f"文件不存在: {input_path}")
-                    continue
-
-                with open(input_path, 'r', encoding='utf-8') as f:
-                    srt_content = f.read()
+                    return None
 
                 # 备份原始文件
                 backup_filename = f"{file_id}_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.srt"
                 backup_path = settings.BACKUP_DIR / backup_filename
-                shutil.copy(input_path, backup_path)
+                await asyncio.to_thread(shutil.copy, input_path, backup_path)
                 logger.info(f"已备份原始文件: {backup_path}")
 
-                # 处理文件
-                modified_content, report = processor.process_file(srt_content)
-
-                # 保存处理后的文件
-                output_path = settings.PROCESSED_DIR / f"{file_id}_processed.srt"
-                with open(output_path, 'w', encoding='utf-8') as f:
-                    f.write(modified_content)
-
-                # 累计统计信息
-                stats = report.get('replacement_stats', {})
-                total_stats["total_replacements"] += stats.get("total_replacements", 0)
-                total_stats["term_corrections"] += stats.get("term_corrections", 0)
-                total_stats["noise_removals"] += stats.get("noise_removals", 0)
-                total_stats["replacement_details"].extend(stats.get("top_replacements", []))
+                output_path = output_dir / f"{file_id}_processed.srt"
+                diff_path = output_dir / f"{file_id}_diff.jsonl"
+
+                # 相同内容的文件在同一字典版本下处理过时直接使用缓存的结果
+                digest = await asyncio.to_thread(stored_file_digest, input_path)
+                key = cache_key(digest, snapshot.version, cache_options)
+                report = await asyncio.to_thread(result_cache.get, key, output_path, diff_path)
+                cached = report is not None
+
+                if not cached:
+                    # 规则命中索引：字典修改后重新处理同一文件时只处理受影响的条目
+                    index_path = settings.PROCESSED_DIR / f"{file_id}_index.json"
+                    index_meta = {
+                        "version": snapshot.version,
+                        "input_digest": digest,
+                        "options": cache_options
+                    }
+
+                    job_args = (
+                        str(input_path),
+                        str(output_path),
+                        str(diff_path),
+                        snapshot.correction_path,
+                        snapshot.shielding_path,
+                        str(index_path) if settings.RECORD_TERM_INDEX else None,
+                        index_meta
+                    )
+
+                    # 任务超时被取消时，运行中的作业结束后才退出（见 run_job）
+                    if input_path.stat().st_size >= settings.PARALLEL_FILE_MIN_SIZE:
+                        # 大文件: 线程中只查找切分位置，各分块的解析、处理与合并都在工作进程中执行
+                        report = await process_large_file(pool, *job_args)
+                    else:
+                        # 在工作进程中处理并保存文件
+                        report = await run_job(pool, process_file_job, *job_args)
+
+                    await asyncio.to_thread(result_cache.put, key, output_path, diff_path, report)
+
+                # 按 file_id 下载时使用该文件最近一次的处理结果
+                await asyncio.to_thread(
+                    link_or_copy, output_path, settings.PROCESSED_DIR / f"{file_id}_processed.srt"
+                )
 
-                # 记录到历史统计
-                if stats.get("top_replacements"):
-                    record_replacements(stats.get("top_replacements", []))
-
-                processed_files.append({
+                # 更新进度
+                completed += 1
+                await asyncio.to_thread(
+                    task_store.update,
+                    task_id,
+                    processed_files=completed,
+                    progress=int(completed / len(file_infos) * 100)
+                )
+
+                logger.info(
+                    f"任务 {task_id}: 完成文件 {completed}/{len(file_infos)}"
+                    + ("（使用缓存结果）" if cached else "")
+                )
+
+                return {
                     "file_id": file_id,
                     "filename": original_filename,  # 保存原始文件名
                     "input_path": str(input_path),
                     "output_path": str(output_path),
-                    "statistics": stats,
-                    "diff_data": report.get('diff_data', [])
-                })
-
-                # 更新进度
-                tasks[task_id]["processed_files"] = idx + 1
-                tasks[task_id]["progress"] = int((idx + 1) / len(file_infos) * 100)
-
-                logger.info(f"任务 {task_id}: 完成文件 {idx + 1}/{len(file_infos)}")
+                    "diff_path": str(diff_path),
+                    "diff_rules": report.get('diff_rules', []),
+                    "srt_stats": report.get('srt_stats', {}),
+                    "statistics": report.get('replacement_stats', {}),
+                    "replacement_details": report.get('replacement_details', []),
+                    # 使用缓存结果时本次没有处理任何条目
+                    "entry_memo": None if cached else report.get('entry_memo'),
+                    "cached": cached,
+                    # 增量处理时重新处理的条目数
+                    "incremental": None if cached else report.get('incremental')
+                }
+
+            except BrokenProcessPool as e:
+                # 工作进程异常退出，重置进程池以便后续任务重新创建
+                logger.error(f"处理文件 {file_id} 时进程池损坏: {str(e)}")
+                shutdown_process_pool(wait=False)
+                return None
 
             except Exception as e:
                 logger.error(f"处理文件 {file_id} 时出错: {str(e)}", exc_info=True)
-                continue
+                return None
+
+        # 并行处理，结果保持提交顺序
+        results = await asyncio.gather(*(process_one(file_info) for file_info in file_infos))
+        processed_files = [result for result in results if result is not None]
+
+        total_stats = {
+            "total_replacements": 0,
+            "term_corrections": 0,
+            "noise_removals": 0,
+            "replacement_details": []
+        }
+
+        memo_hits = 0
+        memo_misses = 0
+        files_details = []
+        for file_result in processed_files:
+            entry_memo = file_result.pop("entry_memo") or {}
+            memo_hits += entry_memo.get("hits", 0)
+            memo_misses += entry_memo.get("misses", 0)
+
+            # 累计统计信息
+            stats = file_result["statistics"]
+            total_stats["total_replacements"] += stats.get("total_replacements", 0)
+            total_stats["term_corrections"] += stats.get("term_corrections", 0)
+            total_stats["noise_removals"] += stats.get("noise_removals", 0)
+            total_stats["replacement_details"].extend(stats.get("top_replacements", []))
+
+            # 记录到历史统计（全部规则的次数，不只是前 10 名）
+            details = file_result.pop("replacement_details")
+            files_details.append(details)
+            if details:
+                record_replacements(details)
+
+        if files_details:
+            await asyncio.to_thread(stats_store.record_files, files_details)
 
         # 获取最高频替换词（前10个）
         replacement_details = total_stats["replacement_details"]
@@ -148,22 +263,54 @@ async def process_files_task(task_id: str, file_infos: List[Dict[str, str]], opt
         )[:10]
 
         # 更新最终任务状态
-        tasks[task_id]["status"] = "completed"
-        tasks[task_id]["progress"] = 100
-        tasks[task_id]["files"] = processed_files
-        tasks[task_id]["statistics"] = {
-            "total_replacements": total_stats["total_replacements"],
-            "term_corrections": total_stats["term_corrections"],
-            "noise_removals": total_stats["noise_removals"],
-            "top_replacements": top_replacements
-        }
+        # 处理结果写入磁盘，任务状态与汇总统计写入数据库
+        await asyncio.to_thread(
+            task_store.complete,
+            task_id,
+            processed_files,
+            {
+                "total_replacements": total_stats["total_replacements"],
+                "term_corrections": total_stats["term_corrections"],
+                "noise_removals": total_stats["noise_removals"],
+                "top_replacements": top_replacements,
+                "entry_memo": {
+                    "hits": memo_hits,
+                    "misses": memo_misses,
+                    "hit_rate": memo_hits / (memo_hits + memo_misses) if memo_hits + memo_misses else 0.0
+                }
+            }
+        )
 
         logger.info(f"任务 {task_id}: 全部完成，共处理 {len(processed_files)} 个文件")
 
     except Exception as e:
         logger.error(f"任务 {task_id} 失败: {str(e)}", exc_info=True)
-        tasks[task_id]["status"] = "failed"
-        tasks[task_id]["error"] = str(e)
+        await asyncio.to_thread(task_store.update, task_id, status="failed", error=str(e))
+
+    finally:
+        if pin is not None:
+            engine_registry.release(pin)
+
+
+def _task_cost(file_infos: List[Dict[str, str]]) -> float:
+    """任务开销：输入文件总大小（MB）"""
+    total = 0
+    for file_info in file_infos:
+        try:
+            total += (settings.UPLOADS_DIR / f"{file_info['file_id']}.srt").stat().st_size
+        except OSError:
+            continue
+    return total / (1024 * 1024)
+
+
+async def _mark_timeout(task_id: str) -> None:
+    """任务超时后标记为失败"""
+    await asyncio.to_thread(
+        task_store.update,
+        task_id,
+        status="failed",
+        error=f"处理超时（超过 {settings.TASK_TIMEOUT} 秒）"
+    )
 
 
 @router.post("/start", response_model=ProcessResponse)
@@ -190,18 +337,31 @@ async def start_processing(request: ProcessRequest):
     task_id = str(uuid.uuid4())
 
     # 初始化任务状态
-    tasks[task_id] = {
-        "task_id": task_id,
-        "status": "pending",
-        "progress": 0,
-        "processed_files": 0,
-        "total_files": len(file_infos),
-        "files": [],
-        "statistics": {}
-    }
+    await asyncio.to_thread(task_store.create, task_id, total_files=len(file_infos))
 
-    # 在后台启动处理任务
-    asyncio.create_task(process_files_task(task_id, file_infos, request))
+    # 提交到调度器，超过并发上限时排队等待
+    try:
+        position = scheduler.submit(
+            task_id,
+            lambda: process_files_task(task_id, file_infos, request),
+            cost=_task_cost(file_infos),
+            on_timeout=lambda: _mark_timeout(task_id)
+        )
+    except QueueFullError as e:
+        await asyncio.to_thread(task_store.delete, task_id)
+        raise HTTPException(status_code=429, detail=f"{e}，请稍后重试")
+
+    if position:
+        # 排序键写入数据库，状态查询落到其他 worker 时也能得到排队位置
+        queue_key = scheduler.queue_key(task_id)
+        if queue_key is not None:
+            await asyncio.to_thread(task_store.set_queue_key, task_id, *queue_key)
+
+        return ProcessResponse(
+            task_id=task_id,
+            status="pending",
+            message=f"已加入队列，前面还有 {position - 1} 个任务"
+        )
 
     return ProcessResponse(
         task_id=task_id,
@@ -210,40 +370,146 @@ async def start_processing(request: ProcessRequest):
     )
 
 
+@router.get("/cache")
+async def get_result_cache_stats():
+    """处理结果缓存的命中统计"""
+    return await asyncio.to_thread(result_cache.stats)
+
+
+@router.delete("/cache")
+async def clear_result_cache():
+    """清空处理结果缓存"""
+    await asyncio.to_thread(result_cache.clear)
+    return {"message": "处理结果缓存已清空"}
+
+
 @router.get("/status/{task_id}")
 async def get_processing_status(task_id: str):
     """获取处理任务状态"""
-    if task_id not in tasks:
+    # 轮询状态不刷新访问时间，只读不写
+    task = await asyncio.to_thread(task_store.get, task_id)
+    if task is None:
         raise HTTPException(status_code=404, detail="任务不存在")
 
-    task = tasks[task_id]
+    # 调度器只在提交任务的进程中，排队位置按数据库中的排序键计算，多个 worker 时同样可用
+    queue_position = None
+    if task["status"] == "pending":
+        queue_position = await asyncio.to_thread(task_store.queue_position, task_id)
+
     return {
         "task_id": task_id,
         "status": task["status"],
         "progress": task["progress"],
         "processed_files": task["processed_files"],
-        "total_files": task["total_files"]
+        "total_files": task["total_files"],
+        "queue_position": queue_position,
+        "error": task.get("error")
     }
 
 
-@router.get("/result/{task_id}")
-async def get_processing_result(task_id: str):
-    """获取处理结果"""
-    if task_id not in tasks:
+async def _get_completed_task(task_id: str) -> Dict[str, Any]:
+    """获取已完成的任务（刷新最近访问时间），不存在或未完成时抛出 HTTP 异常"""
+    task = await asyncio.to_thread(task_store.get, task_id, touch=True)
+    if task is None:
         raise HTTPException(status_code=404, detail="任务不存在")
 
-    task = tasks[task_id]
-
     if task["status"] != "completed":
         raise HTTPException(status_code=400, detail="任务尚未完成")
 
+    return task
+
+
+@router.get("/result/{task_id}")
+async def get_processing_result(task_id: str):
+    """
+    获取处理结果
+    只返回各文件的摘要，逐条差异数据通过 /result/{task_id}/files/{file_id}/diff 分页获取
+    """
+    task = await _get_completed_task(task_id)
+    files = await asyncio.to_thread(task_store.load_files, task_id)
+
     return {
         "task_id": task_id,
-        "files": task["files"],
+        "files": [
+            {key: value for key, value in file_info.items() if key not in _DIFF_FIELDS}
+            for file_info in files
+        ],
         "statistics": task["statistics"]
     }
 
 
+@router.get("/result/{task_id}/files/{file_id}/diff")
+async def get_file_diff(
+    task_id: str,
+    file_id: str,
+    cursor: int = Query(0, ge=0, description="上一页返回的 next_cursor"),
+    limit: int = Query(100, ge=1, le=1000, description="每页条数"),
+    changed_only: bool = Query(False, description="只返回被修改的字幕")
+):
+    """
+    分页获取单个文件的差异数据
+
+    修改过的字幕以原文 + 编辑操作表示，操作中的规则为 rules 的键；
+    连续未修改的字幕合并为一个引用区间
+    """
+    await _get_completed_task(task_id)
+    files = await asyncio.to_thread(task_store.load_files, task_id)
+
+    file_info = next((f for f in files if f.get("file_id") == file_id), None)
+    if file_info is None:
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    diff_path = file_info.get("diff_path")
+    if not diff_path or not Path(diff_path).exists():
+        raise HTTPException(status_code=404, detail="差异数据不存在")
+
+    try:
+        entries, next_cursor = await asyncio.to_thread(
+            read_diff_page, diff_path, cursor, limit, changed_only
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 只返回本页引用到的规则
+    diff_rules = file_info.get("diff_rules", [])
+    rule_ids = {
+        op[3] for entry in entries for op in entry.get("ops", ())
+        if op[3] is not None
+    }
+
+    return {
+        "task_id": task_id,
+        "file_id": file_id,
+        "entries": entries,
+        "rules": {str(rule_id): diff_rules[rule_id] for rule_id in sorted(rule_ids)},
+        "next_cursor": next_cursor,
+        "srt_stats": file_info.get("srt_stats", {})
+    }
+
+
+@router.get("/result/{task_id}/files/{file_id}/download")
+async def download_task_file(task_id: str, file_id: str):
+    """下载某个任务中单个文件的处理结果（同一文件之后再次处理不影响该任务的结果）"""
+    from fastapi.responses import FileResponse
+
+    await _get_completed_task(task_id)
+    files = await asyncio.to_thread(task_store.load_files, task_id)
+
+    file_info = next((f for f in files if f.get("file_id") == file_id), None)
+    if file_info is None:
+        raise HTTPException(status_code=404, detail="文件不存在")
+
+    output_path = Path(file_info.get("output_path", ""))
+    if not output_path.is_file():
+        raise HTTPException(status_code=404, detail="处理结果不存在")
+
+    return FileResponse(
+        path=output_path,
+        filename=file_info.get("filename", output_path.name),
+        media_type="text/plain"
+    )
+
+
 @router.get("/download/{file_id}")
 async def download_processed_file(file_id: str):
     """下载处理后的文件"""
@@ -304,19 +570,14 @@ async def download_task_zip(task_id: str):
     import io
     from fastapi.responses import StreamingResponse
 
-    if task_id not in tasks:
-        raise HTTPException(status_code=404, detail="任务不存在")
-
-    task = tasks[task_id]
-
-    if task["status"] != "completed":
-        raise HTTPException(status_code=400, detail="任务尚未完成")
+    await _get_completed_task(task_id)
+    files = await asyncio.to_thread(task_store.load_files, task_id)
 
     # 创建内存中的 ZIP 文件
     zip_buffer = io.BytesIO()
 
     with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for file_info in task.get("files", []):
+        for file_info in files:
             output_path = Path(file_info.get("output_path", ""))
 
             if output_path.exists():
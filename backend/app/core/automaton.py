@@ -0,0 +1,324 @@
+"""
+多模式字符串匹配自动机 (Aho-Corasick)
+一次从左到右扫描即可找出文本中出现的全部关键词；
+关键词增删时可在上一版本的自动机上增量更新，只重新计算受影响节点的失败指针与输出
+"""
+
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+# 已删除的关键词槽位数超过存活的关键词数时，不再增量更新而是重新构建
+_MAX_TOMBSTONE_RATIO = 1.0
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick 自动机（区分大小写，纯 Python 实现）
+
+    字典树中的每个关键词占一个槽位，输出保存的是槽位号；匹配结果通过槽位 -> 下标的映射
+    换算为关键词在 patterns 中的下标。增量更新（updated）时未变化的关键词保留原槽位，
+    只需为新版本生成新的映射；删除的关键词留在字典树中，映射为 -1（墓碑）。
+    更新得到的是新的自动机，修改的节点先复制，上一版本的自动机保持不变
+    """
+
+    def __init__(self, patterns: Sequence[str]):
+        """
+        构建自动机
+
+        Args:
+            patterns: 关键词列表，匹配结果以其下标表示；空字符串会被忽略
+        """
+        self.patterns = list(patterns)
+
+        # 节点 0 为根节点
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._depth: List[int] = [0]
+        # 失败指针的反向树：节点 -> 失败指针指向它的节点（指向根节点的不记录）
+        self._fail_children: Dict[int, Tuple[int, ...]] = {}
+
+        # 槽位 -> 关键词，槽位 -> 下标（-1 为已删除）；新构建的自动机槽位即下标
+        self._slots: List[str] = list(self.patterns)
+        self._ids: Optional[List[int]] = None
+
+        self.max_length = 0
+
+        for pattern_id, pattern in enumerate(self.patterns):
+            if pattern:
+                self._insert(pattern, pattern_id)
+                self.max_length = max(self.max_length, len(pattern))
+
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def updated(self, patterns: Sequence[str]) -> "AhoCorasick":
+        """
+        按新的关键词列表得到新的自动机，复用本自动机的字典树
+
+        保留的关键词（按内容对应，下标可以变化）沿用原槽位；新增的关键词插入字典树，
+        只重新计算受影响节点的失败指针与输出；删除的关键词标记为墓碑。
+        墓碑过多时重新构建
+
+        Args:
+            patterns: 新版本的关键词列表
+
+        Returns:
+            新的自动机（本自动机不变）
+        """
+        free: Dict[str, List[int]] = {}
+        for slot, pattern in enumerate(self._slots):
+            if pattern:
+                free.setdefault(pattern, []).append(slot)
+
+        ids = [-1] * len(self._slots)
+        added: List[Tuple[str, int]] = []
+        live = 0
+        for pattern_id, pattern in enumerate(patterns):
+            if not pattern:
+                continue
+            live += 1
+            slots = free.get(pattern)
+            if slots:
+                ids[slots.pop()] = pattern_id
+            else:
+                added.append((pattern, pattern_id))
+
+        tombstones = len(ids) - (live - len(added))
+        if tombstones > _MAX_TOMBSTONE_RATIO * max(live, 1):
+            return AhoCorasick(patterns)
+
+        automaton = object.__new__(AhoCorasick)
+        automaton.patterns = list(patterns)
+        automaton.max_length = max((len(pattern) for pattern in automaton.patterns), default=0)
+        automaton._ids = ids
+
+        if not added:
+            # 没有新增的关键词：字典树、失败指针与输出都不变，共享即可
+            automaton._goto = self._goto
+            automaton._fail = self._fail
+            automaton._out = self._out
+            automaton._depth = self._depth
+            automaton._fail_children = self._fail_children
+            automaton._slots = self._slots
+            return automaton
+
+        automaton._goto = list(self._goto)
+        automaton._fail = list(self._fail)
+        automaton._out = list(self._out)
+        automaton._depth = list(self._depth)
+        automaton._fail_children = dict(self._fail_children)
+        automaton._slots = list(self._slots)
+        automaton._extend(self, added)
+        return automaton
+
+    def _insert(self, pattern: str, pattern_id: int) -> None:
+        """向字典树插入一个关键词"""
+        node = 0
+        for ch in pattern:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._depth.append(self._depth[node] + 1)
+            node = next_node
+
+        self._out[node] = self._out[node] + (pattern_id,)
+
+    def _build_failure_links(self) -> None:
+        """广度优先构建失败指针，并合并后缀节点的输出"""
+        queue = deque(self._goto[0].values())
+        fail_children: Dict[int, List[int]] = {}
+
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(ch, 0)
+
+                self._fail[child] = fail
+                if fail:
+                    fail_children.setdefault(fail, []).append(child)
+                if self._out[fail]:
+                    self._out[child] = self._out[child] + self._out[fail]
+
+        self._fail_children = {node: tuple(children) for node, children in fail_children.items()}
+
+    def _extend(self, base: "AhoCorasick", added: List[Tuple[str, int]]) -> None:
+        """
+        在从 base 复制的结构上插入新增的关键词（修改的节点先复制，不影响 base）
+
+        需要重新计算的只有：
+        - 新节点的失败指针与输出；
+        - 以新节点对应的字符串为后缀的原有节点（及其在字典树中的子树）的失败指针；
+        - 失败指针或自身输出变化的节点，以及失败链经过它们的节点的输出
+        """
+        goto, fail, out, depth = self._goto, self._fail, self._out, self._depth
+        base_size = len(goto)
+        copied: Set[int] = set()
+        new_parents: Dict[int, Tuple[int, str]] = {}
+        added_output: Dict[int, Tuple[int, ...]] = {}
+
+        for pattern, pattern_id in added:
+            slot = len(self._slots)
+            self._slots.append(pattern)
+            self._ids.append(pattern_id)
+
+            node = 0
+            for ch in pattern:
+                next_node = goto[node].get(ch)
+                if next_node is None:
+                    if node < base_size and node not in copied:
+                        goto[node] = dict(goto[node])
+                        copied.add(node)
+                    next_node = len(goto)
+                    goto[node][ch] = next_node
+                    goto.append({})
+                    fail.append(0)
+                    out.append(())
+                    depth.append(depth[node] + 1)
+                    new_parents[next_node] = (node, ch)
+                node = next_node
+            added_output[node] = added_output.get(node, ()) + (slot,)
+
+        # 失败指针可能变化的原有节点：其字符串以某个新节点的字符串为后缀。
+        # 这样的节点必然位于某个"原有父节点 p + 字符 c"的新节点之下：其祖先中有以 p 为后缀
+        # （位于 p 的失败指针反向树中）且经 c 到达的原有节点
+        relinked: Dict[int, Tuple[int, str]] = dict(new_parents)
+        for node, (parent, ch) in new_parents.items():
+            if parent >= base_size:
+                continue
+            sources = range(1, base_size) if parent == 0 else base._fail_subtree(parent)
+            for source in sources:
+                child = goto[source].get(ch)
+                if child is not None and child < base_size and child not in relinked:
+                    relinked[child] = (source, ch)
+                    stack = [child]
+                    while stack:
+                        current = stack.pop()
+                        for next_ch, next_node in goto[current].items():
+                            if next_node not in relinked:
+                                relinked[next_node] = (current, next_ch)
+                                stack.append(next_node)
+
+        # 按深度顺序计算，父节点与更短的后缀先完成
+        for node in sorted(relinked, key=depth.__getitem__):
+            parent, ch = relinked[node]
+            link = fail[parent] if parent else 0
+            while link and ch not in goto[link]:
+                link = fail[link]
+            link = goto[link].get(ch, 0) if parent else 0
+            if link == node:
+                link = 0
+
+            old_link = fail[node] if node < base_size else 0
+            if link != old_link:
+                if old_link:
+                    self._fail_children[old_link] = tuple(
+                        child for child in self._fail_children[old_link] if child != node
+                    )
+                if link:
+                    self._fail_children[link] = self._fail_children.get(link, ()) + (node,)
+            fail[node] = link
+
+        # 输出 = 自身的输出 + 失败指针所指节点的输出；原有节点自身的输出从 base 中取出
+        changed = set(relinked) | set(added_output)
+        pending = list(changed)
+        while pending:
+            for child in self._fail_children.get(pending.pop(), ()):
+                if child not in changed:
+                    changed.add(child)
+                    pending.append(child)
+
+        for node in sorted(changed, key=depth.__getitem__):
+            own = added_output.get(node, ())
+            if node < base_size:
+                inherited = len(base._out[base._fail[node]]) if node else 0
+                own = base._out[node][:len(base._out[node]) - inherited] + own
+            out[node] = own + out[fail[node]] if node else own
+
+    def _fail_subtree(self, node: int) -> List[int]:
+        """失败链经过 node 的全部节点（含 node 本身）"""
+        nodes = [node]
+        for current in nodes:
+            nodes.extend(self._fail_children.get(current, ()))
+        return nodes
+
+    def iter_matches(
+        self,
+        text: str,
+        start: int = 0,
+        end: int = None
+    ) -> Iterator[Tuple[int, int]]:
+        """
+        扫描文本，产出全部（可重叠的）匹配
+
+        Args:
+            text: 待扫描文本
+            start: 扫描起始位置
+            end: 扫描结束位置（不含）
+
+        Yields:
+            (匹配起始位置, 关键词下标)
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        slots = self._slots
+        ids = self._ids
+
+        if end is None:
+            end = len(text)
+
+        node = 0
+        for pos in range(start, end):
+            ch = text[pos]
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+
+            for slot in out[node]:
+                pattern_id = slot if ids is None else ids[slot]
+                if pattern_id >= 0:
+                    yield pos + 1 - len(slots[slot]), pattern_id
+
+    def matched_ids(self, text: str, start: int = 0, end: int = None) -> Set[int]:
+        """
+        返回在文本中出现过的关键词下标集合
+
+        Args:
+            text: 待扫描文本
+            start: 扫描起始位置
+            end: 扫描结束位置（不含）
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+
+        found: Set[int] = set()
+        node = 0
+        for ch in text[start:end]:
+            next_node = goto[node].get(ch)
+            while next_node is None and node:
+                node = fail[node]
+                next_node = goto[node].get(ch)
+            node = next_node or 0
+
+            if out[node]:
+                found.update(out[node])
+
+        if self._ids is not None and found:
+            ids = self._ids
+            found = {ids[slot] for slot in found}
+            found.discard(-1)
+
+        return found
@@ -0,0 +1,151 @@
+"""
+双语标注检测器
+识别 "target(source)" 形式的双语标注（如 "阈值(Threshold)"），避免被替换为 "阈值(阈值)"
+"""
+
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 支持中英文括号: () 和 （）
+_OPEN_BRACKET_PATTERN = re.compile(r'[（(]')
+_CLOSE_BRACKET_PATTERN = re.compile(r'[)）]')
+
+
+class BilingualIndex:
+    """
+    双语标注索引
+
+    字典加载时按 source 建立哈希索引；检测时只扫描文本中的括号，
+    对每一对括号取出括号内文本查表，再核对括号前是否紧跟对应的 target，
+    因此开销与括号数量相关，而与字典规模无关
+
+    与 AhoCorasick 相同，索引中保存的是 (source, target) 的槽位号，
+    通过槽位 -> 优先级的映射换算；规则增删时 updated 只修改涉及的 source
+    """
+
+    def __init__(self, pairs: Sequence[Tuple[str, str]]):
+        """
+        建立索引
+
+        Args:
+            pairs: 按优先级排列的 (source, target) 列表，下标即优先级；
+                   source 或 target 为空的项会被忽略
+        """
+        self._targets: Dict[str, Tuple[Tuple[int, str], ...]] = {}
+        self._slots: List[Tuple[str, str]] = list(pairs)
+        # 槽位 -> 优先级（-1 为已删除）；新建立的索引槽位即优先级
+        self._ranks: Optional[List[int]] = None
+        self.max_source_length = 0
+
+        targets: Dict[str, List[Tuple[int, str]]] = {}
+        for rank, (source, target) in enumerate(self._slots):
+            if not source or not target:
+                continue
+            targets.setdefault(source, []).append((rank, target))
+            self.max_source_length = max(self.max_source_length, len(source))
+        self._targets = {source: tuple(items) for source, items in targets.items()}
+
+    def __len__(self) -> int:
+        if self._ranks is None:
+            return sum(len(targets) for targets in self._targets.values())
+        return sum(
+            1 for targets in self._targets.values()
+            for slot, _ in targets if self._ranks[slot] >= 0
+        )
+
+    def updated(self, pairs: Sequence[Tuple[str, str]]) -> "BilingualIndex":
+        """
+        按新的 (source, target) 列表得到新的索引（本索引不变）
+
+        保留的项沿用原槽位，新增的项加入对应 source 的列表，删除的项标记为墓碑；
+        墓碑多于保留的项时重新建立
+        """
+        free: Dict[Tuple[str, str], List[int]] = {}
+        for slot, pair in enumerate(self._slots):
+            if pair[0] and pair[1]:
+                free.setdefault(pair, []).append(slot)
+
+        ranks = [-1] * len(self._slots)
+        added: List[Tuple[Tuple[str, str], int]] = []
+        live = 0
+        for rank, pair in enumerate(pairs):
+            if not pair[0] or not pair[1]:
+                continue
+            live += 1
+            slots = free.get(pair)
+            if slots:
+                ranks[slots.pop()] = rank
+            else:
+                added.append((pair, rank))
+
+        if len(ranks) - (live - len(added)) > max(live, 1):
+            return BilingualIndex(pairs)
+
+        index = object.__new__(BilingualIndex)
+        index._slots = self._slots
+        index._targets = self._targets
+        index._ranks = ranks
+        index.max_source_length = max(
+            (len(source) for source, target in pairs if source and target), default=0
+        )
+        if added:
+            index._slots = list(self._slots)
+            index._targets = dict(self._targets)
+            for (source, target), rank in added:
+                slot = len(index._slots)
+                index._slots.append((source, target))
+                ranks.append(rank)
+                index._targets[source] = index._targets.get(source, ()) + ((slot, target),)
+        return index
+
+    def find(self, text: str) -> List[Tuple[int, int]]:
+        """
+        查找文本中的双语标注
+
+        与按优先级逐条匹配 target + 括号 + source + 括号 的结果一致：
+        高优先级规则先占用区间，低优先级规则的匹配不能与之重叠
+
+        Args:
+            text: 待检测文本
+
+        Returns:
+            按起始位置排序、互不重叠的 (起始位置, 结束位置) 列表
+        """
+        if not self._targets:
+            return []
+
+        opens = [m.start() for m in _OPEN_BRACKET_PATTERN.finditer(text)]
+        if not opens:
+            return []
+        closes = [m.start() for m in _CLOSE_BRACKET_PATTERN.finditer(text)]
+        ranks = self._ranks
+
+        candidates = []
+        for open_pos in opens:
+            for close_pos in closes:
+                if close_pos <= open_pos:
+                    continue
+                if close_pos - open_pos - 1 > self.max_source_length:
+                    break
+
+                targets = self._targets.get(text[open_pos + 1:close_pos])
+                if not targets:
+                    continue
+
+                for slot, target in targets:
+                    rank = slot if ranks is None else ranks[slot]
+                    if rank < 0:
+                        continue
+                    start = open_pos - len(target)
+                    if start >= 0 and text.startswith(target, start):
+                        candidates.append((rank, start, close_pos + 1))
+
+        # 按优先级、再按位置依次占用区间
+        candidates.sort()
+        accepted: List[Tuple[int, int]] = []
+        for _, start, end in candidates:
+            if all(end <= s or start >= e for s, e in accepted):
+                accepted.append((start, end))
+
+        accepted.sort()
+        return accepted
@@ -36,6 +36,7 @@ class Settings(BaseSettings):
 
     # 文件配置
     MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024  # 100MB
+    MAX_UPLOAD_REQUEST_SIZE: int = 500 * 1024 * 1024  # 单次上传请求（可含多个文件）的大小上限
     ALLOWED_EXTENSIONS: List[str] = [".srt"]
 
     # 路径配置
@@ -44,10 +45,28 @@ class Settings(BaseSettings):
     UPLOADS_DIR: Path = BASE_DIR / "uploads"
     PROCESSED_DIR: Path = BASE_DIR / "processed"
     BACKUP_DIR: Path = BASE_DIR / "backups"  # 源文件备份目录
+    CACHE_DIR: Path = BASE_DIR / "cache"  # 字典快照等缓存目录
+    TASK_DB_PATH: Path = BASE_DIR / "tasks.db"  # 任务状态数据库
+    TASK_RESULTS_DIR: Path = BASE_DIR / "results"  # 任务处理结果目录
+    STATS_DB_PATH: Path = BASE_DIR / "stats.db"  # 分时段替换统计数据库
+    DICTIONARY_JOURNAL_DIR: Path = BASE_DIR / "journal"  # 字典修改日志目录
+    RESULT_CACHE_DIR: Path = CACHE_DIR / "results"  # 处理结果缓存目录
 
     # 处理配置
     MAX_CONCURRENT_TASKS: int = 5
     TASK_TIMEOUT: int = 300  # 5分钟
+    MAX_QUEUED_TASKS: int = 50  # 等待队列长度上限，队列满时拒绝新任务
+    TASK_COST_WEIGHT: float = 10.0  # 每 MB 输入推迟的调度截止时间（秒），使小任务优先
+    TASK_TTL: int = 7 * 24 * 3600  # 已结束任务的保留时间（秒，按最近访问计）
+    MAX_STORED_TASKS: int = 200  # 最多保留的已结束任务数，超出时淘汰最久未访问的
+    PROCESS_POOL_SIZE: int = 0  # 处理进程数，0 表示取 MAX_CONCURRENT_TASKS 与 CPU 核数的较小值
+    PARALLEL_FILE_MIN_SIZE: int = 2 * 1024 * 1024  # 超过此大小的文件拆分为多个分块并行处理
+    PARALLEL_CHUNK_MIN_ENTRIES: int = 2000  # 每个分块的最少字幕条数
+    STATS_FLUSH_INTERVAL: int = 30  # 累计替换统计写入文件的间隔（秒）
+    STATS_HOURLY_RETENTION_DAYS: int = 30  # 按小时的替换统计保留天数（按天的统计永久保留）
+    RESULT_CACHE_MAX_BYTES: int = 500 * 1024 * 1024  # 处理结果缓存的总大小上限，超出时淘汰最久未使用的
+    ENTRY_MEMO_SIZE: int = 20000  # 每个字典版本记忆的字幕条目数（重复条目不再处理），0 表示不使用
+    RECORD_TERM_INDEX: bool = True  # 记录每条字幕命中的规则，字典修改后重新处理同一文件时只处理受影响的条目
 
     # 字典文件路径
     CORRECTION_DICT_PATH: Path = DICTIONARIES_DIR / "Correction.json"
@@ -0,0 +1,160 @@
+"""
+字典缓存 - 按文件版本缓存字典的解析结果、序列化内容与压缩内容
+文件未变化时（修改时间与大小相同）直接返回缓存，不再读取和解析字典文件；
+版本号为文件内容的哈希，用作 HTTP 缓存验证的 ETag
+"""
+
+import gzip
+import hashlib
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import json
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只提供 gzip 压缩
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 修正规则未设置分类时的默认分类
+DEFAULT_CATEGORY = '术语映射'
+
+
+@dataclass
+class CachedDictionary:
+    """某一版本字典文件的缓存"""
+    version: str
+    # 文件修改时间（HTTP 日期格式）
+    last_modified: str
+    data: Dict[str, Any]
+    # 文件原始内容（即 JSON 响应体）
+    body: bytes
+    # 预先压缩的响应体 {编码: 内容}
+    encoded: Dict[str, bytes] = field(default_factory=dict)
+    # 修正规则按分类的索引 {分类: [规则]}（首次使用时建立）
+    _categories: Optional[Dict[str, List[Dict[str, Any]]]] = None
+    # 字典的统计信息（首次使用时计算）
+    _stats: Optional[Dict[str, Any]] = None
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+    def terms_by_category(self) -> Dict[str, List[Dict[str, Any]]]:
+        """修正规则按分类分组（保持原顺序）"""
+        if self._categories is None:
+            categories: Dict[str, List[Dict[str, Any]]] = {}
+            for term in self.data.get('terms', []):
+                categories.setdefault(term.get('category') or DEFAULT_CATEGORY, []).append(term)
+            self._categories = categories
+        return self._categories
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        字典的统计信息，同一版本只计算一次
+
+        Returns:
+            {"version", "revision", "terms", "categories": {分类: 规则数},
+             "noise_patterns", "protected_words"}
+        """
+        if self._stats is None:
+            self._stats = {
+                'version': self.version,
+                'revision': self.data.get('revision', 0),
+                'terms': len(self.data.get('terms', [])),
+                'categories': {
+                    category: len(terms)
+                    for category, terms in self.terms_by_category().items()
+                },
+                'noise_patterns': len(self.data.get('noise_patterns', [])),
+                'protected_words': len(self.data.get('protected_words', []))
+            }
+        return self._stats
+
+    def encoded_body(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """
+        按客户端支持的编码选择响应体
+
+        Returns:
+            (响应体, Content-Encoding)，不压缩时编码为 None
+        """
+        accepted = {
+            item.split(';', 1)[0].strip().lower()
+            for item in accept_encoding.split(',')
+        }
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in self.encoded:
+                return self.encoded[encoding], encoding
+        return self.body, None
+
+
+class DictionaryCache:
+    """字典文件缓存，每个文件只保留当前版本"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {文件路径: (文件签名, 缓存)}
+        self._entries: Dict[Path, Tuple[Tuple[int, int], CachedDictionary]] = {}
+
+    def get(self, path: Path) -> Optional[CachedDictionary]:
+        """
+        获取字典文件当前版本的缓存
+
+        Returns:
+            缓存，文件不存在时返回 None
+
+        Raises:
+            ValueError: 文件内容不是合法的 JSON
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+
+        cached = self._load(path, stat.st_mtime)
+        with self._lock:
+            self._entries[path] = (signature, cached)
+        return cached
+
+    def invalidate(self, path: Path) -> None:
+        """丢弃文件的缓存（文件被改写后调用）"""
+        with self._lock:
+            self._entries.pop(path, None)
+
+    @staticmethod
+    def _load(path: Path, mtime: float) -> CachedDictionary:
+        """读取并解析字典文件，预先压缩响应体"""
+        with open(path, 'rb') as f:
+            body = f.read()
+
+        data = json.loads(body)
+
+        encoded = {'gzip': gzip.compress(body, compresslevel=6)}
+        if brotli is not None:
+            encoded['br'] = brotli.compress(body)
+
+        cached = CachedDictionary(
+            version=hashlib.sha256(body).hexdigest()[:16],
+            last_modified=formatdate(mtime, usegmt=True),
+            data=data,
+            body=body,
+            encoded=encoded
+        )
+        logger.info(f"已缓存字典 {path.name}，版本: {cached.version}")
+        return cached
+
+
+# 全局字典缓存实例
+dictionary_cache = DictionaryCache()
@@ -0,0 +1,274 @@
+"""
+字典存储 - 以单条规则为单位修改字典文件
+每次修改使字典的修订号加一，修改时需提供客户端读取时的修订号，不一致则拒绝（乐观并发控制）；
+字典先写临时文件再改名，每次修改追加一条记录到只追加的修改日志，客户端可按修订号增量同步
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import settings
+from .dictionary_cache import DEFAULT_CATEGORY, dictionary_cache
+from .file_lock import FileLock
+
+logger = logging.getLogger(__name__)
+
+
+class RevisionConflictError(Exception):
+    """客户端的修订号与字典当前的修订号不一致"""
+
+    def __init__(self, revision: int):
+        super().__init__(f"字典已被修改，当前修订号为 {revision}")
+        self.revision = revision
+
+
+class DictionaryEditError(ValueError):
+    """无效的修改操作"""
+
+
+class TermNotFoundError(DictionaryEditError):
+    """要修改或删除的规则不存在"""
+
+
+class DuplicateTermError(DictionaryEditError):
+    """规则已存在"""
+
+
+class DictionaryStore(ABC):
+    """
+    某个字典文件的版本化读写
+
+    字典条目按键（修正规则的 source、保护词本身）定位；一次提交的多个操作要么全部生效，
+    要么全部不生效。修订号保存在字典文件的 revision 字段（没有时为 0）
+    """
+
+    # 条目列表所在的字段
+    items_field = ''
+
+    def __init__(self, path: Path, journal_path: Path):
+        self.path = path
+        self.journal_path = journal_path
+        self._lock = threading.Lock()
+
+    def revision(self) -> int:
+        """字典当前的修订号"""
+        return self._read().get('revision', 0)
+
+    def apply(self, operations: List[Dict[str, Any]], revision: int) -> Dict[str, Any]:
+        """
+        执行一组修改操作
+
+        Args:
+            operations: [{"op": "add" | "update" | "delete", "key": 条目的键, "value": 新条目}]
+            revision: 客户端读取字典时的修订号
+
+        Returns:
+            {"revision": 新修订号, "operations": 规范化后的操作（value 为完整的新条目）}
+
+        Raises:
+            RevisionConflictError: 修订号不一致
+            DictionaryEditError: 操作无效（规则不存在、重复等）
+        """
+        with self._lock, FileLock(self.journal_path.with_suffix('.lock')):
+            data = self._read()
+            current = data.get('revision', 0)
+            if revision != current:
+                raise RevisionConflictError(current)
+
+            items = list(data.get(self.items_field, []))
+            positions: Dict[str, int] = {}
+            for i, item in enumerate(items):
+                positions.setdefault(self._key(item), i)
+
+            applied = [self._apply_one(items, positions, operation) for operation in operations]
+
+            new_revision = current + 1
+            self._write({
+                **data,
+                self.items_field: [item for item in items if item is not None],
+                'revision': new_revision
+            })
+            self._append_journal({
+                'revision': new_revision,
+                'time': time.time(),
+                'operations': applied
+            })
+
+        logger.info(f"{self.path.name} 已修改 {len(applied)} 条，修订号: {new_revision}")
+        return {'revision': new_revision, 'operations': applied}
+
+    def replace(self, data: Dict[str, Any]) -> int:
+        """
+        整体替换字典内容
+
+        data 中带有 revision 时按修订号检查冲突（不带时直接覆盖，兼容旧客户端）
+
+        Returns:
+            新修订号
+        """
+        with self._lock, FileLock(self.journal_path.with_suffix('.lock')):
+            current = self._read().get('revision', 0)
+            if 'revision' in data and data['revision'] != current:
+                raise RevisionConflictError(current)
+
+            new_revision = current + 1
+            self._write({**data, 'revision': new_revision})
+            self._append_journal({'revision': new_revision, 'time': time.time(), 'replace': True})
+
+        return new_revision
+
+    def changes_since(self, revision: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        某个修订号之后的全部修改记录
+
+        Returns:
+            按修订号排列的修改记录；其间有整体替换或日志缺失时返回 None，
+            客户端需要重新读取整个字典
+        """
+        current = self.revision()
+        if revision > current:
+            return None
+
+        entries = []
+        if self.journal_path.exists():
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    if entry['revision'] > revision:
+                        entries.append(entry)
+
+        expected = list(range(revision + 1, current + 1))
+        if [entry['revision'] for entry in entries] != expected:
+            return None
+        if any(entry.get('replace') for entry in entries):
+            return None
+        return entries
+
+    def _apply_one(
+        self,
+        items: List[Any],
+        positions: Dict[str, int],
+        operation: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """在条目列表上执行一个操作（删除的条目置为 None），返回规范化后的操作"""
+        op = operation.get('op')
+        key = operation.get('key')
+        value = operation.get('value')
+
+        if op == 'add':
+            item = self._build_item(value, None)
+            key = self._key(item)
+            if key in positions:
+                raise DuplicateTermError(f"'{key}' 已存在")
+            positions[key] = len(items)
+            items.append(item)
+            return {'op': op, 'key': key, 'value': item}
+
+        if key not in positions:
+            raise TermNotFoundError(f"'{key}' 不存在")
+        position = positions[key]
+
+        if op == 'delete':
+            items[position] = None
+            del positions[key]
+            return {'op': op, 'key': key, 'value': None}
+
+        if op == 'update':
+            item = self._build_item(value, items[position])
+            new_key = self._key(item)
+            if new_key != key:
+                if new_key in positions:
+                    raise DuplicateTermError(f"'{new_key}' 已存在")
+                del positions[key]
+                positions[new_key] = position
+            items[position] = item
+            return {'op': op, 'key': key, 'value': item}
+
+        raise DictionaryEditError(f"不支持的操作: {op}")
+
+    @abstractmethod
+    def _key(self, item: Any) -> str:
+        """条目的键"""
+
+    @abstractmethod
+    def _build_item(self, value: Any, old: Any) -> Any:
+        """由操作的 value 生成新条目（old 为被修改的条目，新增时为 None）"""
+
+    def _read(self) -> Dict[str, Any]:
+        """读取字典（文件未变化时使用缓存，返回的数据不能修改）"""
+        cached = dictionary_cache.get(self.path)
+        return cached.data if cached is not None else {}
+
+    def _write(self, data: Dict[str, Any]) -> None:
+        """先写临时文件再改名，读取方不会看到写了一半的字典"""
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+        dictionary_cache.invalidate(self.path)
+
+    def _append_journal(self, entry: Dict[str, Any]) -> None:
+        """追加一条修改记录（字典已写入，日志写入失败只影响增量同步）"""
+        try:
+            self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.journal_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except OSError as e:
+            logger.error(f"写入字典修改日志失败: {e}")
+
+
+class CorrectionStore(DictionaryStore):
+    """修正规则库，条目为 {"source", "target", "category"}，按 source 定位"""
+
+    items_field = 'terms'
+
+    def _key(self, item: Dict[str, Any]) -> str:
+        return item.get('source', '')
+
+    def _build_item(self, value: Any, old: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if not isinstance(value, dict):
+            raise DictionaryEditError("修正规则必须是对象")
+
+        # 修改时只需提供变化的字段
+        item = {**(old or {'target': '', 'category': DEFAULT_CATEGORY}), **value}
+        if not isinstance(item.get('source'), str) or not item['source']:
+            raise DictionaryEditError("修正规则的 source 不能为空")
+        if not isinstance(item.get('target'), str) or not isinstance(item.get('category'), str):
+            raise DictionaryEditError("修正规则的 target 与 category 必须是字符串")
+        return item
+
+
+class ShieldingStore(DictionaryStore):
+    """保护词库，条目为字符串或 {"word", "category"}，按词定位"""
+
+    items_field = 'protected_words'
+
+    def _key(self, item: Any) -> str:
+        return item.get('word', '') if isinstance(item, dict) else item
+
+    def _build_item(self, value: Any, old: Any) -> Any:
+        word = value.get('word') if isinstance(value, dict) else value
+        if not isinstance(word, str) or not word.strip():
+            raise DictionaryEditError("保护词不能为空")
+
+        if isinstance(value, dict):
+            return {**old, **value} if isinstance(old, dict) else value
+        # 修改 {"word", "category"} 格式的条目时保留其他字段
+        return {**old, 'word': word.strip()} if isinstance(old, dict) else word.strip()
+
+
+# 全局字典存储实例
+correction_store = CorrectionStore(
+    settings.CORRECTION_DICT_PATH,
+    settings.DICTIONARY_JOURNAL_DIR / "correction.jsonl"
+)
+shielding_store = ShieldingStore(
+    settings.SHIELDING_DICT_PATH,
+    settings.DICTIONARY_JOURNAL_DIR / "shielding.jsonl"
+)
@@ -0,0 +1,165 @@
+"""
+差异数据存储 - 处理时逐条写入 JSON Lines 文件，查询时按游标分页读取
+游标为文件内的字节偏移，翻页只需定位到偏移处继续读取，与文件大小无关
+
+每行为一个条目，格式紧凑：
+- 修改过的字幕: {"type": "changed", "index", "time", "original", "ops"}，
+  ops 为原文上的编辑操作 [起点, 终点, 替换文本, 规则表下标]（见 edit_script）
+- 连续未修改的字幕只保存引用: {"type": "unchanged", "first", "last", "count"}
+"""
+
+import json
+from typing import Any, Dict, IO, Iterable, List, Optional, Tuple
+
+
+def compact_diff_items(items: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    把连续未修改的条目合并为引用区间
+
+    Args:
+        items: 单条字幕的差异数据，未修改的条目为 {"type": "unchanged", "index": 序号}
+
+    Returns:
+        紧凑格式的差异数据
+    """
+    compacted: List[Dict[str, Any]] = []
+    for item in items:
+        if item['type'] != 'unchanged':
+            compacted.append(item)
+            continue
+
+        last = compacted[-1] if compacted else None
+        if last is not None and last['type'] == 'unchanged':
+            _extend_run(last, item)
+        else:
+            compacted.append(_extend_run(None, item))
+
+    return compacted
+
+
+def _extend_run(run: Optional[Dict[str, Any]], item: Dict[str, Any]) -> Dict[str, Any]:
+    """把未修改的条目（或区间）并入区间，run 为 None 时新建区间"""
+    first = item.get('first', item.get('index'))
+    last = item.get('last', item.get('index'))
+    count = item.get('count', 1)
+
+    if run is None:
+        return {'type': 'unchanged', 'first': first, 'last': last, 'count': count}
+
+    run['last'] = last
+    run['count'] += count
+    return run
+
+
+class DiffWriter:
+    """
+    逐条写出差异数据
+
+    连续未修改的条目合并为一行引用区间；编辑操作中的规则替换为规则表下标，
+    规则表（rules）随处理报告保存，不重复写入每一行
+    """
+
+    def __init__(self, output: IO[str]):
+        self.output = output
+        self.rules: List[Dict[str, str]] = []
+        self.count = 0
+        self._rule_ids: Dict[Tuple, int] = {}
+        self._run: Optional[Dict[str, Any]] = None
+
+    def write(self, item: Dict[str, Any]) -> None:
+        """写出一条差异数据（单条字幕或已合并的区间）"""
+        if item['type'] == 'unchanged':
+            self._run = _extend_run(self._run, item)
+            return
+
+        self.flush()
+        item = dict(item)
+        item['ops'] = [
+            [start, end, replacement, self._rule_id(rule)]
+            for start, end, replacement, rule in item['ops']
+        ]
+        self._emit(item)
+
+    def flush(self) -> None:
+        """写出尚未结束的未修改区间"""
+        if self._run is not None:
+            self._emit(self._run)
+            self._run = None
+
+    def _rule_id(self, rule: Optional[Dict[str, str]]) -> Optional[int]:
+        if rule is None:
+            return None
+
+        key = tuple(sorted(rule.items()))
+        rule_id = self._rule_ids.get(key)
+        if rule_id is None:
+            rule_id = self._rule_ids[key] = len(self.rules)
+            self.rules.append(rule)
+        return rule_id
+
+    def _emit(self, item: Dict[str, Any]) -> None:
+        self.output.write(json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+        self.output.write('\n')
+        self.count += 1
+
+
+def read_diff_page(
+    path: str,
+    cursor: int = 0,
+    limit: int = 100,
+    changed_only: bool = False
+) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+    """
+    从游标处读取一页差异数据
+
+    Args:
+        path: 差异数据文件路径
+        cursor: 起始字节偏移（上一页返回的 next_cursor）
+        limit: 每页条数（未修改区间计为一条）
+        changed_only: 只返回被修改的条目
+
+    Returns:
+        (差异数据列表, 下一页游标)，没有更多数据时游标为 None
+
+    Raises:
+        ValueError: 游标不是文件内某一行的起点
+    """
+    entries: List[Dict[str, Any]] = []
+
+    with open(path, 'rb') as f:
+        _seek_line_start(f, cursor)
+
+        while len(entries) < limit:
+            line = f.readline()
+            if not line:
+                return entries, None
+
+            item = json.loads(line)
+            if changed_only and item.get('type') != 'changed':
+                continue
+            entries.append(item)
+
+        next_cursor = f.tell()
+
+        # 确认后面还有符合条件的数据，避免返回指向末尾的游标
+        while True:
+            line = f.readline()
+            if not line:
+                return entries, None
+            if not changed_only or json.loads(line).get('type') == 'changed':
+                return entries, next_cursor
+            next_cursor = f.tell()
+
+
+def _seek_line_start(f: IO[bytes], cursor: int) -> None:
+    """定位到游标处；游标来自客户端，必须是文件内某一行的起点"""
+    size = f.seek(0, 2)
+    if cursor < 0 or cursor > size:
+        raise ValueError(f"无效的游标: {cursor}")
+
+    if cursor > 0:
+        f.seek(cursor - 1)
+        if f.read(1) != b'\n':
+            raise ValueError(f"无效的游标: {cursor}")
+
+    f.seek(cursor)
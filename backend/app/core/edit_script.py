@@ -0,0 +1,188 @@
+"""
+编辑脚本 - 以区间编辑操作描述单条字幕的修改
+只保存原文与若干 [起点, 终点, 替换文本, 规则] 操作，修改后的文本由原文应用操作得到；
+每个操作尽量标注引起该修改的规则（修正规则 source→target 或噪音模式）
+"""
+
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+from .rule_plan import RulePlan
+
+# 编辑操作 [起点, 终点, 替换文本, 规则]，区间为原文中的字符下标
+EditOp = List[Any]
+
+# 差异块 (原文起点, 原文终点, 新文本起点, 新文本终点)
+_Block = Tuple[int, int, int, int]
+
+
+def build_edit_ops(
+    original: str,
+    modified: str,
+    plan: Optional[RulePlan] = None
+) -> List[EditOp]:
+    """
+    计算把原文变为修改后文本的编辑操作
+
+    字符级差异块与原文中修正规则 source 的匹配区间合并，
+    使一次术语替换对应一个完整的操作（而不是若干零散的字符修改）；
+    先去掉相同的前缀与后缀，只对中间的修改区域做差异比较与规则扫描
+
+    Args:
+        original: 原文
+        modified: 修改后的文本
+        plan: 规则执行计划，用于扩展操作区间并标注规则；为 None 时规则均为 None
+
+    Returns:
+        按起点排列、互不重叠的编辑操作列表
+    """
+    if original == modified:
+        return []
+
+    prefix, suffix = _common_affix_lengths(original, modified)
+
+    matcher = SequenceMatcher(
+        None,
+        original[prefix:len(original) - suffix],
+        modified[prefix:len(modified) - suffix],
+        autojunk=False
+    )
+    blocks = [
+        (i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != 'equal'
+    ]
+
+    matches = _term_matches(original, plan, blocks) if plan is not None else []
+
+    ops = []
+    for start, end, group in _merge_spans(blocks, matches):
+        first, last = group[0], group[-1]
+        new_start = first[2] - (first[0] - start)
+        new_end = last[3] + (end - last[1])
+        replacement = modified[new_start:new_end]
+
+        rule = None
+        if plan is not None:
+            rule = _identify_rule(original[start:end], replacement, start, end, matches, plan)
+        ops.append([start, end, replacement, rule])
+
+    return ops
+
+
+def apply_edit_ops(original: str, ops: List[EditOp]) -> str:
+    """由原文与编辑操作还原修改后的文本"""
+    parts = []
+    last = 0
+    for start, end, replacement, _ in ops:
+        parts.append(original[last:start])
+        parts.append(replacement)
+        last = end
+    parts.append(original[last:])
+    return ''.join(parts)
+
+
+def _common_affix_lengths(a: str, b: str) -> Tuple[int, int]:
+    """两个字符串相同前缀与相同后缀的长度（两者不重叠）"""
+    limit = min(len(a), len(b))
+
+    prefix = 0
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+
+    suffix = 0
+    limit -= prefix
+    while suffix < limit and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+
+    return prefix, suffix
+
+
+def _term_matches(
+    original: str,
+    plan: RulePlan,
+    blocks: List[_Block]
+) -> List[Tuple[int, int, int]]:
+    """原文中与差异块相交的修正规则匹配 (起点, 终点, 优先级下标)"""
+    # 与差异块相交的匹配都落在差异区域前后各扩展 (最长 source - 1) 的范围内
+    margin = max(plan.max_source_length - 1, 0)
+    scan_start = max(blocks[0][0] - margin, 0)
+    scan_end = min(blocks[-1][1] + margin, len(original))
+
+    terms = plan.terms
+    matches = []
+    for start, rank in plan.automaton.iter_matches(original, scan_start, scan_end):
+        end = start + len(terms[rank].source)
+        if any(_overlaps(start, end, i1, i2) for i1, i2, _, _ in blocks):
+            matches.append((start, end, rank))
+    return matches
+
+
+def _overlaps(start: int, end: int, i1: int, i2: int) -> bool:
+    """区间 [start, end) 与差异块 [i1, i2) 相交（纯插入块视为位于 i1 处）"""
+    if i1 == i2:
+        return start < i1 < end
+    return start < i2 and i1 < end
+
+
+def _merge_spans(
+    blocks: List[_Block],
+    matches: List[Tuple[int, int, int]]
+) -> List[Tuple[int, int, List[_Block]]]:
+    """
+    合并差异块与规则匹配区间
+
+    Returns:
+        [(原文起点, 原文终点, 区间内的差异块)]，每个区间至少包含一个差异块
+    """
+    spans = sorted(
+        [(block[0], block[1], block) for block in blocks]
+        + [(start, end, None) for start, end, _ in matches],
+        key=lambda span: span[:2]
+    )
+
+    merged: List[Tuple[int, int, List[_Block]]] = []
+    for start, end, block in spans:
+        if merged and start < merged[-1][1]:
+            last_start, last_end, group = merged[-1]
+            merged[-1] = (last_start, max(last_end, end), group)
+        else:
+            merged.append((start, end, []))
+        if block is not None:
+            merged[-1][2].append(block)
+
+    return [span for span in merged if span[2]]
+
+
+def _identify_rule(
+    removed: str,
+    inserted: str,
+    start: int,
+    end: int,
+    matches: List[Tuple[int, int, int]],
+    plan: RulePlan
+) -> Optional[Dict[str, str]]:
+    """
+    找出引起该操作的规则
+
+    优先取区间内 target 出现在替换文本中的修正规则（按优先级），
+    其次取区间内任一修正规则；没有修正规则时按删除的文本匹配噪音模式；
+    仅删除空白的操作来自空白清理，不标注规则
+    """
+    terms = [
+        plan.terms[rank]
+        for match_start, match_end, rank in sorted(matches, key=lambda m: m[2])
+        if start <= match_start and match_end <= end
+    ]
+    for term in terms:
+        if term.target in inserted:
+            return {'source': term.source, 'target': term.target}
+    if terms:
+        return {'source': terms[0].source, 'target': terms[0].target}
+
+    if removed.strip():
+        for noise in plan.noise_patterns:
+            if noise.regex.search(removed):
+                return {'noise': noise.pattern}
+
+    return None
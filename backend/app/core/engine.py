@@ -4,13 +4,48 @@
 """
 
 import re
-import uuid
+import bisect
+import heapq
+import string
 import logging
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Optional, Set, Tuple, Any
 from dataclasses import dataclass
 
+from .entry_memo import EntryMemo, MemoEntry
+from .rule_plan import RulePlan, compile_rule_plan, is_english_word
+
 logger = logging.getLogger(__name__)
 
+# 英文边界判定字符集，与正则 [a-zA-Z0-9] 一致
+_ASCII_ALNUM = frozenset(string.ascii_letters + string.digits)
+
+# 占位符由 Unicode 私用区字符组成（起止标记 + 按出现顺序的编号），
+# 字典中的修正规则与噪音模式不会匹配到占位符，也不会替换其中的编号
+_SHIELD_OPEN, _SHIELD_CLOSE = '\ue000', '\ue001'
+_BILINGUAL_OPEN, _BILINGUAL_CLOSE = '\ue002', '\ue003'
+_PLACEHOLDER_DIGITS = str.maketrans('0123456789', ''.join(chr(0xE010 + i) for i in range(10)))
+
+# 保护词占位符
+_SHIELD_PLACEHOLDER_PATTERN = re.compile('\ue000[\ue010-\ue019]+\ue001')
+
+# 双语标注占位符
+_BILINGUAL_PLACEHOLDER_PATTERN = re.compile('\ue002[\ue010-\ue019]+\ue003')
+
+# 批量处理时拼接各条字幕的分隔符，不会出现在任何规则中
+_ENTRY_SEPARATOR = '\x00'
+
+# 空白清理正则：多个空行合并为两个，多个空格合并为一个
+_WHITESPACE_PATTERN = re.compile(r'\n\s*\n| {2,}')
+
+
+def _collapse_whitespace(match: re.Match) -> str:
+    return '\n\n' if match.group(0)[0] == '\n' else ' '
+
+
+def _placeholder(open_mark: str, number: int, close_mark: str) -> str:
+    """第 number 个占位符"""
+    return f"{open_mark}{str(number).translate(_PLACEHOLDER_DIGITS)}{close_mark}"
+
 
 @dataclass
 class ReplacementStats:
@@ -19,20 +54,34 @@ class ReplacementStats:
     term_corrections: int = 0
     noise_removals: int = 0
     replacement_details: List[Dict[str, Any]] = None
+    # 各噪音模式的移除次数 {pattern: count}
+    noise_details: Dict[str, int] = None
+    # 批量处理时直接使用条目记忆的条数与实际处理的条数
+    memo_hits: int = 0
+    memo_misses: int = 0
 
     def __post_init__(self):
         if self.replacement_details is None:
             self.replacement_details = []
+        if self.noise_details is None:
+            self.noise_details = {}
 
 
 class SubtitleEngine:
-    """字幕处理引擎"""
+    """
+    字幕处理引擎
+
+    单次处理的统计信息与占位符映射表保存在实例上，同一实例不能被多个线程同时使用；
+    服务中引擎只在工作进程（单线程）中调用
+    """
 
     def __init__(
         self,
         correction_terms: List[Dict[str, str]],
         protected_words: List[str],
-        noise_patterns: List[str]
+        noise_patterns: List[str],
+        plan: Optional[RulePlan] = None,
+        memo_size: int = 0
     ):
         """
         初始化引擎
@@ -41,17 +90,35 @@ class SubtitleEngine:
             correction_terms: 修正规则列表 [{"source": "...", "target": "..."}]
             protected_words: 保护词列表
             noise_patterns: 噪音正则表达式列表
+            plan: 预编译的规则执行计划
+            memo_size: 条目记忆的容量（条），0 表示不使用
         """
         self.correction_terms = correction_terms
         self.protected_words = protected_words
         self.noise_patterns = noise_patterns
 
+        # 规则执行计划：未提供时现场编译
+        self.plan = plan or compile_rule_plan(
+            correction_terms,
+            protected_words,
+            noise_patterns
+        )
+
         # 保护词映射表 {占位符: 原始词}
         self.shield_map: Dict[str, str] = {}
 
+        # 双语标注映射表 {占位符: 原始标注}
+        self.bilingual_map: Dict[str, str] = {}
+
         # 统计信息
         self.stats = ReplacementStats()
 
+        # 合并分块统计时使用的规则优先级表（按需建立）
+        self._ranks: Optional[Dict[Tuple[str, str, str], int]] = None
+
+        # 条目记忆：引擎只对应一个字典版本，记忆在使用该引擎的全部文件与任务间共享
+        self.memo: Optional[EntryMemo] = EntryMemo(memo_size) if memo_size > 0 else None
+
     def process(self, text: str) -> Tuple[str, ReplacementStats]:
         """
         处理字幕文本
@@ -68,10 +135,10 @@ class SubtitleEngine:
         Returns:
             (处理后的文本, 统计信息)
         """
-        logger.info("开始处理字幕文本")
+        logger.debug("开始处理字幕文本")
 
-        # 重置统计信息
-        self.stats = ReplacementStats()
+        # 重置统计信息与占位符映射表
+        self._reset()
 
         # 步骤 A: 保护词锚点化
         text = self._isolate_protected_words(text)
@@ -83,42 +150,282 @@ class SubtitleEngine:
         text = self._remove_noise(text)
         text = self._restore_protected_words(text)
 
-        logger.info(f"处理完成，共替换 {self.stats.total_replacements} 次")
+        logger.debug(f"处理完成，共替换 {self.stats.total_replacements} 次")
 
         return text, self.stats
 
+    def process_many(self, texts: List[str]) -> Tuple[List[str], ReplacementStats]:
+        """
+        批量处理同一文件的全部字幕文本
+
+        除修正规则的替换外，各阶段都在以分隔符拼接的整段文本上各执行一次；
+        自动机单次扫描得到的候选规则按偏移表分配到各条，再逐条替换。
+        每条的输出与单独调用 process 一致，统计信息在全部条目上累计；
+        使用条目记忆时，已处理过的文本直接取记忆中的结果
+
+        Args:
+            texts: 原始字幕文本列表
+
+        Returns:
+            (处理后的文本列表, 累计统计信息)
+        """
+        logger.debug(f"开始批量处理 {len(texts)} 条字幕文本")
+
+        self._reset()
+
+        if not texts:
+            return [], self.stats
+
+        if any(_ENTRY_SEPARATOR in text for text in texts):
+            # 文本中出现分隔符时无法拼接，逐条处理并累计统计
+            return self._process_each(texts)
+
+        if self.memo is not None:
+            outputs, stats, _ = self.process_detailed(texts)
+            return outputs, stats
+
+        joined = _ENTRY_SEPARATOR.join(texts)
+
+        # 步骤 A 与 B-1: 整段文本单次扫描
+        joined = self._isolate_protected_words(joined)
+        joined = self._guard_bilingual_annotations(joined)
+
+        # 步骤 C: 自动机单次扫描整段文本，按偏移表把候选规则分配到各条
+        entries = joined.split(_ENTRY_SEPARATOR)
+        offsets = []
+        position = 0
+        for entry in entries:
+            offsets.append(position)
+            position += len(entry) + 1
+
+        candidates: List[Set[int]] = [set() for _ in entries]
+        for start, pattern_id in self.plan.automaton.iter_matches(joined):
+            candidates[bisect.bisect_right(offsets, start) - 1].add(pattern_id)
+
+        counts: Dict[int, int] = {}
+        entries = [
+            self._apply_term_corrections(entry, entry_candidates, counts)
+            for entry, entry_candidates in zip(entries, candidates)
+        ]
+        self._record_corrections(counts)
+
+        # 步骤 C-1 与 D: 还原与降噪在整段文本上执行；
+        # 噪音模式可能跨越分隔符时，降噪与之后的步骤逐条执行
+        joined = self._restore_bilingual_annotations(_ENTRY_SEPARATOR.join(entries))
+
+        if self.plan.noise_matcher.joinable:
+            joined = self._remove_noise(joined)
+            outputs = self._restore_protected_words(joined).split(_ENTRY_SEPARATOR)
+        else:
+            outputs = [
+                self._restore_protected_words(self._remove_noise(entry))
+                for entry in joined.split(_ENTRY_SEPARATOR)
+            ]
+
+        logger.debug(f"批量处理完成，共替换 {self.stats.total_replacements} 次")
+
+        return outputs, self.stats
+
+    def process_detailed(
+        self,
+        texts: List[str]
+    ) -> Tuple[List[str], ReplacementStats, Optional[List[MemoEntry]]]:
+        """
+        批量处理，同时返回每条的处理结果与该条的替换次数
+
+        输出与统计信息与 process_many 一致；重复的文本（批次内与条目记忆中）只处理一次
+
+        Returns:
+            (处理后的文本列表, 累计统计信息, 每条的处理结果)，
+            文本中出现分隔符而无法批量处理时，每条的处理结果为 None
+        """
+        self._reset()
+
+        if any(_ENTRY_SEPARATOR in text for text in texts):
+            outputs, stats = self._process_each(texts)
+            return outputs, stats, None
+
+        memo = self.memo
+        entries: List[Optional[MemoEntry]] = [None] * len(texts)
+        # 尚未处理的文本 {文本: 出现位置}
+        pending: Dict[str, List[int]] = {}
+        hits = 0
+
+        for i, text in enumerate(texts):
+            positions = pending.get(text)
+            if positions is not None:
+                positions.append(i)
+                hits += 1
+                continue
+            entry = memo.get(text) if memo is not None else None
+            if entry is None:
+                pending[text] = [i]
+            else:
+                entries[i] = entry
+                hits += 1
+
+        if pending:
+            for text, entry in zip(pending, self._process_entries(list(pending))):
+                if memo is not None:
+                    memo.put(text, entry)
+                for i in pending[text]:
+                    entries[i] = entry
+
+        # 按规则优先级写入替换次数，噪音按条目顺序累计
+        self._reset()
+        counts: Dict[int, int] = {}
+        noise_details = self.stats.noise_details
+        for entry in entries:
+            for rank, count in entry.term_counts:
+                counts[rank] = counts.get(rank, 0) + count
+            for pattern, count in entry.noise_counts:
+                noise_details[pattern] = noise_details.get(pattern, 0) + count
+                self.stats.total_replacements += count
+                self.stats.noise_removals += count
+        self._record_corrections(counts)
+
+        self.stats.memo_hits = hits
+        self.stats.memo_misses = len(pending)
+        return [entry.output for entry in entries], self.stats, entries
+
+    def _process_entries(self, texts: List[str]) -> List[MemoEntry]:
+        """批量处理并分别记录每条的替换次数（降噪与之后的步骤逐条执行）"""
+        self._reset()
+
+        joined = _ENTRY_SEPARATOR.join(texts)
+        joined = self._isolate_protected_words(joined)
+        joined = self._guard_bilingual_annotations(joined)
+
+        entries = joined.split(_ENTRY_SEPARATOR)
+        offsets = []
+        position = 0
+        for entry in entries:
+            offsets.append(position)
+            position += len(entry) + 1
+
+        candidates: List[Set[int]] = [set() for _ in entries]
+        for start, pattern_id in self.plan.automaton.iter_matches(joined):
+            candidates[bisect.bisect_right(offsets, start) - 1].add(pattern_id)
+
+        entry_counts: List[Dict[int, int]] = []
+        corrected = []
+        for entry, entry_candidates in zip(entries, candidates):
+            counts: Dict[int, int] = {}
+            corrected.append(self._apply_term_corrections(entry, entry_candidates, counts))
+            entry_counts.append(counts)
+
+        joined = self._restore_bilingual_annotations(_ENTRY_SEPARATOR.join(corrected))
+
+        results = []
+        for entry, counts in zip(joined.split(_ENTRY_SEPARATOR), entry_counts):
+            noise = ReplacementStats()
+            output = self._restore_protected_words(self._remove_noise(entry, noise))
+            results.append(MemoEntry(
+                output=output,
+                term_counts=tuple(sorted(counts.items())),
+                noise_counts=tuple(noise.noise_details.items())
+            ))
+        return results
+
+    def _process_each(self, texts: List[str]) -> Tuple[List[str], ReplacementStats]:
+        """逐条处理并累计统计信息"""
+        total = ReplacementStats()
+        outputs = []
+
+        for text in texts:
+            output, stats = self.process(text)
+            outputs.append(output)
+
+            total.total_replacements += stats.total_replacements
+            total.term_corrections += stats.term_corrections
+            total.noise_removals += stats.noise_removals
+            total.replacement_details.extend(stats.replacement_details)
+            for pattern, count in stats.noise_details.items():
+                total.noise_details[pattern] = total.noise_details.get(pattern, 0) + count
+
+        self.stats = total
+        return outputs, total
+
+    def merge_stats(self, stats_list: List[ReplacementStats]) -> ReplacementStats:
+        """
+        按顺序合并多个分块的统计信息
+
+        替换详情按规则优先级排列，与整体调用 process_many 的顺序一致；
+        噪音详情按分块顺序累计
+
+        Args:
+            stats_list: 各分块的统计信息（按分块顺序）
+
+        Returns:
+            合并后的统计信息
+        """
+        ranks = self._term_ranks()
+
+        total = ReplacementStats()
+        details: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+
+        for stats in stats_list:
+            total.total_replacements += stats.total_replacements
+            total.term_corrections += stats.term_corrections
+            total.noise_removals += stats.noise_removals
+            total.memo_hits += stats.memo_hits
+            total.memo_misses += stats.memo_misses
+            for detail in stats.replacement_details:
+                key = (detail['source'], detail['target'], detail['category'])
+                if key in details:
+                    details[key]['count'] += detail['count']
+                else:
+                    details[key] = dict(detail)
+            for pattern, count in stats.noise_details.items():
+                total.noise_details[pattern] = total.noise_details.get(pattern, 0) + count
+
+        total.replacement_details = sorted(
+            details.values(),
+            key=lambda d: ranks.get((d['source'], d['target'], d['category']), len(ranks))
+        )
+        return total
+
+    def _term_ranks(self) -> Dict[Tuple[str, str, str], int]:
+        """(source, target, category) -> 最高优先级下标，首次使用时建立"""
+        if self._ranks is None:
+            ranks: Dict[Tuple[str, str, str], int] = {}
+            for rank, term in enumerate(self.plan.terms):
+                ranks.setdefault((term.source, term.target, term.category), rank)
+            self._ranks = ranks
+        return self._ranks
+
+    def _reset(self) -> None:
+        """重置统计信息与占位符映射表"""
+        self.stats = ReplacementStats()
+        self.shield_map = {}
+        self.bilingual_map = {}
+
     def _isolate_protected_words(self, text: str) -> str:
         """
         步骤 A: 保护词锚点化
         将保护词替换为唯一占位符
 
+        全部保护词合并为一个正则，单次扫描完成替换；
+        占位符按出现顺序编号，每处匹配各自保留原始大小写
+
         Example:
-            "Octane is great" -> "##_SHIELD_abc123_## is great"
+            "Octane is great" -> "<占位符 0> is great"
         """
-        logger.debug(f"开始保护 {len(self.protected_words)} 个词汇")
-
-        for word in self.protected_words:
-            # 生成唯一占位符
-            placeholder = f"##_SHIELD_{uuid.uuid4().hex[:8]}_##"
+        logger.debug(f"开始保护 {len(self.plan.protected_words)} 个词汇")
 
-            # 使用改进的边界匹配，支持英文与中文相邻的情况
-            if self._is_english_word(word):
-                pattern = rf'(?<![a-zA-Z0-9]){re.escape(word)}(?![a-zA-Z0-9])'
-            else:
-                pattern = re.escape(word)
+        pattern = self.plan.protected_pattern
+        if pattern is None:
+            return text
 
-            # 检查是否有匹配
-            matches = re.findall(pattern, text, flags=re.IGNORECASE)
-            if matches:
-                # 保存映射关系（保留原始大小写）
-                self.shield_map[placeholder] = matches[0]
+        shield_map = self.shield_map
 
-                # 替换为占位符
-                text = re.sub(pattern, placeholder, text, flags=re.IGNORECASE)
+        def shield(match: re.Match) -> str:
+            placeholder = _placeholder(_SHIELD_OPEN, len(shield_map), _SHIELD_CLOSE)
+            shield_map[placeholder] = match.group(0)
+            logger.debug(f"保护词 '{match.group(0)}' 已锚点化")
+            return placeholder
 
-                logger.debug(f"保护词 '{word}' 已锚点化")
-
-        return text
+        return pattern.sub(shield, text)
 
     def _apply_corrections(self, text: str) -> str:
         """
@@ -126,125 +433,231 @@ class SubtitleEngine:
         按长词优先规则应用修正
 
         算法:
-        1. 按 source 长度降序排序
-        2. 使用正则边界符确保完整匹配
-        3. 智能跳过双语标注（如"阈值(Threshold)"不会变成"阈值(阈值)"）
+        1. 按 source 长度降序排序（编译规则计划时完成）
+        2. Aho-Corasick 自动机单次扫描找出候选规则，按优先级依次替换
+        3. 英文单词要求前后均非英文字母数字，确保完整匹配
+        4. 智能跳过双语标注（如"阈值(Threshold)"不会变成"阈值(阈值)"）
         """
-        # 步骤 B: 按字符长度降序排序
-        sorted_terms = sorted(
-            self.correction_terms,
-            key=lambda x: len(x.get('source', '')),
-            reverse=True
-        )
-
-        logger.debug(f"开始应用 {len(sorted_terms)} 条修正规则（长词优先）")
+        logger.debug(f"开始应用 {len(self.plan.terms)} 条修正规则（长词优先）")
 
         # 步骤 B-1: 保护双语标注模式
-        # 例如 "阈值(Threshold)" 或 "阈值（Threshold）" 不应被替换为 "阈值(阈值)"
-        bilingual_placeholders = {}
-        for term in sorted_terms:
-            source = term.get('source', '')
-            target = term.get('target', '')
+        text = self._guard_bilingual_annotations(text)
 
-            if not source or not target:
-                continue
+        # 步骤 C: 应用修正规则
+        counts: Dict[int, int] = {}
+        candidates = self.plan.automaton.matched_ids(text)
+        text = self._apply_term_corrections(text, candidates, counts)
+        self._record_corrections(counts)
 
-            # 匹配双语标注模式: target + 括号 + source + 括号
-            # 支持中英文括号: () 和 （）
-            bilingual_pattern = rf'{re.escape(target)}[（(]{re.escape(source)}[)）]'
-            matches = re.findall(bilingual_pattern, text)
+        # 步骤 C-1: 还原双语标注
+        return self._restore_bilingual_annotations(text)
 
-            for match in matches:
-                placeholder = f"##_BILINGUAL_{uuid.uuid4().hex[:8]}_##"
-                bilingual_placeholders[placeholder] = match
-                text = text.replace(match, placeholder, 1)
-                logger.debug(f"保护双语标注: '{match}'")
+    def _guard_bilingual_annotations(self, text: str) -> str:
+        """
+        步骤 B-1: 保护双语标注模式
+        例如 "阈值(Threshold)" 或 "阈值（Threshold）" 不应被替换为 "阈值(阈值)"
 
-        # 步骤 C: 应用修正规则
-        for term in sorted_terms:
-            source = term.get('source', '')
-            target = term.get('target', '')
+        只扫描文本中的括号并查索引，开销与字典规模无关
+        """
+        spans = self.plan.bilingual_index.find(text)
+        if not spans:
+            return text
+
+        bilingual_map = self.bilingual_map
+        parts = []
+        last = 0
+        for start, end in spans:
+            placeholder = _placeholder(_BILINGUAL_OPEN, len(bilingual_map), _BILINGUAL_CLOSE)
+            bilingual_map[placeholder] = text[start:end]
+            parts.append(text[last:start])
+            parts.append(placeholder)
+            last = end
+            logger.debug(f"保护双语标注: '{text[start:end]}'")
+        parts.append(text[last:])
+
+        return ''.join(parts)
+
+    def _restore_bilingual_annotations(self, text: str) -> str:
+        """步骤 C-1: 还原双语标注"""
+        if not self.bilingual_map:
+            return text
+
+        bilingual_map = self.bilingual_map
+        return _BILINGUAL_PLACEHOLDER_PATTERN.sub(
+            lambda match: bilingual_map.get(match.group(0), match.group(0)),
+            text
+        )
 
-            if not source or not target:
-                continue
+    def _apply_term_corrections(
+        self,
+        text: str,
+        candidates: Set[int],
+        counts: Dict[int, int]
+    ) -> str:
+        """
+        步骤 C: 对候选规则按优先级依次替换
 
-            # 正则边界匹配
-            # 判断是否为纯英文单词（需要单词边界）
-            if self._is_english_word(source):
-                # 使用改进的边界匹配，支持英文与中文相邻的情况
-                # 匹配条件：source 前面不是英文字母数字，后面也不是英文字母数字
-                # 这样 "Threshold设置" 中的 Threshold 也能被匹配
-                pattern = rf'(?<![a-zA-Z0-9]){re.escape(source)}(?![a-zA-Z0-9])'
-            else:
-                # 中文或混合文本，不使用边界符
-                pattern = re.escape(source)
+        替换后的 target 可能构成低优先级规则的新匹配（级联替换），
+        因此仅对新写入区域附近重新扫描，补充候选规则
 
-            # 查找所有匹配
-            matches = re.findall(pattern, text)
-            if matches:
-                count = len(matches)
+        Args:
+            text: 当前文本
+            candidates: 自动机扫描得到的候选规则优先级下标
+            counts: 各规则替换次数 {优先级下标: 次数}，原地累加
+        """
+        automaton = self.plan.automaton
+        pending = list(candidates)
+        heapq.heapify(pending)
+        queued = set(pending)
 
-                # 执行替换
-                text = re.sub(pattern, target, text)
+        while pending:
+            rank = heapq.heappop(pending)
 
-                # 更新统计
-                self.stats.total_replacements += count
-                self.stats.term_corrections += count
-                self.stats.replacement_details.append({
-                    'source': source,
-                    'target': target,
-                    'count': count,
-                    'category': term.get('category', '术语映射')
-                })
+            text, spans = self._replace_term(text, rank)
+            if not spans:
+                continue
 
-                logger.debug(f"'{source}' -> '{target}' (替换 {count} 次)")
+            counts[rank] = counts.get(rank, 0) + len(spans)
 
-        # 步骤 C-1: 还原双语标注
-        for placeholder, original in bilingual_placeholders.items():
-            text = text.replace(placeholder, original)
-            logger.debug(f"还原双语标注: '{original}'")
+            for start, end in self._rescan_windows(spans, len(text)):
+                for found in automaton.matched_ids(text, start, end):
+                    if found > rank and found not in queued:
+                        queued.add(found)
+                        heapq.heappush(pending, found)
 
         return text
 
-    def _remove_noise(self, text: str) -> str:
+    def _record_corrections(self, counts: Dict[int, int]) -> None:
+        """按优先级顺序把各规则的替换次数写入统计信息"""
+        for rank in sorted(counts):
+            term = self.plan.terms[rank]
+            count = counts[rank]
+
+            # 更新统计
+            self.stats.total_replacements += count
+            self.stats.term_corrections += count
+            self.stats.replacement_details.append({
+                'source': term.source,
+                'target': term.target,
+                'count': count,
+                'category': term.category
+            })
+
+            logger.debug(f"'{term.source}' -> '{term.target}' (替换 {count} 次)")
+
+    def _replace_term(self, text: str, rank: int) -> Tuple[str, List[Tuple[int, int]]]:
         """
-        步骤 D-1: 噪音清理
-        使用正则表达式移除噪音标记
+        对单条规则执行替换（从左到右、不重叠，等价于 re.sub）
 
-        Example:
-            "Hello (音乐) World" -> "Hello  World"
+        Args:
+            text: 当前文本
+            rank: 规则优先级下标
+
+        Returns:
+            (替换后的文本, target 在新文本中的区间列表)
         """
-        logger.debug(f"开始清理 {len(self.noise_patterns)} 种噪音模式")
+        term = self.plan.terms[rank]
+        source = term.source
+        target = term.target
+        check_boundary = term.is_english
+
+        parts = []
+        spans = []
+        offset = 0
+        last = 0
+        pos = text.find(source)
+
+        while pos != -1:
+            end = pos + len(source)
+
+            # 英文单词：前后不能是英文字母或数字
+            if check_boundary and (
+                (pos > 0 and text[pos - 1] in _ASCII_ALNUM)
+                or (end < len(text) and text[end] in _ASCII_ALNUM)
+            ):
+                pos = text.find(source, pos + 1)
+                continue
 
-        for pattern_item in self.noise_patterns:
-            # 支持两种格式: 字符串或字典
-            if isinstance(pattern_item, dict):
-                pattern = pattern_item.get('pattern', '')
-            else:
-                pattern = pattern_item
+            parts.append(text[last:pos])
+            parts.append(target)
+            new_start = pos + offset
+            spans.append((new_start, new_start + len(target)))
+            offset += len(target) - len(source)
+            last = end
+            pos = text.find(source, end)
 
-            if not pattern:
-                continue
+        if not spans:
+            return text, spans
 
-            # 查找匹配数量
-            matches = re.findall(pattern, text)
-            if matches:
-                count = len(matches)
+        parts.append(text[last:])
+        return ''.join(parts), spans
 
-                # 移除噪音
-                text = re.sub(pattern, '', text)
+    def _rescan_windows(
+        self,
+        spans: List[Tuple[int, int]],
+        text_length: int
+    ) -> List[Tuple[int, int]]:
+        """
+        计算替换后需要重新扫描的区间（合并重叠区间）
 
-                # 更新统计
-                self.stats.total_replacements += count
-                self.stats.noise_removals += count
+        任何与新写入区域相交的匹配都完整落在区域前后各扩展 (最长 source - 1) 的范围内
+        """
+        margin = max(self.plan.max_source_length - 1, 0)
+        windows: List[Tuple[int, int]] = []
+
+        for start, end in spans:
+            start = max(0, start - margin)
+            end = min(text_length, end + margin)
+            if windows and start <= windows[-1][1]:
+                windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+            else:
+                windows.append((start, end))
 
-                logger.debug(
-                    f"移除噪音模式 '{pattern}' ({count} 次)"
-                )
+        return windows
 
-        # 清理多余空行和空格
-        text = re.sub(r'\n\s*\n', '\n\n', text)  # 多个空行合并为两个
-        text = re.sub(r' {2,}', ' ', text)  # 多个空格合并为一个
+    def _remove_noise(self, text: str, stats: Optional[ReplacementStats] = None) -> str:
+        """
+        步骤 D-1: 噪音清理
+        使用正则表达式移除噪音标记，次数计入 stats（默认为 self.stats）
+
+        Example:
+            "Hello (音乐) World" -> "Hello  World"
+        """
+        logger.debug(f"开始清理 {len(self.plan.noise_patterns)} 种噪音模式")
+
+        matcher = self.plan.noise_matcher
+        if stats is None:
+            stats = self.stats
+        noise_details = stats.noise_details
+
+        # 合并后的噪音正则扫描，命中时把次数归属到对应模式；
+        # 移除后可能露出新的匹配（如 "(字(静音)幕)" 移除 "(静音)" 后的 "(字幕)"），
+        # 重复扫描直到没有匹配。通常第二次扫描即结束，且没有移除时不会重复
+        if matcher.fused is not None:
+            def remove(match: re.Match) -> str:
+                pattern = matcher.identify(match).pattern
+                noise_details[pattern] = noise_details.get(pattern, 0) + 1
+                return ''
+
+            while True:
+                text, count = matcher.fused.subn(remove, text)
+                if not count:
+                    break
+                stats.total_replacements += count
+                stats.noise_removals += count
+                logger.debug(f"移除噪音 {count} 次")
+
+        # 无法合并的模式逐个执行
+        for noise in matcher.fallback:
+            text, count = noise.regex.subn('', text)
+            if count:
+                noise_details[noise.pattern] = noise_details.get(noise.pattern, 0) + count
+                stats.total_replacements += count
+                stats.noise_removals += count
+                logger.debug(f"移除噪音模式 '{noise.pattern}' ({count} 次)")
+
+        # 清理多余空行和空格（合并为单次扫描）
+        text = _WHITESPACE_PATTERN.sub(_collapse_whitespace, text)
 
         return text
 
@@ -255,11 +668,14 @@ class SubtitleEngine:
         """
         logger.debug(f"开始还原 {len(self.shield_map)} 个保护词")
 
-        for placeholder, original_word in self.shield_map.items():
-            text = text.replace(placeholder, original_word)
-            logger.debug(f"还原: {placeholder} -> '{original_word}'")
+        if not self.shield_map:
+            return text
 
-        return text
+        shield_map = self.shield_map
+        return _SHIELD_PLACEHOLDER_PATTERN.sub(
+            lambda match: shield_map.get(match.group(0), match.group(0)),
+            text
+        )
 
     @staticmethod
     def _is_english_word(text: str) -> bool:
@@ -272,13 +688,14 @@ class SubtitleEngine:
         Returns:
             True 如果是纯英文单词
         """
-        # 纯英文字母、数字、连字符
-        return bool(re.match(r'^[a-zA-Z0-9\-]+$', text))
+        return is_english_word(text)
 
 
 def create_engine_from_dicts(
     correction_dict: Dict[str, Any],
-    shielding_dict: Dict[str, Any]
+    shielding_dict: Dict[str, Any],
+    base_plan: Optional[RulePlan] = None,
+    memo_size: int = 0
 ) -> SubtitleEngine:
     """
     从字典数据创建引擎实例
@@ -286,6 +703,8 @@ def create_engine_from_dicts(
     Args:
         correction_dict: 修正规则字典
         shielding_dict: 保护词字典
+        base_plan: 上一版本字典的规则执行计划，未变化的部分直接复用
+        memo_size: 条目记忆的容量（条），0 表示不使用
 
     Returns:
         配置好的引擎实例
@@ -293,20 +712,23 @@ def create_engine_from_dicts(
     # 提取修正规则
     correction_terms = correction_dict.get('terms', [])
 
-    # 提取保护词（支持两种格式）
-    protected_words_data = shielding_dict.get('protected_words', [])
-    if protected_words_data and isinstance(protected_words_data[0], dict):
-        # 格式: [{"word": "...", "category": "..."}]
-        protected_words = [item['word'] for item in protected_words_data]
-    else:
-        # 格式: ["word1", "word2", ...]
-        protected_words = protected_words_data
+    # 提取保护词（支持两种格式，可混用）
+    # 格式: ["word1", "word2", ...] 或 [{"word": "...", "category": "..."}]
+    protected_words = [
+        item.get('word', '') if isinstance(item, dict) else item
+        for item in shielding_dict.get('protected_words', [])
+    ]
 
     # 提取噪音模式
     noise_patterns = correction_dict.get('noise_patterns', [])
 
+    # 一次性编译规则执行计划，之后每次 process 只执行计划
+    plan = compile_rule_plan(correction_terms, protected_words, noise_patterns, base=base_plan)
+
     return SubtitleEngine(
         correction_terms=correction_terms,
         protected_words=protected_words,
-        noise_patterns=noise_patterns
+        noise_patterns=noise_patterns,
+        plan=plan,
+        memo_size=memo_size
     )
@@ -0,0 +1,304 @@
+"""
+引擎注册表 - 按字典版本缓存已编译的字幕处理器
+字典版本为两个字典文件内容的哈希；每个版本的字典内容会保存为不可变快照，
+服务进程只负责建立快照，工作进程按快照加载并编译处理器，进行中的任务始终使用其开始时的版本。
+任务运行期间固定（pin）其快照，清理旧快照时跳过被固定的版本
+"""
+
+import os
+import uuid
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .config import settings
+from .processor import SubtitleProcessor
+
+logger = logging.getLogger(__name__)
+
+# 每个进程最多缓存的处理器版本数（进行中的旧版本任务 + 当前版本）
+_MAX_CACHED_VERSIONS = 2
+
+# 保留的字典快照版本数（不含被任务固定的版本）
+_MAX_SNAPSHOTS = 8
+
+# 快照固定标记所在的子目录，标记文件名为 {版本}.{进程号}.{随机串}
+_PINS_DIR = "pins"
+
+
+@dataclass(frozen=True)
+class DictionarySnapshot:
+    """某一版本字典的不可变快照"""
+    version: str
+    correction_path: str
+    shielding_path: str
+
+
+def _file_signature(path: Path) -> Optional[Tuple[int, int]]:
+    """文件签名（修改时间 + 大小），用于廉价地发现字典文件的变化"""
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def _read_bytes(path: Path) -> bytes:
+    """读取字典文件，不存在时视为空字典"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        logger.warning(f"字典文件不存在: {path}")
+        return b'{}'
+
+
+class EngineRegistry:
+    """
+    进程级的处理器注册表
+
+    服务进程通过 current() / acquire() 获取当前版本的快照（不编译处理器）：每次调用只比较
+    文件签名，字典未变化时直接返回缓存；字典更新后调用 invalidate() 或 rebuild() 切换版本。
+    工作进程通过 load() 按快照路径加载处理器，快照文件不可变，因此可按路径缓存
+    """
+
+    def __init__(
+        self,
+        correction_dict_path: Path = None,
+        shielding_dict_path: Path = None,
+        snapshot_dir: Path = None
+    ):
+        self.correction_dict_path = correction_dict_path or settings.CORRECTION_DICT_PATH
+        self.shielding_dict_path = shielding_dict_path or settings.SHIELDING_DICT_PATH
+        self.snapshot_dir = snapshot_dir or settings.CACHE_DIR / "dictionaries"
+
+        self._lock = threading.Lock()
+        # 当前版本: (文件签名, 快照)
+        self._current: Optional[Tuple[Tuple, DictionarySnapshot]] = None
+        # 已加载的处理器 {(修正规则库路径, 保护词库路径): 处理器}
+        self._processors: "OrderedDict[Tuple[str, str], SubtitleProcessor]" = OrderedDict()
+
+    def current(self) -> DictionarySnapshot:
+        """
+        获取当前版本的字典快照（处理器由工作进程按快照加载）
+
+        Returns:
+            快照
+        """
+        with self._lock:
+            signature = self._signature()
+            if self._current is None or self._current[0] != signature:
+                self._current = (signature, self._snapshot())
+            return self._current[1]
+
+    def acquire(self) -> Tuple[DictionarySnapshot, Path]:
+        """
+        获取当前版本的快照并固定，任务结束后须调用 release()
+
+        固定标记是快照目录中的文件，多个服务进程共享；所属进程退出后标记失效
+
+        Returns:
+            (快照, 固定标记)
+        """
+        while True:
+            snapshot = self.current()
+            with self._lock:
+                pin = self._pin(snapshot.version)
+            if self.snapshot(snapshot.version) is not None:
+                return snapshot, pin
+            # 固定之前快照已被其他进程清理，重新建立
+            self.release(pin)
+            self.invalidate()
+
+    def release(self, pin: Path) -> None:
+        """解除 acquire() 的固定"""
+        try:
+            pin.unlink()
+        except FileNotFoundError:
+            pass
+
+    def invalidate(self) -> None:
+        """丢弃当前版本，下次 current() 时按字典文件重新建立"""
+        with self._lock:
+            self._current = None
+
+    def rebuild(self) -> DictionarySnapshot:
+        """立即按字典文件建立新版本的快照（编译由工作进程完成）"""
+        self.invalidate()
+        snapshot = self.current()
+        logger.info(f"字典快照已更新，版本: {snapshot.version}")
+        return snapshot
+
+    def snapshot(self, version: str) -> Optional[DictionarySnapshot]:
+        """已保存的某一版本的快照，已被清理时返回 None"""
+        correction_path = self.snapshot_dir / f"{version}_correction.json"
+        shielding_path = self.snapshot_dir / f"{version}_shielding.json"
+        if not (correction_path.exists() and shielding_path.exists()):
+            return None
+        return DictionarySnapshot(
+            version=version,
+            correction_path=str(correction_path),
+            shielding_path=str(shielding_path)
+        )
+
+    def load(self, correction_path: str, shielding_path: str) -> SubtitleProcessor:
+        """
+        加载快照对应的处理器（按路径缓存）
+
+        新版本在最近使用的处理器基础上编译，字典中未修改的部分（如只改了一条规则时的
+        保护词与噪音模式、只改 target 时的自动机）不重新编译。
+        快照不存在或无法解析时抛出异常，不会以空字典处理
+
+        Args:
+            correction_path: 修正规则库快照路径
+            shielding_path: 保护词库快照路径
+
+        Returns:
+            处理器
+
+        Raises:
+            FileNotFoundError: 快照已被清理
+        """
+        key = (correction_path, shielding_path)
+
+        with self._lock:
+            processor = self._processors.get(key)
+            if processor is not None:
+                self._processors.move_to_end(key)
+                return processor
+
+            base = next(reversed(self._processors.values()), None)
+            processor = SubtitleProcessor(
+                Path(correction_path), Path(shielding_path), base=base, strict=True
+            )
+            self._processors[key] = processor
+            while len(self._processors) > _MAX_CACHED_VERSIONS:
+                self._processors.popitem(last=False)
+
+        return processor
+
+    def _signature(self) -> Tuple:
+        return (
+            _file_signature(self.correction_dict_path),
+            _file_signature(self.shielding_dict_path)
+        )
+
+    def _snapshot(self) -> DictionarySnapshot:
+        """读取字典文件，按内容哈希生成版本号并保存快照"""
+        correction_bytes = _read_bytes(self.correction_dict_path)
+        shielding_bytes = _read_bytes(self.shielding_dict_path)
+
+        digest = hashlib.sha256()
+        for content in (correction_bytes, shielding_bytes):
+            digest.update(len(content).to_bytes(8, 'little'))
+            digest.update(content)
+        version = digest.hexdigest()[:16]
+
+        self.snapshot_dir.mkdir(parents=True, exist_ok=True)
+        correction_path = self.snapshot_dir / f"{version}_correction.json"
+        shielding_path = self.snapshot_dir / f"{version}_shielding.json"
+
+        for path, content in ((correction_path, correction_bytes), (shielding_path, shielding_bytes)):
+            if path.exists():
+                # 已有快照（如字典改回旧版本）只刷新时间，避免被清理
+                os.utime(path)
+                continue
+
+            # 先写临时文件再改名，工作进程不会读到写了一半的快照；
+            # 临时文件名唯一，多个服务进程同时建立同一版本时互不干扰
+            fd, temp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix='.tmp', dir=self.snapshot_dir)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(content)
+                os.replace(temp_path, path)
+            except BaseException:
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+                raise
+
+        self._prune_snapshots(version)
+
+        return DictionarySnapshot(
+            version=version,
+            correction_path=str(correction_path),
+            shielding_path=str(shielding_path)
+        )
+
+    def _pin(self, version: str) -> Path:
+        """创建固定标记（调用方需持有锁）"""
+        pins_dir = self.snapshot_dir / _PINS_DIR
+        pins_dir.mkdir(parents=True, exist_ok=True)
+        pin = pins_dir / f"{version}.{os.getpid()}.{uuid.uuid4().hex}"
+        pin.touch()
+        return pin
+
+    def _pinned_versions(self) -> set:
+        """被运行中的任务固定的版本（顺带删除已退出进程留下的标记）"""
+        pins_dir = self.snapshot_dir / _PINS_DIR
+        if not pins_dir.exists():
+            return set()
+
+        pinned = set()
+        for pin in pins_dir.iterdir():
+            try:
+                version, pid, _ = pin.name.split('.')
+                alive = _pid_alive(int(pid))
+            except ValueError:
+                alive = False
+            if alive:
+                pinned.add(version)
+            else:
+                try:
+                    pin.unlink()
+                except OSError:
+                    pass
+        return pinned
+
+    def _prune_snapshots(self, keep_version: str) -> None:
+        """只保留最近的若干个快照版本，被固定的版本不清理"""
+        versions = {}
+        for path in self.snapshot_dir.glob("*_correction.json"):
+            try:
+                versions[path.name.split('_', 1)[0]] = path.stat().st_mtime
+            except FileNotFoundError:
+                # 其他进程刚刚清理
+                continue
+
+        pinned = self._pinned_versions()
+        stale = sorted(
+            (v for v in versions if v != keep_version),
+            key=versions.get,
+            reverse=True
+        )[_MAX_SNAPSHOTS - 1:]
+        stale = [version for version in stale if version not in pinned]
+
+        for version in stale:
+            for kind in ("correction", "shielding"):
+                try:
+                    (self.snapshot_dir / f"{version}_{kind}.json").unlink()
+                except OSError:
+                    pass
+
+
+def _pid_alive(pid: int) -> bool:
+    """进程是否仍在运行"""
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# 全局注册表实例（每个进程一个）
+engine_registry = EngineRegistry()
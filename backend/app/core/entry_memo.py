@@ -0,0 +1,57 @@
+"""
+字幕条目记忆 - 同一字典版本下相同文本的字幕条目只处理一次
+剧集批次中片头片尾、赞助口播、固定台词等逐字重复的条目很多，
+记录每条文本的处理结果与该条的替换次数，再次出现时直接使用
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+@dataclass(frozen=True)
+class MemoEntry:
+    """一条字幕文本的处理结果"""
+    output: str
+    # 各修正规则的替换次数 ((规则优先级下标, 次数), ...)
+    term_counts: Tuple[Tuple[int, int], ...]
+    # 各噪音模式的移除次数 ((模式, 次数), ...)
+    noise_counts: Tuple[Tuple[str, int], ...]
+
+
+class EntryMemo:
+    """
+    按最近使用淘汰的条目记忆
+
+    每个引擎（即每个字典版本）持有一个实例，键为字幕文本；
+    规则优先级下标只在同一版本的规则执行计划内有意义，因此记忆不跨版本共享
+    """
+
+    def __init__(self, max_entries: int, max_text_length: int = 1000):
+        self.max_entries = max_entries
+        # 超过此长度的文本不记录（字幕条目通常很短，长文本几乎不会重复）
+        self.max_text_length = max_text_length
+        self._entries: "OrderedDict[str, MemoEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, text: str) -> Optional[MemoEntry]:
+        """查找文本的处理结果，未记录时返回 None"""
+        with self._lock:
+            entry = self._entries.get(text)
+            if entry is not None:
+                self._entries.move_to_end(text)
+            return entry
+
+    def put(self, text: str, entry: MemoEntry) -> None:
+        """记录文本的处理结果，超出容量时淘汰最久未使用的条目"""
+        if len(text) > self.max_text_length:
+            return
+        with self._lock:
+            self._entries[text] = entry
+            self._entries.move_to_end(text)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
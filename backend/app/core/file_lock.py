@@ -0,0 +1,31 @@
+"""
+跨进程文件锁
+"""
+
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，退化为仅进程内加锁
+    fcntl = None
+
+
+class FileLock:
+    """跨进程的排他文件锁（没有 fcntl 时为空操作）"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self) -> None:
+        if fcntl is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a')
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
@@ -3,16 +3,31 @@
 """
 
 import json
+import shutil
 import logging
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Any, Tuple
+from typing import IO, Dict, Any, Iterable, List, Optional, Tuple, Union
 
 from .engine import SubtitleEngine, create_engine_from_dicts, ReplacementStats
-from .srt_parser import SRTProcessor
+from .diff_store import DiffWriter
+from .edit_script import apply_edit_ops
+from .rule_plan import RulePlan
+from .srt_parser import SRTParser, SRTProcessor
+from .term_index import (
+    TermIndexBuilder,
+    affected_positions,
+    dictionary_changes,
+    expand_diff_items,
+    iter_index_entries
+)
 from .config import settings
 
 logger = logging.getLogger(__name__)
 
+# 流式处理时每批交给引擎的字幕条数
+_STREAM_BATCH_SIZE = 1000
+
 
 class SubtitleProcessor:
     """完整的字幕处理流程"""
@@ -20,7 +35,9 @@ class SubtitleProcessor:
     def __init__(
         self,
         correction_dict_path: Path = None,
-        shielding_dict_path: Path = None
+        shielding_dict_path: Path = None,
+        base: Optional["SubtitleProcessor"] = None,
+        strict: bool = False
     ):
         """
         初始化处理器
@@ -28,23 +45,31 @@ class SubtitleProcessor:
         Args:
             correction_dict_path: 修正规则字典路径
             shielding_dict_path: 保护词字典路径
+            base: 上一版本字典的处理器，字典中未变化部分的编译结果直接复用
+            strict: 字典文件不存在或无法解析时抛出异常（按快照加载时使用），
+                否则记录日志并按空字典处理
         """
         self.correction_dict_path = correction_dict_path or settings.CORRECTION_DICT_PATH
         self.shielding_dict_path = shielding_dict_path or settings.SHIELDING_DICT_PATH
 
         # 加载字典
-        self.correction_dict = self._load_json(self.correction_dict_path)
-        self.shielding_dict = self._load_json(self.shielding_dict_path)
+        self.correction_dict = self._load_json(self.correction_dict_path, strict)
+        self.shielding_dict = self._load_json(self.shielding_dict_path, strict)
 
         # 创建引擎
         self.engine = create_engine_from_dicts(
             self.correction_dict,
-            self.shielding_dict
+            self.shielding_dict,
+            base_plan=base.engine.plan if base is not None else None,
+            memo_size=settings.ENTRY_MEMO_SIZE
         )
 
         logger.info("字幕处理器初始化完成")
 
-    def process_file(self, srt_content: str) -> Tuple[str, Dict[str, Any]]:
+    def process_file(
+        self,
+        srt_content: str
+    ) -> Tuple[str, Dict[str, Any]]:
         """
         处理单个 SRT 文件
 
@@ -59,61 +84,336 @@ class SubtitleProcessor:
         # 创建 SRT 处理器
         srt_processor = SRTProcessor(srt_content)
 
-        # 累计统计数据
-        accumulated_stats = {
-            'total_replacements': 0,
-            'term_corrections': 0,
-            'noise_removals': 0,
-            'replacement_details': []
-        }
+        # 整个文件的字幕文本一次性交给引擎批量处理
+        stats = ReplacementStats()
 
-        # 应用字幕替换引擎，并累计统计
-        def transform_func(text: str) -> str:
-            processed_text, stats = self.engine.process(text)
-            # 累计统计
-            accumulated_stats['total_replacements'] += stats.total_replacements
-            accumulated_stats['term_corrections'] += stats.term_corrections
-            accumulated_stats['noise_removals'] += stats.noise_removals
-            accumulated_stats['replacement_details'].extend(stats.replacement_details)
-            return processed_text
+        def batch_func(texts):
+            nonlocal stats
+            outputs, stats = self.engine.process_many(texts)
+            return outputs
 
-        srt_processor.apply_text_transform(transform_func)
+        srt_processor.apply_batch_transform(batch_func)
 
         # 获取处理后的内容
         modified_content = srt_processor.get_modified_content()
 
+        report = self._build_report(
+            srt_processor.get_statistics(),
+            srt_processor.get_diff_data(self.engine.plan),
+            stats
+        )
+
+        return modified_content, report
+
+    def process_stream(
+        self,
+        source: Union[IO, Iterable[bytes]],
+        output: IO[str],
+        diff_output: Optional[IO[str]] = None,
+        batch_size: int = _STREAM_BATCH_SIZE,
+        index: Optional[TermIndexBuilder] = None
+    ) -> Dict[str, Any]:
+        """
+        流式处理 SRT 内容：边解析、边按批处理、边写出
+
+        每次只在内存中保留一批字幕，输出与 process_file 完全一致，
+        内存占用与文件大小无关；差异数据逐条写入 diff_output，不包含在报告中，
+        报告中的 diff_rules 为差异数据引用的规则表
+
+        Args:
+            source: 文本文件对象、二进制文件对象或字节块迭代器
+            output: 写出处理结果的文本文件对象
+            diff_output: 写出差异数据（JSON Lines）的文本文件对象
+            batch_size: 每批交给引擎的字幕条数
+            index: 提供时记录每条字幕命中的规则（供字典修改后增量处理），
+                文本无法批量处理时停止记录并把 index 置为无效
+
+        Returns:
+            处理报告（不含 diff_data）
+        """
+        logger.info("开始流式处理 SRT 文件")
+
+        entries = SRTParser.iter_parse(source)
+        stats = ReplacementStats()
+        total = 0
+        changed = 0
+        plan = self.engine.plan
+
+        diff_writer = DiffWriter(diff_output) if diff_output is not None else None
+
+        def transformed_entries():
+            nonlocal stats, total, changed
+
+            while True:
+                batch = list(islice(entries, batch_size))
+                if not batch:
+                    break
+
+                texts = [entry.text for entry in batch]
+                if index is not None and index.valid:
+                    outputs, batch_stats, results = self.engine.process_detailed(texts)
+                    if results is None:
+                        index.valid = False
+                    else:
+                        index.add_results(total, results, plan)
+                else:
+                    outputs, batch_stats = self.engine.process_many(texts)
+                stats = self.engine.merge_stats([stats, batch_stats])
+
+                for entry, text in zip(batch, outputs):
+                    entry.text = text
+                    total += 1
+                    if SRTProcessor.is_modified(entry):
+                        changed += 1
+                    if diff_writer is not None:
+                        diff_writer.write(SRTProcessor.diff_item(entry, plan))
+                    yield entry
+
+        SRTParser.write(transformed_entries(), output)
+
+        report = self._build_report(SRTProcessor.summarize(total, changed), None, stats)
+        if diff_writer is not None:
+            diff_writer.flush()
+            report['diff_rules'] = diff_writer.rules
+
+        return report
+
+    def merge_parts(
+        self,
+        parts: List[Tuple[str, str, Dict[str, Any], Optional[Dict[str, Any]]]],
+        output: IO[str],
+        diff_output: IO[str],
+        index: Optional[TermIndexBuilder] = None
+    ) -> Dict[str, Any]:
+        """
+        按顺序合并各分块 process_stream 的结果，与整体流式处理的结果一致
+
+        处理后的文本依次拼接；差异数据中的规则下标换算为合并后的规则表，
+        跨分块的未修改区间合并为一个；统计信息按规则优先级合并
+
+        Args:
+            parts: [(分块输出路径, 分块差异数据路径, 分块报告, 分块索引)]，按分块顺序排列
+            output: 写出处理结果的文本文件对象
+            diff_output: 写出差异数据的文本文件对象
+            index: 提供时合并各分块的索引（有分块没有索引时置为无效）
+
+        Returns:
+            处理报告（不含 diff_data）
+        """
+        diff_writer = DiffWriter(diff_output)
+        stats_list = []
+        total = 0
+        changed = 0
+
+        for output_path, diff_path, report, part_index in parts:
+            srt_stats = report['srt_stats']
+            if srt_stats['total_entries']:
+                if total:
+                    output.write('\n')
+                with open(output_path, 'r', encoding='utf-8', newline='') as f:
+                    shutil.copyfileobj(f, output)
+
+            rules = report['diff_rules']
+            with open(diff_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    item = json.loads(line)
+                    if item['type'] != 'unchanged':
+                        item['ops'] = [
+                            [start, end, replacement, rules[rule] if rule is not None else None]
+                            for start, end, replacement, rule in item['ops']
+                        ]
+                    diff_writer.write(item)
+
+            if index is not None:
+                if part_index is None:
+                    index.valid = False
+                elif index.valid:
+                    for position, terms, noise in iter_index_entries(part_index):
+                        index.add(total + position, terms, noise)
+
+            total += srt_stats['total_entries']
+            changed += srt_stats['modified_entries']
+            stats_list.append(_report_stats(report))
+
+        diff_writer.flush()
+        if index is not None:
+            index.total = total
+
+        report = self._build_report(
+            SRTProcessor.summarize(total, changed), None, self.engine.merge_stats(stats_list)
+        )
+        report['diff_rules'] = diff_writer.rules
+        return report
+
+    def reprocess_stream(
+        self,
+        source: Union[IO, Iterable[bytes]],
+        previous_diff: IO[str],
+        previous_index: Dict[str, Any],
+        previous_plan: RulePlan,
+        output: IO[str],
+        diff_output: IO[str],
+        index: TermIndexBuilder
+    ) -> Optional[Dict[str, Any]]:
+        """
+        字典修改后增量处理：只重新处理可能受影响的条目，其余条目沿用上次的结果
+
+        上次的处理结果由原文与上次的差异数据还原，替换次数取自上次的索引；
+        输出、差异数据与报告与完整处理一致
+
+        Args:
+            source: 原始文件
+            previous_diff: 上次处理写出的差异数据
+            previous_index: 上次处理记录的索引（含 diff_rules）
+            previous_plan: 上次处理使用的规则执行计划
+            output: 写出处理结果的文本文件对象
+            diff_output: 写出差异数据的文本文件对象
+            index: 记录本次的索引
+
+        Returns:
+            处理报告，无法增量处理（字典差异无法按条目判断、原文与上次不一致）时返回 None
+        """
+        changes = dictionary_changes(previous_plan, self.engine.plan)
+        if changes is None:
+            return None
+
+        entries = list(SRTParser.iter_parse(source))
+        if len(entries) != previous_index['total']:
+            return None
+        previous_items = list(expand_diff_items(previous_diff))
+        if len(previous_items) != len(entries):
+            return None
+
+        texts = [entry.text for entry in entries]
+        affected = sorted(affected_positions(previous_index, texts, changes))
+        logger.info(f"增量处理: {len(entries)} 条字幕中 {len(affected)} 条可能受字典修改影响")
+
+        outputs, processed_stats, results = self.engine.process_detailed([texts[i] for i in affected])
+        if results is None:
+            return None
+        reprocessed = dict(zip(affected, zip(outputs, results)))
+
+        plan = self.engine.plan
+        previous_rules = previous_index.get('diff_rules', [])
+        previous_entries = iter_index_entries(previous_index)
+        next_previous = next(previous_entries, None)
+
+        diff_writer = DiffWriter(diff_output)
+        changed = 0
+
+        def patched_entries():
+            nonlocal next_previous, changed
+
+            for position, entry in enumerate(entries):
+                # 上次的索引记录与本条对应时取出
+                previous = None
+                if next_previous is not None and next_previous[0] == position:
+                    previous = next_previous
+                    next_previous = next(previous_entries, None)
+
+                item = previous_items[position]
+                if position in reprocessed:
+                    entry.text, result = reprocessed[position]
+                    index.add_results(position, [result], plan)
+                    diff_writer.write(SRTProcessor.diff_item(entry, plan))
+                else:
+                    if item is not None:
+                        if item['original'] != entry.original_text:
+                            raise _StaleResultError()
+                        entry.text = apply_edit_ops(item['original'], item['ops'])
+                        diff_writer.write({
+                            **item,
+                            'ops': [
+                                [start, end, replacement, previous_rules[rule] if rule is not None else None]
+                                for start, end, replacement, rule in item['ops']
+                            ]
+                        })
+                    else:
+                        diff_writer.write({'type': 'unchanged', 'index': entry.index})
+                    if previous is not None:
+                        index.add(position, previous[1], previous[2])
+
+                if SRTProcessor.is_modified(entry):
+                    changed += 1
+                yield entry
+
+        try:
+            SRTParser.write(patched_entries(), output)
+        except _StaleResultError:
+            return None
+        diff_writer.flush()
+        index.total = len(entries)
+
+        # 由索引汇总全部条目的替换次数，规则按优先级排列
+        term_totals, noise_totals = index.totals()
+        stats = ReplacementStats(
+            replacement_details=[
+                {'source': source, 'target': target, 'count': count, 'category': category}
+                for (source, target, category), count in term_totals.items()
+            ],
+            noise_details=noise_totals
+        )
+        stats.term_corrections = sum(term_totals.values())
+        stats.noise_removals = sum(noise_totals.values())
+        stats.total_replacements = stats.term_corrections + stats.noise_removals
+        stats = self.engine.merge_stats([stats])
+        stats.memo_hits = processed_stats.memo_hits
+        stats.memo_misses = processed_stats.memo_misses
+
+        report = self._build_report(SRTProcessor.summarize(len(entries), changed), None, stats)
+        report['diff_rules'] = diff_writer.rules
+        report['incremental'] = {'reprocessed_entries': len(affected), 'total_entries': len(entries)}
+        return report
+
+    def _build_report(
+        self,
+        srt_stats: Dict[str, Any],
+        diff_data: Optional[List[Dict[str, Any]]],
+        stats: ReplacementStats
+    ) -> Dict[str, Any]:
+        """生成处理报告（diff_data 为 None 时报告中不含差异数据）"""
         # 合并相同 source 的替换详情
         merged_details = {}
-        for detail in accumulated_stats['replacement_details']:
+        for detail in stats.replacement_details:
             source = detail.get('source', '')
             if source in merged_details:
                 merged_details[source]['count'] += detail.get('count', 0)
             else:
                 merged_details[source] = detail.copy()
 
-        # 生成处理报告
         report = {
-            'srt_stats': srt_processor.get_statistics(),
-            'diff_data': srt_processor.get_diff_data(),
+            'srt_stats': srt_stats,
+            # 直接使用条目记忆的条数与实际处理的条数
+            'entry_memo': {'hits': stats.memo_hits, 'misses': stats.memo_misses},
+            # 全部规则的替换次数，用于历史统计，不随任务结果保存
+            'replacement_details': stats.replacement_details,
             'replacement_stats': {
-                'total_replacements': accumulated_stats['total_replacements'],
-                'term_corrections': accumulated_stats['term_corrections'],
-                'noise_removals': accumulated_stats['noise_removals'],
+                'total_replacements': stats.total_replacements,
+                'term_corrections': stats.term_corrections,
+                'noise_removals': stats.noise_removals,
+                'noise_details': stats.noise_details,
                 'top_replacements': self._get_top_replacements(
                     list(merged_details.values())
                 )
             }
         }
 
+        if diff_data is not None:
+            report['diff_data'] = diff_data
+
         logger.info(
-            f"处理完成: 修改 {report['srt_stats']['modified_entries']} 条字幕, "
-            f"替换 {accumulated_stats['total_replacements']} 次"
+            f"处理完成: 修改 {srt_stats['modified_entries']} 条字幕, "
+            f"替换 {stats.total_replacements} 次"
         )
 
-        return modified_content, report
+        return report
+
+    def _load_json(self, file_path: Path, strict: bool = False) -> Dict[str, Any]:
+        """加载 JSON 文件（strict 为 True 时失败抛出异常）"""
+        if strict:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
 
-    def _load_json(self, file_path: Path) -> Dict[str, Any]:
-        """加载 JSON 文件"""
         try:
             if not file_path.exists():
                 logger.warning(f"字典文件不存在: {file_path}")
@@ -142,6 +442,25 @@ class SubtitleProcessor:
         return sorted_details[:top_n]
 
 
+def _report_stats(report: Dict[str, Any]) -> ReplacementStats:
+    """由处理报告还原统计信息（合并分块结果时使用）"""
+    replacement_stats = report['replacement_stats']
+    entry_memo = report.get('entry_memo') or {}
+    return ReplacementStats(
+        total_replacements=replacement_stats['total_replacements'],
+        term_corrections=replacement_stats['term_corrections'],
+        noise_removals=replacement_stats['noise_removals'],
+        replacement_details=report['replacement_details'],
+        noise_details=dict(replacement_stats['noise_details']),
+        memo_hits=entry_memo.get('hits', 0),
+        memo_misses=entry_memo.get('misses', 0)
+    )
+
+
+class _StaleResultError(Exception):
+    """上次的处理结果与原文不一致，不能增量处理"""
+
+
 def create_default_processor() -> SubtitleProcessor:
     """创建默认配置的处理器"""
     return SubtitleProcessor()
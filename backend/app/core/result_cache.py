@@ -0,0 +1,252 @@
+"""
+处理结果缓存 - 相同的输入文件在同一字典版本、同一处理选项下不再重复处理
+缓存键为 (输入内容的 SHA-256, 字典版本, 处理选项) 的哈希；每个条目是一个目录，
+保存处理后的文件、差异数据与处理报告。缓存总大小超过上限时按最近使用时间淘汰
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 条目目录中的文件名
+_OUTPUT_FILE = 'output.srt'
+_DIFF_FILE = 'diff.jsonl'
+_REPORT_FILE = 'report.json'
+
+# 计算文件哈希时每次读取的字节数
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+# 保存文件摘要的附属文件后缀（上传时已计算的摘要，处理时无需重新读取文件）
+_DIGEST_SUFFIX = '.sha256'
+
+# 超过此时间（秒）的临时目录视为进程异常退出时留下的，扫描时删除
+_STALE_TEMP_AGE = 3600
+
+
+def file_digest(path: Path) -> str:
+    """文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def save_file_digest(path: Path, digest: str) -> None:
+    """把已计算的文件摘要保存在文件旁边，供 stored_file_digest 使用"""
+    digest_path = path.with_name(path.name + _DIGEST_SUFFIX)
+    digest_path.write_text(digest, encoding='ascii')
+
+
+def stored_file_digest(path: Path) -> str:
+    """
+    文件内容的 SHA-256，优先使用 save_file_digest 保存的摘要
+
+    没有保存的摘要、摘要无效或文件在摘要保存之后被修改时重新计算
+    """
+    digest_path = path.with_name(path.name + _DIGEST_SUFFIX)
+    try:
+        if digest_path.stat().st_mtime_ns >= path.stat().st_mtime_ns:
+            digest = digest_path.read_text(encoding='ascii').strip()
+            if len(digest) == 64 and all(c in '0123456789abcdef' for c in digest):
+                return digest
+    except (OSError, UnicodeDecodeError):
+        pass
+    return file_digest(path)
+
+
+def cache_key(input_digest: str, dictionary_version: str, options: Dict[str, Any]) -> str:
+    """由输入内容哈希、字典版本与处理选项生成缓存键"""
+    material = json.dumps(
+        [input_digest, dictionary_version, options],
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def link_or_copy(source: Path, target: Path) -> None:
+    """把文件放到 target（优先硬链接，不支持时复制），target 已存在时覆盖"""
+    temp_path = target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, target)
+
+
+class ResultCache:
+    """
+    磁盘上的处理结果缓存（LRU）
+
+    内存中按最近使用顺序记录各条目的大小，首次使用时扫描缓存目录建立（按报告文件的
+    修改时间排序），命中时更新报告文件的修改时间。多个 worker 进程共享同一目录，
+    条目被其他进程淘汰时视为未命中
+    """
+
+    def __init__(self, cache_dir: Path = None, max_bytes: int = None):
+        self.cache_dir = cache_dir or settings.RESULT_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else settings.RESULT_CACHE_MAX_BYTES
+        self._lock = threading.Lock()
+        # {缓存键: 条目大小}，按最近使用时间从旧到新排列
+        self._entries: Optional[OrderedDict] = None
+        self._total_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str, output_path: Path, diff_path: Path) -> Optional[Dict[str, Any]]:
+        """
+        查找缓存，命中时把处理后的文件与差异数据放到指定路径
+
+        Returns:
+            处理报告，未命中时返回 None
+        """
+        entry_dir = self.cache_dir / key
+        with self._lock:
+            self._loaded()
+
+        # 条目可能由其他进程保存，不只查内存中的索引
+        report = None
+        try:
+            with open(entry_dir / _REPORT_FILE, 'r', encoding='utf-8') as f:
+                report = json.load(f)
+            link_or_copy(entry_dir / _OUTPUT_FILE, output_path)
+            link_or_copy(entry_dir / _DIFF_FILE, diff_path)
+            os.utime(entry_dir / _REPORT_FILE)
+        except FileNotFoundError:
+            # 未缓存，或已被其他进程淘汰
+            report = None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取处理结果缓存 {key[:12]} 失败: {e}")
+            report = None
+
+        with self._lock:
+            if report is None:
+                self._misses += 1
+                self._forget(key)
+            else:
+                self._hits += 1
+                if key not in self._entries:
+                    self._entries[key] = self._entry_size(entry_dir)
+                    self._total_bytes += self._entries[key]
+                self._entries.move_to_end(key)
+        return report
+
+    def put(self, key: str, output_path: Path, diff_path: Path, report: Dict[str, Any]) -> None:
+        """保存处理结果（先写临时目录再改名，读取方不会看到不完整的条目）"""
+        entry_dir = self.cache_dir / key
+        temp_dir = self.cache_dir / f".{key}.{uuid.uuid4().hex}.tmp"
+        try:
+            temp_dir.mkdir(parents=True)
+            link_or_copy(output_path, temp_dir / _OUTPUT_FILE)
+            link_or_copy(diff_path, temp_dir / _DIFF_FILE)
+            with open(temp_dir / _REPORT_FILE, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False)
+            size = self._entry_size(temp_dir)
+            os.rename(temp_dir, entry_dir)
+        except OSError as e:
+            # 其他进程已保存了同一条目，或磁盘错误；缓存失败不影响处理结果
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            if not entry_dir.exists():
+                logger.warning(f"保存处理结果缓存失败: {e}")
+            return
+
+        with self._lock:
+            entries = self._loaded()
+            if key not in entries:
+                entries[key] = size
+                self._total_bytes += size
+            stale = self._evict()
+
+        for stale_key in stale:
+            shutil.rmtree(self.cache_dir / stale_key, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存的命中次数、未命中次数、淘汰次数与当前大小（命中次数为本进程的计数）"""
+        with self._lock:
+            entries = self._loaded()
+            lookups = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else 0.0,
+                'evictions': self._evictions,
+                'entries': len(entries),
+                'total_bytes': self._total_bytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def clear(self) -> None:
+        """删除全部缓存条目"""
+        with self._lock:
+            self._entries = OrderedDict()
+            self._total_bytes = 0
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _loaded(self) -> OrderedDict:
+        """条目索引（首次使用时扫描缓存目录，调用方需持有锁）"""
+        if self._entries is None:
+            found = []
+            now = time.time()
+            if self.cache_dir.exists():
+                for entry_dir in self.cache_dir.iterdir():
+                    if entry_dir.name.startswith('.'):
+                        # 临时目录，可能正由其他进程写入
+                        try:
+                            if now - entry_dir.stat().st_mtime > _STALE_TEMP_AGE:
+                                shutil.rmtree(entry_dir, ignore_errors=True)
+                        except OSError:
+                            pass
+                        continue
+                    try:
+                        used = (entry_dir / _REPORT_FILE).stat().st_mtime
+                    except OSError:
+                        continue
+                    found.append((used, entry_dir.name, self._entry_size(entry_dir)))
+
+            found.sort()
+            self._entries = OrderedDict((key, size) for _, key, size in found)
+            self._total_bytes = sum(self._entries.values())
+        return self._entries
+
+    def _evict(self) -> List[str]:
+        """从索引中移除最久未使用的条目直到不超过大小上限，返回要删除的键（调用方需持有锁）"""
+        stale = []
+        # 至少保留最新的条目
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self._evictions += 1
+            stale.append(key)
+        return stale
+
+    def _forget(self, key: str) -> None:
+        """从索引中移除条目（调用方需持有锁）"""
+        self._total_bytes -= self._entries.pop(key, 0)
+
+    @staticmethod
+    def _entry_size(entry_dir: Path) -> int:
+        total = 0
+        for name in (_OUTPUT_FILE, _DIFF_FILE, _REPORT_FILE):
+            try:
+                total += (entry_dir / name).stat().st_size
+            except OSError:
+                continue
+        return total
+
+
+# 全局处理结果缓存实例
+result_cache = ResultCache()
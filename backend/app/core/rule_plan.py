@@ -0,0 +1,338 @@
+"""
+编译后的规则执行计划
+在字典加载时一次性完成排序、正则编译和边界判定，处理阶段只执行计划
+"""
+
+import re
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .automaton import AhoCorasick
+from .bilingual import BilingualIndex
+
+logger = logging.getLogger(__name__)
+
+# 英文单词判定：纯英文字母、数字、连字符
+_ENGLISH_WORD_PATTERN = re.compile(r'^[a-zA-Z0-9\-]+$')
+
+
+def is_english_word(text: str) -> bool:
+    """
+    判断是否为纯英文单词
+
+    Args:
+        text: 待判断文本
+
+    Returns:
+        True 如果是纯英文单词
+    """
+    return bool(_ENGLISH_WORD_PATTERN.match(text))
+
+
+# 保护词正则中标记"起始位置满足英文边界"的空分组名
+_START_BOUNDARY_GROUP = 'start_boundary'
+
+# 英文单词结束处的边界判定：起始满足边界且后面不是英文字母数字
+_ENGLISH_WORD_END = rf'(?({_START_BOUNDARY_GROUP})(?![a-zA-Z0-9])|(?!))'
+
+
+def _trie_to_regex(node: Dict[str, Any]) -> str:
+    """
+    将字典树节点转换为正则片段
+
+    子分支在前、词尾在后，使回溯时优先尝试更长的词
+    """
+    alternatives = [
+        re.escape(ch) + _trie_to_regex(child)
+        for ch, child in node.items()
+        if ch != ''
+    ]
+
+    # 空串键标记词尾，值表示该词是否为英文单词
+    if '' in node:
+        alternatives.append(_ENGLISH_WORD_END if node[''] else '')
+
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return '(?:' + '|'.join(alternatives) + ')'
+
+
+def build_protected_pattern(words: List[str]) -> Optional[re.Pattern]:
+    """
+    将全部保护词编译为一个字典树优化的正则（忽略大小写，长词优先）
+
+    英文单词要求前后均非英文字母数字，支持英文与中文相邻的情况；
+    起始边界用可选空分组记录，由各英文词尾通过条件分组判定，
+    因此英文与非英文保护词可以共享同一棵字典树
+
+    Args:
+        words: 保护词列表
+
+    Returns:
+        编译后的正则，没有保护词时返回 None
+    """
+    trie: Dict[str, Any] = {}
+
+    for word in words:
+        if not word:
+            continue
+
+        node = trie
+        for ch in word.lower():
+            node = node.setdefault(ch, {})
+        node[''] = node.get('', False) or is_english_word(word)
+
+    if not trie:
+        return None
+
+    pattern = (
+        rf'(?:(?<![a-zA-Z0-9])(?P<{_START_BOUNDARY_GROUP}>))?'
+        + _trie_to_regex(trie)
+    )
+    return re.compile(pattern, re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class CompiledTerm:
+    """编译后的修正规则"""
+    source: str
+    target: str
+    category: str
+    is_english: bool
+
+    @property
+    def active(self) -> bool:
+        """source 与 target 均非空的规则才参与替换"""
+        return bool(self.source and self.target)
+
+
+@dataclass(frozen=True)
+class NoisePattern:
+    """编译后的噪音模式"""
+    pattern: str
+    regex: re.Pattern
+
+
+# 无法安全合并进单个正则的写法：反向引用、命名反向引用、条件分组
+_UNFUSABLE_NOISE_PATTERN = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+# 可能匹配到条目分隔符或依赖文本首尾的写法：任意字符、取反字符集、锚点
+_ENTRY_SPANNING_NOISE_PATTERN = re.compile(r'(?<!\\)[.^$]|\\[WSDAZ]|\[\^')
+
+
+@dataclass(frozen=True)
+class NoiseMatcher:
+    """
+    合并后的噪音匹配器
+
+    可合并的模式按原顺序放入一个交替正则，重复 subn 直到没有匹配（移除后露出的嵌套噪音也被移除）；
+    含反向引用等无法合并的模式作为 fallback 逐个执行。
+    结果是全部可合并模式都不再匹配的文本，与逐个执行有两点有意的不同：
+    嵌套的噪音不论内外层模式的先后顺序都会移除（逐个执行只在内层模式靠前时移除）；
+    两个模式的匹配相互重叠时取最左的匹配（同一位置取靠前的模式），而不是先执行的模式优先
+
+    交替分支不使用捕获分组，以保留 re 模块的首字符快速跳过优化；
+    只在命中时通过 identify 找出对应的模式，用于归属次数
+    """
+    fused: Optional[re.Pattern]
+    # 按交替分支顺序排列的可合并模式
+    fused_patterns: Tuple[NoisePattern, ...]
+    fallback: Tuple[NoisePattern, ...]
+    # 全部模式都不会跨越条目分隔符，批量处理时可在拼接后的整段文本上执行
+    joinable: bool = True
+
+    def identify(self, match: re.Match) -> NoisePattern:
+        """
+        找出合并正则的一次匹配来自哪个模式
+
+        交替分支按顺序尝试，第一个能在该位置匹配的分支即为命中的分支
+        """
+        for noise in self.fused_patterns:
+            if noise.regex.match(match.string, match.start()):
+                return noise
+        return self.fused_patterns[-1]
+
+
+def fuse_noise_patterns(noise_patterns: Sequence[NoisePattern]) -> NoiseMatcher:
+    """
+    将噪音模式合并为一个交替正则
+
+    以下模式会回退为逐个执行:
+    - 含反向引用或条件分组（合并后分组编号会改变）
+    - 可以匹配空串（会遮蔽后续分支）
+    - 与已合并部分组合后无法编译（如重复的分组名、非开头的全局标志）
+    """
+    fused_parts: List[str] = []
+    fused_patterns: List[NoisePattern] = []
+    fallback: List[NoisePattern] = []
+    fused = None
+
+    for noise in noise_patterns:
+        if (
+            _UNFUSABLE_NOISE_PATTERN.search(noise.pattern)
+            or noise.regex.fullmatch('') is not None
+        ):
+            fallback.append(noise)
+            continue
+
+        part = f'(?:{noise.pattern})'
+
+        try:
+            candidate = re.compile('|'.join(fused_parts + [part]))
+        except re.error:
+            fallback.append(noise)
+            continue
+
+        fused_parts.append(part)
+        fused_patterns.append(noise)
+        fused = candidate
+
+    if fallback:
+        logger.info(f"{len(fallback)} 种噪音模式无法合并，将逐个执行")
+
+    joinable = not any(
+        _ENTRY_SPANNING_NOISE_PATTERN.search(noise.pattern)
+        for noise in noise_patterns
+    )
+
+    return NoiseMatcher(
+        fused=fused,
+        fused_patterns=tuple(fused_patterns),
+        fallback=tuple(fallback),
+        joinable=joinable
+    )
+
+
+@dataclass(frozen=True)
+class RulePlan:
+    """
+    不可变的规则执行计划
+
+    terms 已按 source 长度降序排列（同长度保持原顺序），下标即优先级，
+    automaton 与 bilingual_index 中的优先级下标与 terms 一一对应
+    """
+    terms: Tuple[CompiledTerm, ...]
+    automaton: AhoCorasick
+    bilingual_index: BilingualIndex
+    protected_words: Tuple[str, ...]
+    # 全部保护词合并后的单个正则，没有保护词时为 None
+    protected_pattern: Optional[re.Pattern]
+    noise_patterns: Tuple[NoisePattern, ...]
+    noise_matcher: NoiseMatcher
+
+    @property
+    def max_source_length(self) -> int:
+        """最长的 source 长度"""
+        return self.automaton.max_length
+
+
+def compile_rule_plan(
+    correction_terms: List[Dict[str, str]],
+    protected_words: List[str],
+    noise_patterns: List[Any],
+    base: Optional[RulePlan] = None
+) -> RulePlan:
+    """
+    编译规则执行计划
+
+    提供 base（上一版本的计划）时，输入未变化的部分直接复用 base 中已编译的结果：
+    只修改 target 或分类时复用自动机，只修改保护词时复用全部修正规则的编译结果；
+    新增、删除规则时自动机与双语标注索引在 base 的基础上增量更新，不重新构建
+
+    Args:
+        correction_terms: 修正规则列表 [{"source": "...", "target": "..."}]
+        protected_words: 保护词列表
+        noise_patterns: 噪音正则表达式列表（字符串或 {"pattern": "..."}）
+        base: 上一版本的规则执行计划
+
+    Returns:
+        规则执行计划
+    """
+    sorted_terms = sorted(
+        correction_terms,
+        key=lambda x: len(x.get('source', '')),
+        reverse=True
+    )
+
+    # 未修改的规则沿用 base 中的编译结果
+    compiled_terms: Dict[Tuple[str, str, str], CompiledTerm] = {
+        (term.source, term.target, term.category): term
+        for term in (base.terms if base is not None else ())
+    }
+
+    terms = []
+    for term in sorted_terms:
+        key = (term.get('source', ''), term.get('target', ''), term.get('category', '术语映射'))
+        compiled = compiled_terms.get(key)
+        if compiled is None:
+            compiled = CompiledTerm(
+                source=key[0],
+                target=key[1],
+                category=key[2],
+                is_english=is_english_word(key[0])
+            )
+        terms.append(compiled)
+    terms = tuple(terms)
+
+    # 不参与替换的规则用空串占位，保持下标与优先级一致；
+    # 新增、删除规则时在 base 的自动机上增量更新（优先级变化只需重新映射）
+    patterns = [term.source if term.active else '' for term in terms]
+    if base is None:
+        automaton = AhoCorasick(patterns)
+    elif base.automaton.patterns == patterns:
+        automaton = base.automaton
+    else:
+        automaton = base.automaton.updated(patterns)
+
+    # 双语标注索引: source -> [(优先级, target)]
+    pairs = [(term.source, term.target) for term in terms]
+    if base is None:
+        bilingual_index = BilingualIndex(pairs)
+    elif [(term.source, term.target) for term in base.terms] == pairs:
+        bilingual_index = base.bilingual_index
+    else:
+        bilingual_index = base.bilingual_index.updated(pairs)
+
+    compiled_protected = tuple(word for word in protected_words if word)
+    if base is not None and base.protected_words == compiled_protected:
+        protected_pattern = base.protected_pattern
+    else:
+        protected_pattern = build_protected_pattern(compiled_protected)
+
+    compiled_noise = []
+    for pattern_item in noise_patterns:
+        # 支持两种格式: 字符串或字典
+        if isinstance(pattern_item, dict):
+            pattern = pattern_item.get('pattern', '')
+        else:
+            pattern = pattern_item
+
+        if not pattern:
+            continue
+
+        try:
+            compiled_noise.append(NoisePattern(pattern=pattern, regex=re.compile(pattern)))
+        except re.error as e:
+            logger.warning(f"忽略无效的噪音模式 '{pattern}': {e}")
+
+    compiled_noise = tuple(compiled_noise)
+    if base is not None and base.noise_patterns == compiled_noise:
+        noise_matcher = base.noise_matcher
+    else:
+        noise_matcher = fuse_noise_patterns(compiled_noise)
+
+    logger.info(
+        f"规则计划编译完成: {len(terms)} 条修正规则, "
+        f"{len(compiled_protected)} 个保护词, {len(compiled_noise)} 种噪音模式"
+    )
+
+    return RulePlan(
+        terms=terms,
+        automaton=automaton,
+        bilingual_index=bilingual_index,
+        protected_words=compiled_protected,
+        protected_pattern=protected_pattern,
+        noise_patterns=compiled_noise,
+        noise_matcher=noise_matcher
+    )
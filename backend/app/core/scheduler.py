@@ -0,0 +1,165 @@
+"""
+任务调度器 - 有界队列 + 并发上限 + 超时控制
+按虚拟截止时间（提交时间 + 任务开销权重）调度，小任务不会被排在大任务之后长时间等待，
+大任务的截止时间固定，也不会被源源不断的小任务饿死
+"""
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    """等待队列已满"""
+
+
+@dataclass(order=True)
+class _Job:
+    """排队中的任务，按 (虚拟截止时间, 提交序号) 排序"""
+    deadline: float
+    seq: int
+    task_id: str = field(compare=False)
+    run: Callable[[], Awaitable[None]] = field(compare=False)
+    on_timeout: Optional[Callable[[], Any]] = field(compare=False, default=None)
+
+
+class JobScheduler:
+    """
+    异步任务调度器
+
+    所有方法都在事件循环线程中调用，不需要额外加锁
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queued: int,
+        timeout: float,
+        cost_weight: float = 1.0
+    ):
+        """
+        初始化调度器
+
+        Args:
+            max_concurrent: 同时运行的任务数上限
+            max_queued: 等待队列长度上限
+            timeout: 单个任务的运行超时（秒），不含排队时间。超时只取消任务的协程，
+                线程或进程中已在运行的工作无法中断；任务应在取消时等这些工作结束后再退出
+                （如 worker_pool.run_job），协程结束前并发名额不会释放
+            cost_weight: 每单位开销推迟的截止时间（秒）
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self.cost_weight = cost_weight
+
+        self._queue: List[_Job] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._seq = itertools.count()
+
+    def submit(
+        self,
+        task_id: str,
+        run: Callable[[], Awaitable[None]],
+        cost: float = 0.0,
+        on_timeout: Optional[Callable[[], Any]] = None
+    ) -> int:
+        """
+        提交任务
+
+        Args:
+            task_id: 任务ID
+            run: 返回协程的可调用对象
+            cost: 任务开销（如输入文件的 MB 数），决定虚拟截止时间
+            on_timeout: 任务超时后的回调，可以返回协程（如在线程中写数据库）
+
+        Returns:
+            排队位置（从 1 开始），0 表示已立即开始运行
+
+        Raises:
+            QueueFullError: 等待队列已满
+        """
+        if self.queued_count() >= self.max_queued:
+            raise QueueFullError(f"等待队列已满（{self.max_queued} 个任务）")
+
+        deadline = time.monotonic() + cost * self.cost_weight
+        heapq.heappush(
+            self._queue,
+            _Job(deadline, next(self._seq), task_id, run, on_timeout)
+        )
+        self._dispatch()
+
+        return self.queue_position(task_id) or 0
+
+    def queue_position(self, task_id: str) -> Optional[int]:
+        """
+        任务在等待队列中的位置
+
+        Returns:
+            位置（从 1 开始），任务不在队列中时返回 None
+        """
+        for position, job in enumerate(sorted(self._queue), start=1):
+            if job.task_id == task_id:
+                return position
+        return None
+
+    def queue_key(self, task_id: str) -> Optional[Tuple[float, int]]:
+        """
+        任务在等待队列中的排序键 (虚拟截止时间, 提交序号)，按此键排序即为排队顺序；
+        任务不在队列中时返回 None
+        """
+        for job in self._queue:
+            if job.task_id == task_id:
+                return job.deadline, job.seq
+        return None
+
+    def queued_count(self) -> int:
+        """等待中的任务数"""
+        return len(self._queue)
+
+    def running_count(self) -> int:
+        """运行中的任务数"""
+        return len(self._running)
+
+    async def shutdown(self) -> None:
+        """取消全部任务"""
+        self._queue.clear()
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _dispatch(self) -> None:
+        """在并发上限内启动截止时间最早的任务"""
+        while self._queue and len(self._running) < self.max_concurrent:
+            job = heapq.heappop(self._queue)
+            task = asyncio.create_task(self._run(job))
+            self._running[job.task_id] = task
+            task.add_done_callback(lambda _, task_id=job.task_id: self._finish(task_id))
+
+    async def _run(self, job: _Job) -> None:
+        # wait_for 超时后等被取消的协程真正结束才返回，名额在此之后才释放
+        try:
+            await asyncio.wait_for(job.run(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"任务 {job.task_id} 超时（{self.timeout} 秒）")
+            if job.on_timeout is not None:
+                result = job.on_timeout()
+                if inspect.isawaitable(result):
+                    await result
+        except asyncio.CancelledError:
+            logger.info(f"任务 {job.task_id} 已取消")
+            raise
+        except Exception as e:
+            logger.error(f"任务 {job.task_id} 异常结束: {e}", exc_info=True)
+
+    def _finish(self, task_id: str) -> None:
+        self._running.pop(task_id, None)
+        self._dispatch()
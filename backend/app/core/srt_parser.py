@@ -3,13 +3,68 @@ SRT 字幕文件解析器
 支持标准 SRT 格式的解析和生成
 """
 
+import io
 import re
 import logging
-from typing import List, Optional
+from typing import IO, Iterable, Iterator, List, Optional, Tuple, Union
 from dataclasses import dataclass
 
+from .diff_store import compact_diff_items
+from .edit_script import build_edit_ops
+from .rule_plan import RulePlan
+
 logger = logging.getLogger(__name__)
 
+# 字幕块之间的空行（只含 ASCII 空白字符）；空行结束当前字幕块，在其后切分不改变解析结果
+_BLANK_LINE_PATTERN = re.compile(rb'\n[ \t\r\f\v]*\n')
+
+# 切分文件时每次读取的字节数
+_SPLIT_BLOCK_SIZE = 1 << 20
+
+
+class _ChunkStream(io.RawIOBase):
+    """把字节块迭代器包装为可读的二进制流"""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._pending = b''
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def _iter_text_lines(source: Union[IO, Iterable[bytes]], encoding: str) -> Iterator[str]:
+    """
+    按行读取文本（统一换行符为 \\n）
+
+    文本文件对象直接按行迭代；二进制文件对象与字节块迭代器按指定编码增量解码
+    """
+    if isinstance(source, io.TextIOBase):
+        yield from source
+        return
+
+    if not hasattr(source, 'read'):
+        source = io.BufferedReader(_ChunkStream(source))
+
+    reader = io.TextIOWrapper(source, encoding=encoding)
+    try:
+        yield from reader
+    finally:
+        # 解除包装，避免关闭调用方传入的文件对象
+        reader.detach()
+
 
 @dataclass
 class SubtitleEntry:
@@ -64,46 +119,166 @@ class SRTParser:
         blocks = re.split(r'\n\s*\n', content.strip())
 
         for block in blocks:
-            if not block.strip():
-                continue
+            entry = cls._parse_block(block)
+            if entry is not None:
+                entries.append(entry)
+
+        logger.info(f"成功解析 {len(entries)} 条字幕")
+        return entries
+
+    @classmethod
+    def iter_parse(
+        cls,
+        source: Union[IO, Iterable[bytes]],
+        encoding: str = 'utf-8'
+    ) -> Iterator[SubtitleEntry]:
+        """
+        流式解析 SRT 内容，逐条产出字幕条目
 
-            lines = block.strip().split('\n')
-            if len(lines) < 3:
-                logger.warning(f"无效的字幕块: {block[:50]}...")
+        按行读取并在空行处切分字幕块，内存占用只与单个字幕块大小相关；
+        对无效字幕块的容错与警告与 parse 一致
+
+        Args:
+            source: 文本文件对象、二进制文件对象或字节块迭代器
+            encoding: 二进制输入的编码
+
+        Yields:
+            字幕条目
+        """
+        count = 0
+        block_lines: List[str] = []
+
+        for line in _iter_text_lines(source, encoding):
+            if line.isspace() or not line:
+                # 空行（仅含空白字符）结束当前字幕块
+                if block_lines:
+                    entry = cls._parse_block('\n'.join(block_lines))
+                    block_lines = []
+                    if entry is not None:
+                        count += 1
+                        yield entry
                 continue
 
-            try:
-                # 第一行: 序号
-                index = int(lines[0].strip())
+            block_lines.append(line[:-1] if line.endswith('\n') else line)
 
-                # 第二行: 时间码
-                time_match = cls.TIME_PATTERN.search(lines[1])
-                if not time_match:
-                    logger.warning(f"无法解析时间码: {lines[1]}")
-                    continue
+        if block_lines:
+            entry = cls._parse_block('\n'.join(block_lines))
+            if entry is not None:
+                count += 1
+                yield entry
 
-                start_time = time_match.group(1)
-                end_time = time_match.group(2)
+        logger.info(f"成功解析 {count} 条字幕")
 
-                # 第三行及之后: 字幕文本
-                text = '\n'.join(lines[2:])
+    @staticmethod
+    def split_ranges(
+        source: IO[bytes],
+        max_parts: int,
+        min_entries: int,
+        block_size: int = _SPLIT_BLOCK_SIZE
+    ) -> List[Tuple[int, int]]:
+        """
+        在字幕块边界把 SRT 文件切分为若干字节区间
 
-                entry = SubtitleEntry(
-                    index=index,
-                    start_time=start_time,
-                    end_time=end_time,
-                    text=text,
-                    original_text=text  # 保存原始文本
-                )
+        只在空行之后切分，各区间分别用 iter_parse 解析的结果依次拼接与整体解析一致；
+        条数按开头一块中的空行数估计，每个区间约不少于 min_entries 条。
+        按块读取：只读开头一块用于估计，再从各目标位置起读到下一个空行为止，
+        不读入整个文件，也不解码、不解析，可在服务进程中执行
 
-                entries.append(entry)
+        Args:
+            source: 可定位（seek）的二进制文件对象
+            max_parts: 最多切分的区间数
+            min_entries: 每个区间的最少字幕条数
+            block_size: 每次读取的字节数
 
-            except (ValueError, IndexError) as e:
-                logger.error(f"解析字幕块失败: {e}, 内容: {block[:50]}...")
-                continue
+        Returns:
+            [(起点, 终点)]，首尾相接覆盖全部内容
+        """
+        size = source.seek(0, io.SEEK_END)
+        source.seek(0)
+        sample = source.read(block_size)
+        blank_lines = sample.count(b'\n\n') + sample.count(b'\n\r\n')
+        estimated = (blank_lines * size // len(sample) if sample else 0) + 1
+        parts = max(1, min(max_parts, estimated // max(min_entries, 1)))
+
+        ranges = []
+        start = 0
+        for i in range(1, parts):
+            end = SRTParser._next_boundary(source, max(start, size * i // parts), block_size)
+            if end is None:
+                break
+            ranges.append((start, end))
+            start = end
+        ranges.append((start, size))
+
+        return ranges
+
+    @staticmethod
+    def _next_boundary(source: IO[bytes], position: int, block_size: int) -> Optional[int]:
+        """从 position 起查找下一个空行，返回其后的位置；找不到时返回 None"""
+        source.seek(position)
+        buffer = b''
+        offset = position
+        while True:
+            block = source.read(block_size)
+            if not block:
+                return None
+            buffer += block
+            match = _BLANK_LINE_PATTERN.search(buffer)
+            if match is not None:
+                return offset + match.end()
+            # 空行可能跨越读取的块：只保留最后一个换行符之后的内容
+            keep = buffer.rfind(b'\n')
+            if keep < 0:
+                keep = len(buffer)
+            offset += keep
+            buffer = buffer[keep:]
 
-        logger.info(f"成功解析 {len(entries)} 条字幕")
-        return entries
+    @classmethod
+    def _parse_block(cls, block: str) -> Optional[SubtitleEntry]:
+        """
+        解析单个字幕块
+
+        Args:
+            block: 字幕块文本（序号、时间码与字幕文本）
+
+        Returns:
+            字幕条目，无效的字幕块返回 None
+        """
+        if not block.strip():
+            return None
+
+        lines = block.strip().split('\n')
+        if len(lines) < 3:
+            logger.warning(f"无效的字幕块: {block[:50]}...")
+            return None
+
+        try:
+            # 第一行: 序号
+            index = int(lines[0].strip())
+
+            # 第二行: 时间码
+            time_match = cls.TIME_PATTERN.search(lines[1])
+            if not time_match:
+                logger.warning(f"无法解析时间码: {lines[1]}")
+                return None
+
+            start_time = time_match.group(1)
+            end_time = time_match.group(2)
+
+            # 第三行及之后: 字幕文本
+            text = '\n'.join(lines[2:])
+
+            return SubtitleEntry(
+                index=index,
+                start_time=start_time,
+                end_time=end_time,
+                text=text,
+                original_text=text  # 保存原始文本
+            )
+
+        except (ValueError, IndexError) as e:
+            logger.error(f"解析字幕块失败: {e}, 内容: {block[:50]}...")
+            return None
 
     @classmethod
     def generate(cls, entries: List[SubtitleEntry]) -> str:
@@ -123,6 +298,28 @@ class SRTParser:
 
         return '\n'.join(srt_blocks)
 
+    @classmethod
+    def write(cls, entries: Iterable[SubtitleEntry], output: IO[str]) -> int:
+        """
+        流式写出 SRT 内容，结果与 generate 一致
+
+        Args:
+            entries: 字幕条目（可以是生成器）
+            output: 文本文件对象
+
+        Returns:
+            写出的字幕条数
+        """
+        count = 0
+
+        for entry in entries:
+            if count:
+                output.write('\n')
+            output.write(entry.to_srt_format())
+            count += 1
+
+        return count
+
     @classmethod
     def validate(cls, content: str) -> bool:
         """
@@ -173,6 +370,25 @@ class SRTProcessor:
 
         self.processed = True
 
+    def apply_batch_transform(self, batch_func):
+        """
+        对全部字幕文本整体应用批量转换函数
+
+        Args:
+            batch_func: 接受文本列表并返回等长转换后文本列表的函数
+        """
+        for entry in self.entries:
+            # 保存原始文本（如果还没保存）
+            if entry.original_text is None:
+                entry.original_text = entry.text
+
+        outputs = batch_func([entry.text for entry in self.entries])
+
+        for entry, text in zip(self.entries, outputs):
+            entry.text = text
+
+        self.processed = True
+
     def get_modified_content(self) -> str:
         """
         获取修改后的 SRT 内容
@@ -182,25 +398,31 @@ class SRTProcessor:
         """
         return SRTParser.generate(self.entries)
 
-    def get_diff_data(self) -> List[dict]:
+    def get_diff_data(self, plan: Optional[RulePlan] = None) -> List[dict]:
         """
-        获取修改前后的差异数据
+        获取紧凑格式的差异数据
+
+        Args:
+            plan: 规则执行计划，用于标注每处修改对应的规则
 
         Returns:
-            包含原始和修改后文本的列表
+            修改过的条目为编辑操作，连续未修改的条目合并为引用区间
         """
-        diff_data = []
+        return compact_diff_items(self.diff_item(entry, plan) for entry in self.entries)
 
-        for entry in self.entries:
-            diff_data.append({
-                'index': entry.index,
-                'time': f"{entry.start_time} --> {entry.end_time}",
-                'original': entry.original_text or entry.text,
-                'modified': entry.text,
-                'changed': entry.original_text != entry.text
-            })
+    @staticmethod
+    def diff_item(entry: SubtitleEntry, plan: Optional[RulePlan] = None) -> dict:
+        """单条字幕的差异数据（未修改的条目只保留序号）"""
+        if not SRTProcessor.is_modified(entry):
+            return {'type': 'unchanged', 'index': entry.index}
 
-        return diff_data
+        return {
+            'type': 'changed',
+            'index': entry.index,
+            'time': f"{entry.start_time} --> {entry.end_time}",
+            'original': entry.original_text,
+            'ops': build_edit_ops(entry.original_text, entry.text, plan)
+        }
 
     def get_statistics(self) -> dict:
         """
@@ -210,11 +432,27 @@ class SRTProcessor:
             统计数据字典
         """
         total = len(self.entries)
-        changed = sum(
-            1 for e in self.entries
-            if e.original_text and e.original_text != e.text
-        )
+        changed = sum(1 for e in self.entries if self.is_modified(e))
+
+        return self.summarize(total, changed)
+
+    @staticmethod
+    def is_modified(entry: SubtitleEntry) -> bool:
+        """字幕文本是否被修改"""
+        return bool(entry.original_text) and entry.original_text != entry.text
+
+    @staticmethod
+    def summarize(total: int, changed: int) -> dict:
+        """
+        由总条数与修改条数生成统计数据
 
+        Args:
+            total: 字幕总条数
+            changed: 被修改的条数
+
+        Returns:
+            统计数据字典
+        """
         return {
             'total_entries': total,
             'modified_entries': changed,
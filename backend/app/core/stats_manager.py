@@ -1,34 +1,29 @@
 """
 历史统计管理器 - 持久化累计替换统计
+统计数据常驻内存，记录与查询都不读写文件；累计的增量定期（及服务关闭时）合并写入统计文件，
+写入时先写临时文件再改名，多个 worker 进程各自合并自己的增量，不会互相覆盖
 """
 
+import os
 import json
+import bisect
+import asyncio
 import logging
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from threading import Lock
 
 from .config import settings
+from .file_lock import FileLock
 
 logger = logging.getLogger(__name__)
 
 # 统计文件路径
 STATS_FILE = settings.BASE_DIR / "replacement_stats.json"
 
-# 线程锁，确保并发安全
-_lock = Lock()
-
-
-def _load_stats() -> Dict[str, Any]:
-    """加载历史统计数据"""
-    try:
-        if STATS_FILE.exists():
-            with open(STATS_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception as e:
-        logger.error(f"加载统计文件失败: {e}")
 
+def _empty_stats() -> Dict[str, Any]:
     return {
         "total_files_processed": 0,
         "total_replacements": 0,
@@ -37,39 +32,242 @@ def _load_stats() -> Dict[str, Any]:
     }
 
 
-def _save_stats(stats: Dict[str, Any]) -> None:
-    """保存统计数据"""
-    try:
-        stats["last_updated"] = datetime.now().isoformat()
-        with open(STATS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        logger.error(f"保存统计文件失败: {e}")
+def _empty_delta() -> Dict[str, Any]:
+    return {
+        "total_files_processed": 0,
+        "total_replacements": 0,
+        "term_counts": {}
+    }
 
 
-def record_replacements(replacement_details: List[Dict[str, Any]]) -> None:
+def _apply_delta(stats: Dict[str, Any], delta: Dict[str, Any]) -> None:
+    """把增量累加到统计数据（或另一份增量）上"""
+    stats["total_files_processed"] += delta["total_files_processed"]
+    stats["total_replacements"] += delta["total_replacements"]
+    term_counts = stats["term_counts"]
+    for source, count in delta["term_counts"].items():
+        term_counts[source] = term_counts.get(source, 0) + count
+
+
+class _TopTermsIndex:
     """
-    记录本次处理的替换统计
+    增量维护的替换次数排行
 
-    Args:
-        replacement_details: 替换详情列表 [{"source": "...", "target": "...", "count": N}, ...]
+    按次数分桶：_levels 为升序排列的不同次数，每个桶内按词首次出现的顺序排列
+    （与对 term_counts 做稳定排序的结果一致）。次数只会增加，
+    更新时把词从旧桶移到新桶；查询前 K 名从最高的桶依次取出，开销为 O(K)
     """
-    with _lock:
-        stats = _load_stats()
 
-        stats["total_files_processed"] += 1
+    def __init__(self, term_counts: Dict[str, int] = None):
+        self._seq: Dict[str, int] = {}
+        self._buckets: Dict[int, List[Tuple[int, str]]] = {}
+        self._levels: List[int] = []
+
+        for source, count in (term_counts or {}).items():
+            self.update(source, None, count)
+
+    def update(self, source: str, old: Optional[int], new: int) -> None:
+        """把词的次数从 old（新词为 None）更新为 new"""
+        if old == new:
+            return
+
+        seq = self._seq.setdefault(source, len(self._seq))
+        if old is not None:
+            bucket = self._buckets[old]
+            del bucket[bisect.bisect_left(bucket, (seq, source))]
+            if not bucket:
+                del self._buckets[old]
+                del self._levels[bisect.bisect_left(self._levels, old)]
+
+        bucket = self._buckets.get(new)
+        if bucket is None:
+            bucket = self._buckets[new] = []
+            bisect.insort(self._levels, new)
+        bisect.insort(bucket, (seq, source))
+
+    def top(self, limit: int) -> List[Dict[str, Any]]:
+        """次数最多的前 limit 个词"""
+        result: List[Dict[str, Any]] = []
+        for count in reversed(self._levels):
+            for _, source in self._buckets[count]:
+                if len(result) >= limit:
+                    return result
+                result.append({"source": source, "count": count})
+        return result
+
+
+class StatsAggregator:
+    """
+    常驻内存的统计聚合器
+
+    内存中保存统计文件的内容加上本进程尚未写出的增量，查询直接读取内存；
+    flush() 在文件锁内重新读取统计文件（可能已包含其他 worker 写出的增量），
+    加上本进程的增量后原子地写回，并以合并结果刷新内存
+    """
+
+    def __init__(self, path: Path = None):
+        self.path = path or STATS_FILE
+        self._lock = Lock()
+        # 保证同一进程内的 flush 依次执行
+        self._flush_lock = Lock()
+        self._stats: Optional[Dict[str, Any]] = None
+        self._index = _TopTermsIndex()
+        self._pending = _empty_delta()
+
+    def record(self, replacement_details: List[Dict[str, Any]]) -> None:
+        """
+        记录一个文件的替换统计（只更新内存）
+
+        Args:
+            replacement_details: 替换详情列表 [{"source": "...", "target": "...", "count": N}, ...]
+        """
+        delta = _empty_delta()
+        delta["total_files_processed"] = 1
 
         for detail in replacement_details:
             source = detail.get("source", "")
             count = detail.get("count", 0)
 
             if source:
-                current = stats["term_counts"].get(source, 0)
-                stats["term_counts"][source] = current + count
-                stats["total_replacements"] += count
+                delta["term_counts"][source] = delta["term_counts"].get(source, 0) + count
+                delta["total_replacements"] += count
+
+        with self._lock:
+            stats = self._loaded()
+            self._apply(stats, self._index, delta)
+            _apply_delta(self._pending, delta)
+            stats["last_updated"] = datetime.now().isoformat()
+
+    def top_terms(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """获取高频替换词排行"""
+        with self._lock:
+            self._loaded()
+            return self._index.top(limit)
+
+    def overall(self) -> Dict[str, Any]:
+        """获取总体统计信息"""
+        with self._lock:
+            stats = self._loaded()
+            overall = {
+                "total_files_processed": stats["total_files_processed"],
+                "total_replacements": stats["total_replacements"],
+                "unique_terms": len(stats["term_counts"]),
+                "last_updated": stats["last_updated"]
+            }
+
+        overall["top_terms"] = self.top_terms(10)
+        return overall
+
+    def flush(self) -> bool:
+        """
+        把尚未写出的增量合并写入统计文件，并以文件中的最新数据刷新内存
 
-        _save_stats(stats)
-        logger.info(f"已更新统计: 总替换 {stats['total_replacements']} 次")
+        文件读写期间不持有内存锁，记录统计不会被阻塞
+
+        Returns:
+            是否有增量被写出
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = _empty_delta()
+
+            try:
+                with self._file_lock():
+                    stats = self._read()
+                    _apply_delta(stats, pending)
+                    if pending["total_files_processed"]:
+                        stats["last_updated"] = datetime.now().isoformat()
+                        self._write(stats)
+            except Exception as e:
+                # 写出失败时放回增量，下次重试
+                logger.error(f"保存统计文件失败: {e}")
+                with self._lock:
+                    _apply_delta(self._pending, pending)
+                return False
+
+            # 排行按文件中的最新数据重建（在锁外进行）
+            index = _TopTermsIndex(stats["term_counts"])
+
+            with self._lock:
+                # 加上 flush 期间新记录的增量
+                if self._pending["total_files_processed"]:
+                    self._apply(stats, index, self._pending)
+                    stats["last_updated"] = self._stats["last_updated"]
+                self._stats = stats
+                self._index = index
+
+        if pending["total_files_processed"]:
+            logger.info(f"已保存统计: 总替换 {stats['total_replacements']} 次")
+        return bool(pending["total_files_processed"])
+
+    def reset(self) -> None:
+        """重置统计数据（慎用）"""
+        with self._flush_lock, self._lock:
+            with self._file_lock():
+                self._write(_empty_stats())
+            self._stats = _empty_stats()
+            self._index = _TopTermsIndex()
+            self._pending = _empty_delta()
+
+    async def run_periodic_flush(self, interval: float = None) -> None:
+        """定期在线程中执行 flush，直到被取消"""
+        interval = interval or settings.STATS_FLUSH_INTERVAL
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.flush)
+
+    def _loaded(self) -> Dict[str, Any]:
+        """内存中的统计数据（首次使用时从文件加载，调用方需持有锁）"""
+        if self._stats is None:
+            try:
+                self._stats = self._read()
+            except Exception as e:
+                logger.error(f"加载统计文件失败: {e}")
+                self._stats = _empty_stats()
+            self._index = _TopTermsIndex(self._stats["term_counts"])
+        return self._stats
+
+    @staticmethod
+    def _apply(stats: Dict[str, Any], index: _TopTermsIndex, delta: Dict[str, Any]) -> None:
+        """把增量累加到统计数据上，同时更新排行"""
+        term_counts = stats["term_counts"]
+        for source, count in delta["term_counts"].items():
+            old = term_counts.get(source)
+            index.update(source, old, (old or 0) + count)
+        _apply_delta(stats, delta)
+
+    def _read(self) -> Dict[str, Any]:
+        """读取统计文件（文件不存在时为空统计）"""
+        stats = _empty_stats()
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stats.update(json.load(f))
+        return stats
+
+    def _write(self, stats: Dict[str, Any]) -> None:
+        """先写临时文件再改名，读取方不会看到写了一半的文件"""
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def _file_lock(self) -> FileLock:
+        return FileLock(self.path.with_suffix('.lock'))
+
+
+# 全局统计聚合器实例（每个进程一个）
+stats_aggregator = StatsAggregator()
+
+
+def record_replacements(replacement_details: List[Dict[str, Any]]) -> None:
+    """
+    记录本次处理的替换统计
+
+    Args:
+        replacement_details: 替换详情列表 [{"source": "...", "target": "...", "count": N}, ...]
+    """
+    stats_aggregator.record(replacement_details)
 
 
 def get_top_terms(limit: int = 10) -> List[Dict[str, Any]]:
@@ -82,37 +280,20 @@ def get_top_terms(limit: int = 10) -> List[Dict[str, Any]]:
     Returns:
         [{"source": "...", "count": N}, ...]
     """
-    stats = _load_stats()
-    term_counts = stats.get("term_counts", {})
-
-    sorted_terms = sorted(
-        [{"source": k, "count": v} for k, v in term_counts.items()],
-        key=lambda x: x["count"],
-        reverse=True
-    )
-
-    return sorted_terms[:limit]
+    return stats_aggregator.top_terms(limit)
 
 
 def get_overall_stats() -> Dict[str, Any]:
     """获取总体统计信息"""
-    stats = _load_stats()
-    return {
-        "total_files_processed": stats.get("total_files_processed", 0),
-        "total_replacements": stats.get("total_replacements", 0),
-        "unique_terms": len(stats.get("term_counts", {})),
-        "last_updated": stats.get("last_updated"),
-        "top_terms": get_top_terms(10)
-    }
+    return stats_aggregator.overall()
+
+
+def flush_stats() -> bool:
+    """把内存中的增量写入统计文件"""
+    return stats_aggregator.flush()
 
 
 def reset_stats() -> None:
     """重置统计数据（慎用）"""
-    with _lock:
-        _save_stats({
-            "total_files_processed": 0,
-            "total_replacements": 0,
-            "term_counts": {},
-            "last_updated": None
-        })
+    stats_aggregator.reset()
     logger.info("统计数据已重置")
@@ -0,0 +1,254 @@
+"""
+替换统计存储 - 使用 SQLite 按时间分桶保存每个文件的全部替换次数
+修正规则以整数 ID 保存，次数按小时与按天两种粒度累加；
+按时间范围查询排行时只扫描范围内的分桶，不需要把全部历史加载到内存
+"""
+
+import time
+import sqlite3
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 分桶粒度 {名称: 秒数}，分桶按 UTC 时间对齐
+_GRANULARITIES = {'hour': 3600, 'day': 86400}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (
+    term_id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    UNIQUE (source, target)
+);
+""" + "".join(f"""
+CREATE TABLE IF NOT EXISTS term_counts_{name} (
+    bucket INTEGER NOT NULL,
+    term_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (bucket, term_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS file_counts_{name} (
+    bucket INTEGER PRIMARY KEY,
+    files INTEGER NOT NULL,
+    replacements INTEGER NOT NULL
+);
+""" for name in _GRANULARITIES)
+
+
+class StatsStore:
+    """
+    基于 SQLite 的分时段替换统计
+
+    按小时的分桶保留 STATS_HOURLY_RETENTION_DAYS 天，按天的分桶永久保留；
+    查询范围完全在按小时分桶的保留期内时按小时精度统计，否则按天统计
+    """
+
+    def __init__(self, db_path: Path = None, hourly_retention_days: int = None):
+        self.db_path = db_path or settings.STATS_DB_PATH
+        self.hourly_retention = (
+            hourly_retention_days if hourly_retention_days is not None
+            else settings.STATS_HOURLY_RETENTION_DAYS
+        ) * 86400
+        self._initialized = False
+        self._last_pruned = 0.0
+        # 修正规则 ID 缓存 {(source, target): term_id}
+        self._term_ids: Dict[Tuple[str, str], int] = {}
+
+    def record_files(
+        self,
+        files_details: List[List[Dict[str, Any]]],
+        timestamp: float = None
+    ) -> None:
+        """
+        记录一批文件的替换统计
+
+        Args:
+            files_details: 每个文件的全部替换详情 [[{"source", "target", "count"}, ...], ...]
+            timestamp: 记录时间（默认为当前时间）
+        """
+        timestamp = timestamp if timestamp is not None else time.time()
+
+        # 同一规则在本批文件中的次数先合并，每个分桶只写一次
+        counts: Dict[Tuple[str, str], int] = {}
+        replacements = 0
+        for details in files_details:
+            for detail in details:
+                source = detail.get('source', '')
+                count = detail.get('count', 0)
+                if source and count:
+                    key = (source, detail.get('target', ''))
+                    counts[key] = counts.get(key, 0) + count
+                    replacements += count
+
+        try:
+            with self._connect() as conn:
+                self._insert_counts(conn, counts, len(files_details), replacements, timestamp)
+        except Exception:
+            # 事务回滚后缓存中可能有未提交的规则 ID
+            self._term_ids.clear()
+            raise
+
+        if timestamp - self._last_pruned >= 3600:
+            self.prune(timestamp)
+
+    def _insert_counts(
+        self,
+        conn: sqlite3.Connection,
+        counts: Dict[Tuple[str, str], int],
+        files: int,
+        replacements: int,
+        timestamp: float
+    ) -> None:
+        """把合并后的次数累加到各粒度的分桶"""
+        term_counts = [
+            (self._term_id(conn, source, target), count)
+            for (source, target), count in counts.items()
+        ]
+
+        for name, seconds in _GRANULARITIES.items():
+            bucket = int(timestamp // seconds * seconds)
+            conn.executemany(
+                f"INSERT INTO term_counts_{name} (bucket, term_id, count) VALUES (?, ?, ?) "
+                "ON CONFLICT (bucket, term_id) DO UPDATE SET count = count + excluded.count",
+                [(bucket, term_id, count) for term_id, count in term_counts]
+            )
+            conn.execute(
+                f"INSERT INTO file_counts_{name} (bucket, files, replacements) VALUES (?, ?, ?) "
+                "ON CONFLICT (bucket) DO UPDATE SET "
+                "files = files + excluded.files, replacements = replacements + excluded.replacements",
+                (bucket, files, replacements)
+            )
+
+    def top_terms(
+        self,
+        since: float,
+        until: float = None,
+        limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        时间范围内替换次数最多的规则
+
+        Args:
+            since: 起始时间戳
+            until: 结束时间戳（默认为当前时间）
+            limit: 返回前 N 个
+
+        Returns:
+            [{"source": "...", "target": "...", "count": N}, ...]
+        """
+        name, start, end = self._buckets(since, until)
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT t.source, t.target, c.count FROM ("
+                f"  SELECT term_id, SUM(count) AS count FROM term_counts_{name} "
+                f"  WHERE bucket >= ? AND bucket < ? GROUP BY term_id "
+                f"  ORDER BY count DESC, term_id LIMIT ?"
+                f") AS c JOIN terms AS t ON t.term_id = c.term_id ORDER BY c.count DESC, c.term_id",
+                (start, end, limit)
+            ).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def totals(self, since: float, until: float = None) -> Dict[str, Any]:
+        """
+        时间范围内的处理文件数、替换次数与涉及的规则数
+
+        Args:
+            since: 起始时间戳
+            until: 结束时间戳（默认为当前时间）
+        """
+        name, start, end = self._buckets(since, until)
+
+        with self._connect() as conn:
+            files, replacements = conn.execute(
+                f"SELECT COALESCE(SUM(files), 0), COALESCE(SUM(replacements), 0) "
+                f"FROM file_counts_{name} WHERE bucket >= ? AND bucket < ?",
+                (start, end)
+            ).fetchone()
+            unique_terms = conn.execute(
+                f"SELECT COUNT(DISTINCT term_id) FROM term_counts_{name} "
+                f"WHERE bucket >= ? AND bucket < ?",
+                (start, end)
+            ).fetchone()[0]
+
+        return {
+            'granularity': name,
+            'total_files_processed': files,
+            'total_replacements': replacements,
+            'unique_terms': unique_terms
+        }
+
+    def prune(self, now: float = None) -> None:
+        """删除超过保留期的按小时分桶"""
+        now = now if now is not None else time.time()
+        cutoff = int(now - self.hourly_retention)
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM term_counts_hour WHERE bucket < ?", (cutoff,))
+            conn.execute("DELETE FROM file_counts_hour WHERE bucket < ?", (cutoff,))
+
+        self._last_pruned = now
+
+    def _buckets(self, since: float, until: Optional[float]) -> Tuple[str, int, int]:
+        """
+        选择分桶粒度并把时间范围对齐到分桶边界
+
+        Returns:
+            (粒度名称, 起始分桶, 结束分桶（不含）)
+        """
+        now = time.time()
+        until = until if until is not None else now
+
+        name = 'hour' if since >= now - self.hourly_retention else 'day'
+        seconds = _GRANULARITIES[name]
+        start = int(since // seconds * seconds)
+        # 包含 until 所在的分桶
+        end = int(until // seconds * seconds) + seconds
+        return name, start, end
+
+    def _term_id(self, conn: sqlite3.Connection, source: str, target: str) -> int:
+        """获取修正规则的 ID（不存在时创建）"""
+        key = (source, target)
+        term_id = self._term_ids.get(key)
+        if term_id is None:
+            conn.execute(
+                "INSERT OR IGNORE INTO terms (source, target) VALUES (?, ?)",
+                key
+            )
+            term_id = conn.execute(
+                "SELECT term_id FROM terms WHERE source = ? AND target = ?",
+                key
+            ).fetchone()[0]
+            self._term_ids[key] = term_id
+        return term_id
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """打开数据库连接（首次使用时建表），with 块结束时提交事务并关闭连接"""
+        if not self._initialized:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._initialized:
+                # WAL 模式允许多个 worker 进程并发读写
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                self._initialized = True
+
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+# 全局统计存储实例
+stats_store = StatsStore()
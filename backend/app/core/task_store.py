@@ -0,0 +1,355 @@
+"""
+任务存储 - 使用 SQLite 持久化任务状态
+任务状态与统计保存在数据库中，体积较大的处理结果（逐条差异数据）保存为磁盘文件并按需加载，
+处理后的文件与差异数据保存在每个任务自己的目录中，同一文件被多个任务处理时互不覆盖；
+多个 uvicorn worker 共享同一数据库，服务重启后仍可查询结果
+"""
+
+import os
+import json
+import time
+import shutil
+import uuid
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# 运行中的任务状态
+_ACTIVE_STATUSES = ('pending', 'processing')
+
+# 当前进程的标识（进程号 + 随机实例号），容器重启后进程号可能复用，实例号不会
+_OWNER = f"{os.getpid()}:{uuid.uuid4().hex}"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    progress INTEGER NOT NULL DEFAULT 0,
+    processed_files INTEGER NOT NULL DEFAULT 0,
+    total_files INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    dictionary_version TEXT,
+    statistics TEXT,
+    owner TEXT,
+    queue_deadline REAL,
+    queue_seq INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_accessed_at ON tasks (accessed_at);
+"""
+
+# 建表之后增加的列（列名, 类型）
+_ADDED_COLUMNS = (
+    ('queue_deadline', 'REAL'),
+    ('queue_seq', 'INTEGER'),
+)
+
+# 可通过 update() 修改的字段
+_UPDATABLE_FIELDS = {
+    'status', 'progress', 'processed_files', 'total_files',
+    'error', 'dictionary_version'
+}
+
+
+class TaskStore:
+    """
+    基于 SQLite 的任务存储
+
+    淘汰策略：已结束的任务超过 TASK_TTL 未被访问即删除；
+    已结束任务数超过 MAX_STORED_TASKS 时按最近访问时间淘汰最旧的任务
+    """
+
+    def __init__(
+        self,
+        db_path: Path = None,
+        results_dir: Path = None,
+        ttl: int = None,
+        max_tasks: int = None,
+        processed_dir: Path = None
+    ):
+        self.db_path = db_path or settings.TASK_DB_PATH
+        self.results_dir = results_dir or settings.TASK_RESULTS_DIR
+        self.processed_dir = processed_dir or settings.PROCESSED_DIR
+        self.ttl = ttl if ttl is not None else settings.TASK_TTL
+        self.max_tasks = max_tasks if max_tasks is not None else settings.MAX_STORED_TASKS
+        self._initialized = False
+
+    def create(self, task_id: str, total_files: int) -> None:
+        """创建任务（状态为 pending），同时淘汰过期任务"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO tasks (task_id, status, total_files, owner, "
+                "created_at, updated_at, accessed_at) VALUES (?, 'pending', ?, ?, ?, ?, ?)",
+                (task_id, total_files, _OWNER, now, now, now)
+            )
+        self.evict()
+
+    def update(self, task_id: str, **fields: Any) -> None:
+        """更新任务状态字段"""
+        unknown = set(fields) - _UPDATABLE_FIELDS
+        if unknown:
+            raise ValueError(f"未知的任务字段: {', '.join(sorted(unknown))}")
+
+        assignments = ', '.join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(
+                f"UPDATE tasks SET {assignments}, updated_at = ? WHERE task_id = ?",
+                (*fields.values(), time.time(), task_id)
+            )
+
+    def delete(self, task_id: str) -> None:
+        """删除任务及其结果文件"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM tasks WHERE task_id = ?", (task_id,))
+        self._remove_result(task_id)
+
+    def set_queue_key(self, task_id: str, deadline: float, seq: int) -> None:
+        """
+        记录任务在调度器等待队列中的排序键（见 JobScheduler.queue_key）
+
+        调度器只存在于提交任务的进程中，排序键保存在数据库里，
+        其他 uvicorn worker 收到状态查询时也能通过 queue_position() 得到排队位置
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET queue_deadline = ?, queue_seq = ? WHERE task_id = ?",
+                (deadline, seq, task_id)
+            )
+
+    def queue_position(self, task_id: str) -> Optional[int]:
+        """
+        任务的排队位置（从 1 开始），任务不在等待中或尚未记录排序键时返回 None
+
+        只与同一进程提交的、仍在等待的任务比较（排序键的截止时间是该进程的单调时钟）
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT owner, status, queue_deadline, queue_seq FROM tasks WHERE task_id = ?",
+                (task_id,)
+            ).fetchone()
+            if row is None or row['status'] != 'pending' or row['queue_deadline'] is None:
+                return None
+
+            deadline, seq = row['queue_deadline'], row['queue_seq']
+            (position,) = conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE owner = ? AND status = 'pending' "
+                "AND queue_deadline IS NOT NULL "
+                "AND (queue_deadline < ? OR (queue_deadline = ? AND queue_seq <= ?))",
+                (row['owner'], deadline, deadline, seq)
+            ).fetchone()
+        return position
+
+    def get(self, task_id: str, touch: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        获取任务状态（不含处理结果）
+
+        Args:
+            task_id: 任务ID
+            touch: 是否刷新最近访问时间；轮询状态时不刷新，避免每次查询都写数据库，
+                只有读取处理结果时才算访问
+
+        Returns:
+            任务状态字典，任务不存在时返回 None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM tasks WHERE task_id = ?", (task_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if touch:
+                conn.execute(
+                    "UPDATE tasks SET accessed_at = ? WHERE task_id = ?",
+                    (time.time(), task_id)
+                )
+
+        task = dict(row)
+        task['statistics'] = json.loads(task['statistics']) if task['statistics'] else {}
+        return task
+
+    def complete(
+        self,
+        task_id: str,
+        files: List[Dict[str, Any]],
+        statistics: Dict[str, Any]
+    ) -> None:
+        """
+        保存处理结果并将任务标记为完成
+
+        Args:
+            task_id: 任务ID
+            files: 各文件的处理结果（含差异数据），写入磁盘文件
+            statistics: 汇总统计，写入数据库
+        """
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        result_path = self._result_path(task_id)
+        temp_path = result_path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(files, f, ensure_ascii=False)
+        os.replace(temp_path, result_path)
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = 'completed', progress = 100, statistics = ?, "
+                "updated_at = ? WHERE task_id = ?",
+                (json.dumps(statistics, ensure_ascii=False), time.time(), task_id)
+            )
+
+    def load_files(self, task_id: str) -> List[Dict[str, Any]]:
+        """按需从磁盘加载任务的逐文件处理结果"""
+        try:
+            with open(self._result_path(task_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def output_dir(self, task_id: str) -> Path:
+        """任务的输出目录（处理后的文件与差异数据），随任务一起删除"""
+        return self.processed_dir / task_id
+
+    def fail_interrupted(self) -> int:
+        """
+        将所属进程已不存在的运行中任务标记为失败（服务启动时调用）
+
+        Returns:
+            被标记的任务数
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT task_id, owner FROM tasks WHERE status IN (?, ?)",
+                _ACTIVE_STATUSES
+            ).fetchall()
+
+            interrupted = [
+                row['task_id'] for row in rows
+                if not _owner_alive(row['owner'])
+            ]
+            conn.executemany(
+                "UPDATE tasks SET status = 'failed', error = '服务重启，任务已中断', "
+                "updated_at = ? WHERE task_id = ?",
+                [(time.time(), task_id) for task_id in interrupted]
+            )
+
+        if interrupted:
+            logger.warning(f"{len(interrupted)} 个任务因服务重启而中断")
+        return len(interrupted)
+
+    def evict(self) -> int:
+        """
+        淘汰过期或超出数量上限的已结束任务
+
+        Returns:
+            被淘汰的任务数
+        """
+        with self._connect() as conn:
+            expired = [
+                row['task_id'] for row in conn.execute(
+                    "SELECT task_id FROM tasks WHERE status NOT IN (?, ?) AND accessed_at < ?",
+                    (*_ACTIVE_STATUSES, time.time() - self.ttl)
+                )
+            ]
+            overflow = [
+                row['task_id'] for row in conn.execute(
+                    "SELECT task_id FROM tasks WHERE status NOT IN (?, ?) "
+                    "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?",
+                    (*_ACTIVE_STATUSES, self.max_tasks)
+                )
+            ]
+
+            evicted = set(expired) | set(overflow)
+            conn.executemany(
+                "DELETE FROM tasks WHERE task_id = ?",
+                [(task_id,) for task_id in evicted]
+            )
+
+        for task_id in evicted:
+            self._remove_result(task_id)
+
+        if evicted:
+            logger.info(f"已淘汰 {len(evicted)} 个旧任务")
+        return len(evicted)
+
+    def _connect(self) -> "_Connection":
+        """打开数据库连接（首次使用时建表）"""
+        if not self._initialized:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # WAL 模式下 NORMAL 已能保证数据库一致性，避免每次提交都同步到磁盘
+        conn.execute("PRAGMA synchronous=NORMAL")
+
+        if not self._initialized:
+            # WAL 模式允许多个 worker 进程并发读写
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            # 旧版本建立的数据库补充后来增加的列
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(tasks)")}
+            for name, column_type in _ADDED_COLUMNS:
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE tasks ADD COLUMN {name} {column_type}")
+            self._initialized = True
+
+        return _Connection(conn)
+
+    def _result_path(self, task_id: str) -> Path:
+        return self.results_dir / f"{task_id}.json"
+
+    def _remove_result(self, task_id: str) -> None:
+        try:
+            self._result_path(task_id).unlink()
+        except FileNotFoundError:
+            pass
+        shutil.rmtree(self.output_dir(task_id), ignore_errors=True)
+
+
+class _Connection:
+    """在 with 块内开启事务，退出时提交（异常时回滚）并关闭连接"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._conn.execute("BEGIN")
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._conn.close()
+
+
+def _owner_alive(owner: Optional[str]) -> bool:
+    """判断创建任务的进程是否仍在运行"""
+    if owner == _OWNER:
+        return True
+
+    try:
+        pid = int(owner.split(':', 1)[0])
+    except (AttributeError, ValueError):
+        return False
+
+    # 进程号与当前进程相同但实例号不同，说明是重启后复用了进程号
+    if pid == os.getpid():
+        return False
+
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# 全局任务存储实例
+task_store = TaskStore()
@@ -0,0 +1,256 @@
+"""
+规则命中索引 - 记录文件中每条字幕命中的修正规则与替换次数，字典修改后只重新处理可能受影响的条目
+
+一条字幕的处理结果只取决于该条文本与字典。字典修改后，只有以下条目的结果可能变化：
+- 命中过被修改（删除、新增或修改 target / 分类）的规则；
+- 原文中出现被修改规则的 source，或 source 与该条命中规则的 target 相交（级联替换）；
+- 原文中出现被增删的保护词。
+噪音模式变化或未修改规则之间的优先级变化时无法按条目判断，需要完整处理
+"""
+
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .automaton import AhoCorasick
+from .entry_memo import MemoEntry
+from .rule_plan import RulePlan
+
+# 索引文件格式版本，格式变化后旧索引不再使用
+INDEX_FORMAT = 1
+
+# 规则 (source, target, category)
+Rule = Tuple[str, str, str]
+
+# 占位符使用的私用区字符范围（见 engine）
+_PLACEHOLDER_CHARS = range(0xE000, 0xE01A)
+
+
+@dataclass
+class DictionaryChanges:
+    """两个字典版本之间可按条目判断影响范围的差异"""
+    # 新增、删除或修改的规则（修改时旧值与新值都包含在内）
+    terms: Set[Rule]
+    # 新增或删除的保护词（小写）
+    protected_words: Set[str]
+
+
+class TermIndexBuilder:
+    """
+    按条目位置记录命中的规则与替换次数
+
+    规则以规则表下标保存，只记录有替换或降噪的条目
+    """
+
+    def __init__(self):
+        self.rules: List[Rule] = []
+        self._rule_ids: Dict[Rule, int] = {}
+        self.entries: List[List[Any]] = []
+        self.total = 0
+        # 有条目无法记录时为 False，索引不可用
+        self.valid = True
+
+    def add(
+        self,
+        position: int,
+        term_counts: Iterable[Tuple[Rule, int]],
+        noise_counts: Iterable[Tuple[str, int]]
+    ) -> None:
+        """记录一条字幕（position 须递增）"""
+        self.total = max(self.total, position + 1)
+        terms = [[self._rule_id(rule), count] for rule, count in term_counts]
+        noise = [[pattern, count] for pattern, count in noise_counts]
+        if terms or noise:
+            self.entries.append([position, terms, noise])
+
+    def add_results(self, start: int, results: List[MemoEntry], plan: RulePlan) -> None:
+        """记录一批引擎处理结果（规则优先级下标转换为规则）"""
+        terms = plan.terms
+        for offset, result in enumerate(results):
+            self.add(
+                start + offset,
+                (
+                    ((terms[rank].source, terms[rank].target, terms[rank].category), count)
+                    for rank, count in result.term_counts
+                ),
+                result.noise_counts
+            )
+        self.total = max(self.total, start + len(results))
+
+    def totals(self) -> Tuple[Dict[Rule, int], Dict[str, int]]:
+        """全部条目的替换次数 ({规则: 次数}, {噪音模式: 次数})"""
+        term_totals: Dict[Rule, int] = {}
+        noise_totals: Dict[str, int] = {}
+        for _, terms, noise in self.entries:
+            for rule_id, count in terms:
+                rule = self.rules[rule_id]
+                term_totals[rule] = term_totals.get(rule, 0) + count
+            for pattern, count in noise:
+                noise_totals[pattern] = noise_totals.get(pattern, 0) + count
+        return term_totals, noise_totals
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total': self.total,
+            'rules': [list(rule) for rule in self.rules],
+            'entries': self.entries
+        }
+
+    def _rule_id(self, rule: Rule) -> int:
+        rule_id = self._rule_ids.get(rule)
+        if rule_id is None:
+            rule_id = self._rule_ids[rule] = len(self.rules)
+            self.rules.append(rule)
+        return rule_id
+
+
+def save_term_index(path: str, meta: Dict[str, Any], index: Dict[str, Any]) -> None:
+    """
+    保存索引（先写临时文件再改名）
+
+    第一行为元数据（字典版本、输入内容哈希、处理选项），第二行为索引内容，
+    只需判断索引是否可用时不必读取整个文件
+    """
+    directory, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp', dir=directory or None)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for part in ({**meta, 'format': INDEX_FORMAT}, index):
+                f.write(json.dumps(part, ensure_ascii=False, separators=(',', ':')))
+                f.write('\n')
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def load_term_index(path: str, with_index: bool = True) -> Optional[Tuple[Dict[str, Any], Optional[Dict[str, Any]]]]:
+    """
+    读取索引
+
+    Returns:
+        (元数据, 索引内容)，with_index 为 False 时只读取元数据（索引内容为 None）；
+        文件不存在、损坏或格式不兼容时返回 None
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            meta = json.loads(f.readline())
+            if not isinstance(meta, dict) or meta.get('format') != INDEX_FORMAT:
+                return None
+            index = json.loads(f.readline()) if with_index else None
+    except (OSError, ValueError):
+        return None
+    return meta, index
+
+
+def dictionary_changes(old: RulePlan, new: RulePlan) -> Optional[DictionaryChanges]:
+    """
+    比较两个版本的规则执行计划
+
+    Returns:
+        差异，无法按条目判断影响范围时返回 None
+    """
+    if [noise.pattern for noise in old.noise_patterns] != [noise.pattern for noise in new.noise_patterns]:
+        return None
+
+    old_terms = [(term.source, term.target, term.category) for term in old.terms]
+    new_terms = [(term.source, term.target, term.category) for term in new.terms]
+    old_set, new_set = set(old_terms), set(new_terms)
+
+    # 未修改的规则之间的优先级顺序必须不变
+    common = old_set & new_set
+    if [t for t in old_terms if t in common] != [t for t in new_terms if t in common]:
+        return None
+
+    changed = old_set ^ new_set
+    if any(_may_match_placeholder(source) for source, _, _ in changed if source):
+        return None
+
+    protected = set(old.protected_words) ^ set(new.protected_words)
+    return DictionaryChanges(
+        terms=changed,
+        protected_words={word.lower() for word in protected if word}
+    )
+
+
+def affected_positions(
+    index: Dict[str, Any],
+    texts: List[str],
+    changes: DictionaryChanges
+) -> Set[int]:
+    """
+    字典修改后处理结果可能变化的条目位置
+
+    Args:
+        index: 旧版本字典下记录的索引
+        texts: 各条字幕的原文
+        changes: 字典差异
+    """
+    sources = sorted({source for source, _, _ in changes.terms if source})
+    rules = [tuple(rule) for rule in index['rules']]
+
+    # 命中过被修改的规则，或命中规则的 target 可能与被修改规则的 source 构成级联匹配
+    rule_affected = [
+        rule in changes.terms or any(_can_overlap(source, rule[1]) for source in sources)
+        for rule in rules
+    ]
+
+    affected = {
+        position for position, terms, _ in index['entries']
+        if any(rule_affected[rule_id] for rule_id, _ in terms)
+    }
+
+    source_automaton = AhoCorasick(sources) if sources else None
+    protected_automaton = (
+        AhoCorasick(sorted(changes.protected_words)) if changes.protected_words else None
+    )
+    for position, text in enumerate(texts):
+        if position in affected:
+            continue
+        if source_automaton is not None and source_automaton.matched_ids(text):
+            affected.add(position)
+        elif protected_automaton is not None and protected_automaton.matched_ids(text.lower()):
+            affected.add(position)
+
+    return affected
+
+
+def iter_index_entries(index: Dict[str, Any]) -> Iterator[Tuple[int, List[Tuple[Rule, int]], List[Tuple[str, int]]]]:
+    """按位置依次给出索引中的条目 (位置, [(规则, 次数)], [(噪音模式, 次数)])"""
+    rules = [tuple(rule) for rule in index['rules']]
+    for position, terms, noise in index['entries']:
+        yield (
+            position,
+            [(rules[rule_id], count) for rule_id, count in terms],
+            [(pattern, count) for pattern, count in noise]
+        )
+
+
+def expand_diff_items(diff_input: IO[str]) -> Iterator[Optional[Dict[str, Any]]]:
+    """按条目位置展开差异数据：修改过的条目给出差异数据，未修改的条目给出 None"""
+    for line in diff_input:
+        item = json.loads(line)
+        if item['type'] == 'unchanged':
+            for _ in range(item['count']):
+                yield None
+        else:
+            yield item
+
+
+def _can_overlap(a: str, b: str) -> bool:
+    """两个字符串能否在同一段文本中相交（一个包含另一个，或首尾重叠）"""
+    if not a or not b:
+        return False
+    if a in b or b in a:
+        return True
+    for length in range(1, min(len(a), len(b))):
+        if a.endswith(b[:length]) or b.endswith(a[:length]):
+            return True
+    return False
+
+
+def _may_match_placeholder(source: str) -> bool:
+    """source 是否可能匹配处理过程中插入的占位符"""
+    return any(ord(ch) in _PLACEHOLDER_CHARS for ch in source)
@@ -0,0 +1,438 @@
+"""
+字典检索 - 常驻内存的修正规则与保护词检索索引
+支持前缀、子串与模糊（编辑距离）匹配，不区分大小写；
+字典文件变化时按条目比较新旧内容，只更新增删的条目
+"""
+
+import bisect
+import heapq
+import logging
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .config import settings
+from .dictionary_cache import dictionary_cache
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MODES = ('prefix', 'substring', 'fuzzy')
+
+# 模糊匹配允许的最大编辑距离
+MAX_EDIT_DISTANCE = 2
+
+# 删除一个字符的变体索引只收录不超过该长度的值（用于分段后片段不足两个字符的短查询）
+_DELETE_INDEX_MAX_LENGTH = 4
+
+# 排序键 (主要排序值, 值长度, 条目编号, 字段下标)
+_RankKey = Tuple[int, int, int, int]
+
+
+def _bigrams(text: str) -> Set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def _repeats(text: str) -> List[Tuple[str, int]]:
+    """重复出现的字符：(字符, 第 k 次出现)，k >= 2"""
+    return [
+        (char, k)
+        for char, count in Counter(text).items()
+        for k in range(2, count + 1)
+    ]
+
+
+def _deletes(text: str) -> Set[str]:
+    """删除一个字符得到的全部变体"""
+    return {text[:i] + text[i + 1:] for i in range(len(text))}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    两个字符串的编辑距离（插入、删除、替换）
+
+    只计算对角线两侧 limit 以内的单元格，超过 limit 时提前结束，返回 limit + 1
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    over = limit + 1
+    width = len(b)
+    previous = [j if j <= limit else over for j in range(width + 1)]
+    for i in range(1, len(a) + 1):
+        ca = a[i - 1]
+        current = [over] * (width + 1)
+        if i <= limit:
+            current[0] = i
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(width, i + limit) + 1):
+            cost = previous[j - 1] + (ca != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return over
+        previous = current
+
+    return min(previous[width], over)
+
+
+class TermSearchIndex:
+    """
+    单个字典的检索索引
+
+    每个条目的各个字段（修正规则的 source 与 target、保护词）以 (条目编号, 字段下标) 标识：
+    - 前缀：按小写值排序的列表，二分查找起点
+    - 子串：单字与二元组的倒排表，取查询中各二元组倒排表的交集后核对
+    - 模糊：查询分为 d + 1 段，编辑距离不超过 d 的值至少完整包含其中一段，
+      按子串检索得到候选；短查询使用删除一个字符的变体索引。
+      候选先按长度与字符计数过滤（均为集合运算），剩下的才计算编辑距离
+    """
+
+    def __init__(self, name: str, fields: Tuple[str, ...]):
+        """
+        Args:
+            name: 字典名称（返回结果中的 dictionary 字段）
+            fields: 条目中参与检索的字段；条目为字符串时只有一个字段
+        """
+        self.name = name
+        self.fields = fields
+        self.version: Optional[str] = None
+
+        self._items: Dict[int, Any] = {}
+        # 条目内容 -> 条目编号（内容相同的条目可能有多个）
+        self._ids: Dict[Any, List[int]] = {}
+        self._next_id = 0
+
+        # (条目编号, 字段下标) -> 小写值
+        self._values: Dict[Tuple[int, int], str] = {}
+        self._sorted: List[Tuple[str, int, int]] = []
+        self._grams: Dict[str, Set[Tuple[int, int]]] = {}
+        # (字符, 第 k 次出现) -> 该字符至少出现 k 次的值（k >= 2，出现一次即单字倒排表）
+        self._repeats: Dict[Tuple[str, int], Set[Tuple[int, int]]] = {}
+        # 值长度 -> 该长度的值
+        self._lengths: Dict[int, Set[Tuple[int, int]]] = {}
+        self._deleted: Dict[str, Set[Tuple[int, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def sync(self, items: Iterable[Any], version: str) -> None:
+        """按新版本的条目更新索引：只移除已删除的条目、加入新增的条目"""
+        items = list(items)
+        identities = [self._identity(item) for item in items]
+        wanted = Counter(identities)
+        current = {identity: len(ids) for identity, ids in self._ids.items()}
+
+        for identity, count in current.items():
+            for _ in range(count - wanted.get(identity, 0)):
+                self._remove(self._ids[identity][-1])
+
+        added = 0
+        for item, identity in zip(items, identities):
+            if len(self._ids.get(identity, ())) < wanted[identity]:
+                self._add(item, identity)
+                added += 1
+
+        # 新增的值追加在末尾，整体排序一次（基本有序的列表排序为线性时间）
+        if added:
+            self._sorted.sort()
+
+        if self.version is not None:
+            logger.info(f"{self.name} 检索索引已更新: 新增 {added} 条，共 {len(self._items)} 条")
+        self.version = version
+
+    def search(
+        self,
+        query: str,
+        mode: str,
+        limit: int,
+        max_distance: Optional[int] = None
+    ) -> Tuple[int, List[Tuple[_RankKey, Dict[str, Any]]]]:
+        """
+        检索条目
+
+        Returns:
+            (匹配的条目总数, 排名前 limit 的 [(排序键, 结果)])，每个条目只保留最好的一个字段
+        """
+        query = query.lower()
+        total = None
+        if mode == 'prefix':
+            keys = self._prefix(query)
+        elif mode == 'substring':
+            keys, total = self._substring_top(query, limit)
+        else:
+            keys = self._fuzzy(query, max_distance)
+
+        if total is None:
+            total = len({key[2] for key in keys})
+
+        # 每个条目至多有 len(fields) 个排序键，排名前 limit * len(fields) 的键中至少有 limit 个条目；
+        # 同一条目的多个字段都匹配时只保留排名最好的
+        results = []
+        seen = set()
+        for key in heapq.nsmallest(limit * len(self.fields), keys):
+            if len(results) >= limit:
+                break
+            if key[2] in seen:
+                continue
+            seen.add(key[2])
+            result = {
+                'dictionary': self.name,
+                'field': self.fields[key[3]],
+                'item': self._items[key[2]]
+            }
+            if mode == 'fuzzy':
+                result['distance'] = key[0]
+            results.append((key, result))
+
+        return total, results
+
+    def _prefix(self, query: str) -> List[_RankKey]:
+        sorted_values = self._sorted
+        start = bisect.bisect_left(sorted_values, (query,))
+        end = bisect.bisect_left(sorted_values, (query + '\U0010ffff',), start)
+        return [
+            ((0 if value == query else 1), len(value), item_id, field)
+            for value, item_id, field in sorted_values[start:end]
+        ]
+
+    def _substring(self, query: str) -> List[_RankKey]:
+        values = self._values
+        return [
+            (position, len(value), posting[0], posting[1])
+            for posting in self._containing(query)
+            for value in (values[posting],)
+            for position in (value.find(query),)
+            if position >= 0
+        ]
+
+    def _substring_top(self, query: str, limit: int) -> Tuple[List[_RankKey], Optional[int]]:
+        """
+        子串检索：短查询可匹配上万个值，而出现在开头的匹配总是排在最前，
+        前缀匹配已足够 limit 个条目时只对它们排序，其余匹配只计数
+
+        Returns:
+            (排序键, 匹配的条目总数)，排序键包含全部匹配时总数为 None
+        """
+        # 前缀匹配的位置均为 0
+        keys = [(0,) + key[1:] for key in self._prefix(query)]
+        if len({key[2] for key in keys}) < limit:
+            return self._substring(query), None
+
+        candidates = self._containing(query)
+        if len(query) > 2:
+            values = self._values
+            candidates = [posting for posting in candidates if query in values[posting]]
+        return keys, len({item_id for item_id, _ in candidates})
+
+    def _containing(self, text: str) -> Set[Tuple[int, int]]:
+        """可能包含 text 的字段（倒排表的交集，尚需核对）"""
+        if len(text) == 1:
+            return self._grams.get(text, set())
+
+        postings = sorted(
+            (self._grams.get(gram, set()) for gram in _bigrams(text)),
+            key=len
+        )
+        return postings[0].intersection(*postings[1:])
+
+    def _fuzzy(self, query: str, max_distance: Optional[int]) -> List[_RankKey]:
+        # 每 3 个字符最多允许一次编辑，避免短查询匹配到大量无关的值
+        limit = min(MAX_EDIT_DISTANCE if max_distance is None else max_distance, len(query) // 3)
+
+        if limit == 0:
+            return [key for key in self._prefix(query) if key[0] == 0]
+
+        if len(query) + limit <= _DELETE_INDEX_MAX_LENGTH:
+            # 编辑距离为 1 的两个字符串，各自删除至多一个字符后必有相同的变体
+            candidates = set()
+            for variant in _deletes(query) | {query}:
+                candidates.update(self._deleted.get(variant, ()))
+        else:
+            # 查询分为 limit + 1 段，编辑距离不超过 limit 的值至少完整包含其中一段
+            size = len(query) // (limit + 1)
+            candidates = set()
+            for i in range(limit + 1):
+                piece = query[i * size:] if i == limit else query[i * size:(i + 1) * size]
+                candidates.update(self._containing(piece))
+
+        # 短查询的分段只有一两个字符，候选多达数千个，逐个计算编辑距离太慢；
+        # 以下两步过滤都是集合运算，只对剩下的少数候选计算编辑距离
+        length = len(query)
+        candidates = set().union(*(
+            candidates & self._lengths[n]
+            for n in range(length - limit, length + limit + 1)
+            if n in self._lengths
+        ))
+
+        # 每次编辑至多使两者共有的字符（按出现次数计）少一个，编辑距离不超过 limit 的值
+        # 与查询至少共有 max(查询长度, 值长度) - limit 个字符
+        counts: Counter = Counter()
+        for char, repeat in Counter(query).items():
+            for k in range(1, repeat + 1):
+                postings = self._grams.get(char) if k == 1 else self._repeats.get((char, k))
+                if not postings:
+                    break
+                counts.update(candidates & postings)
+
+        # 每次编辑至多破坏两个二元组，编辑距离不超过 limit 的值至少共有 二元组数 - 2 * limit 个
+        grams = _bigrams(query)
+        threshold = len(grams) - 2 * limit
+
+        values = self._values
+        keys = []
+        for posting, common in counts.items():
+            if common < length - limit:
+                continue
+            value = values[posting]
+            if common < len(value) - limit:
+                continue
+            if threshold > 1 and sum(gram in value for gram in grams) < threshold:
+                continue
+            distance = edit_distance(query, value, limit)
+            if distance <= limit:
+                keys.append((distance, len(value), posting[0], posting[1]))
+        return keys
+
+    def _identity(self, item: Any) -> Any:
+        """条目内容的可哈希表示（同一字典文件中各条目的字段顺序一致）"""
+        if isinstance(item, dict):
+            return tuple((k, v) for k, v in item.items() if isinstance(v, str))
+        return item
+
+    def _field_values(self, item: Any) -> List[Tuple[int, str]]:
+        if not isinstance(item, dict):
+            return [(0, item.lower())] if isinstance(item, str) and item else []
+        return [
+            (field, item[name].lower())
+            for field, name in enumerate(self.fields)
+            if isinstance(item.get(name), str) and item[name]
+        ]
+
+    def _add(self, item: Any, identity: Any) -> None:
+        item_id = self._next_id
+        self._next_id += 1
+        self._items[item_id] = item
+        self._ids.setdefault(identity, []).append(item_id)
+
+        for field, value in self._field_values(item):
+            posting = (item_id, field)
+            self._values[posting] = value
+            self._sorted.append((value, item_id, field))
+            for gram in set(value) | _bigrams(value):
+                self._grams.setdefault(gram, set()).add(posting)
+            for repeat in _repeats(value):
+                self._repeats.setdefault(repeat, set()).add(posting)
+            self._lengths.setdefault(len(value), set()).add(posting)
+            if len(value) <= _DELETE_INDEX_MAX_LENGTH:
+                for variant in _deletes(value) | {value}:
+                    self._deleted.setdefault(variant, set()).add(posting)
+
+    def _remove(self, item_id: int) -> None:
+        item = self._items.pop(item_id)
+        identity = self._identity(item)
+        self._ids[identity].remove(item_id)
+        if not self._ids[identity]:
+            del self._ids[identity]
+
+        for field, value in self._field_values(item):
+            posting = (item_id, field)
+            del self._values[posting]
+            del self._sorted[bisect.bisect_left(self._sorted, (value, item_id, field))]
+            for gram in set(value) | _bigrams(value):
+                self._discard(self._grams, gram, posting)
+            for repeat in _repeats(value):
+                self._discard(self._repeats, repeat, posting)
+            self._discard(self._lengths, len(value), posting)
+            if len(value) <= _DELETE_INDEX_MAX_LENGTH:
+                for variant in _deletes(value) | {value}:
+                    self._discard(self._deleted, variant, posting)
+
+    @staticmethod
+    def _discard(index: Dict[Any, Set[Tuple[int, int]]], key: Any, posting: Tuple[int, int]) -> None:
+        postings = index[key]
+        postings.discard(posting)
+        if not postings:
+            del index[key]
+
+
+class DictionarySearch:
+    """绑定字典文件的检索索引，检索前按字典缓存的版本同步"""
+
+    def __init__(self, path: Path, name: str, items_field: str, fields: Tuple[str, ...]):
+        self.path = path
+        self.items_field = items_field
+        self.index = TermSearchIndex(name, fields)
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def refresh(self) -> None:
+        """字典文件变化后同步索引"""
+        cached = dictionary_cache.get(self.path)
+        version = cached.version if cached is not None else None
+        with self._lock:
+            if version != self.index.version or not self._loaded:
+                self.index.sync(cached.data.get(self.items_field, []) if cached else [], version)
+                self._loaded = True
+
+    def search(
+        self,
+        query: str,
+        mode: str,
+        limit: int,
+        max_distance: Optional[int] = None
+    ) -> Tuple[int, List[Tuple[_RankKey, Dict[str, Any]]]]:
+        self.refresh()
+        with self._lock:
+            return self.index.search(query, mode, limit, max_distance)
+
+
+# 全局检索索引实例
+correction_search = DictionarySearch(
+    settings.CORRECTION_DICT_PATH, 'correction', 'terms', ('source', 'target')
+)
+shielding_search = DictionarySearch(
+    settings.SHIELDING_DICT_PATH, 'shielding', 'protected_words', ('word',)
+)
+
+
+def warm_up_search() -> None:
+    """预先建立（或同步）全部字典的检索索引"""
+    for dictionary in (correction_search, shielding_search):
+        dictionary.refresh()
+
+
+def search_dictionaries(
+    query: str,
+    mode: str = 'substring',
+    dictionaries: Iterable[DictionarySearch] = (correction_search, shielding_search),
+    limit: int = 50,
+    max_distance: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    在多个字典中检索并合并排名
+
+    Args:
+        query: 查询文本
+        mode: prefix / substring / fuzzy
+        dictionaries: 要检索的字典
+        limit: 最多返回的条目数
+        max_distance: 模糊匹配的最大编辑距离（默认 2，短查询为 1）
+
+    Returns:
+        {"total": 匹配的条目总数, "results": [{"dictionary", "field", "item"(, "distance")}]}
+    """
+    total = 0
+    ranked = []
+    for dictionary in dictionaries:
+        count, results = dictionary.search(query, mode, limit, max_distance)
+        total += count
+        ranked.extend(results)
+
+    ranked.sort(key=lambda pair: pair[0])
+    return {'total': total, 'results': [result for _, result in ranked[:limit]]}
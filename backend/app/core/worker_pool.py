@@ -0,0 +1,447 @@
+"""
+字幕处理进程池
+将 CPU 密集的字幕处理放到独立进程中执行，避免阻塞事件循环；
+服务进程中不调用引擎（引擎的单次处理状态保存在实例上，不是线程安全的）
+"""
+
+import io
+import os
+import asyncio
+import logging
+import multiprocessing
+import tempfile
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .config import settings
+from .engine_registry import DictionarySnapshot, engine_registry
+from .srt_parser import SRTParser
+from .term_index import TermIndexBuilder, load_term_index, save_term_index
+
+logger = logging.getLogger(__name__)
+
+# 全局进程池（按需创建）
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool_size() -> int:
+    """进程池大小：优先使用 PROCESS_POOL_SIZE，未配置时按并发任务数与 CPU 核数"""
+    if settings.PROCESS_POOL_SIZE > 0:
+        return settings.PROCESS_POOL_SIZE
+    return max(1, min(settings.MAX_CONCURRENT_TASKS, os.cpu_count() or 1))
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """获取全局进程池"""
+    global _pool
+
+    with _pool_lock:
+        if _pool is None:
+            size = get_pool_size()
+            snapshot = engine_registry.current()
+            # 使用 spawn 启动方式，避免在多线程的服务进程中 fork
+            _pool = ProcessPoolExecutor(
+                max_workers=size,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(snapshot.correction_path, snapshot.shielding_path)
+            )
+            logger.info(f"字幕处理进程池已启动: {size} 个工作进程")
+
+        return _pool
+
+
+def warm_up_process_pool() -> None:
+    """预先启动全部工作进程（不等待完成），使首个任务无需等待进程启动和字典编译"""
+    pool = get_process_pool()
+    for _ in range(get_pool_size()):
+        pool.submit(_noop)
+
+
+def preload_snapshot(snapshot: DictionarySnapshot) -> None:
+    """
+    让已启动的工作进程预先编译新版本的字典（不等待完成），字典更新后的首个任务无需等待编译
+
+    进程池尚未创建时不做任何事，创建时由初始化函数加载当时的版本
+    """
+    with _pool_lock:
+        pool = _pool
+    if pool is None:
+        return
+
+    try:
+        for _ in range(get_pool_size()):
+            pool.submit(_init_worker, snapshot.correction_path, snapshot.shielding_path)
+    except RuntimeError:
+        # 进程池已关闭或已损坏，由下一个任务重新创建
+        pass
+
+
+def shutdown_process_pool(wait: bool = True) -> None:
+    """关闭全局进程池（进程池损坏后也用于重置）"""
+    global _pool
+
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=True)
+            _pool = None
+            logger.info("字幕处理进程池已关闭")
+
+
+def _noop() -> None:
+    """空任务，仅用于触发工作进程启动"""
+
+
+def _init_worker(correction_path: str, shielding_path: str) -> None:
+    """工作进程初始化：预先加载当前版本的字典快照并编译引擎"""
+    try:
+        engine_registry.load(correction_path, shielding_path)
+    except FileNotFoundError:
+        # 只是预热，快照已被清理时由任务按各自的快照加载
+        logger.warning(f"预加载字典快照失败，快照已被清理: {correction_path}")
+
+
+def _temp_path(path: str) -> str:
+    """在目标文件所在目录创建唯一的临时文件（同一文件被多个任务同时处理时互不干扰）"""
+    directory, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp', dir=directory or None)
+    os.close(fd)
+    return temp_path
+
+
+def process_file_job(
+    input_path: str,
+    output_path: str,
+    diff_path: str,
+    correction_path: str,
+    shielding_path: str,
+    index_path: Optional[str] = None,
+    index_meta: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    在工作进程中处理单个 SRT 文件（流式处理，内存只保留一批字幕）
+
+    提供 index_path 时记录规则命中索引；同一文件上次处理留下的索引可用时
+    （输入内容与处理选项相同，只有字典版本不同，且索引对应的差异数据仍在）
+    只重新处理受字典修改影响的条目
+
+    Args:
+        input_path: 原始文件路径
+        output_path: 处理后文件的保存路径
+        diff_path: 差异数据（JSON Lines）的保存路径
+        correction_path: 修正规则库快照路径
+        shielding_path: 保护词库快照路径
+        index_path: 规则命中索引的保存路径
+        index_meta: 索引的元数据 {"version", "input_digest", "options"}，
+            保存时加入本次差异数据的路径
+
+    Returns:
+        处理报告（不含 diff_data）
+    """
+    processor = engine_registry.load(correction_path, shielding_path)
+
+    if index_path is not None:
+        report = _reprocess_file(processor, input_path, output_path, diff_path, index_path, index_meta)
+        if report is not None:
+            return report
+
+    index = TermIndexBuilder() if index_path is not None else None
+
+    # 先写临时文件，处理完成后再改名，失败时不会留下不完整的输出
+    temp_output = _temp_path(output_path)
+    temp_diff = _temp_path(diff_path)
+
+    try:
+        with open(input_path, 'r', encoding='utf-8') as src, \
+                open(temp_output, 'w', encoding='utf-8') as dst, \
+                open(temp_diff, 'w', encoding='utf-8') as diff:
+            report = processor.process_stream(src, dst, diff_output=diff, index=index)
+
+        os.replace(temp_output, output_path)
+        os.replace(temp_diff, diff_path)
+
+    except BaseException:
+        _remove_files(temp_output, temp_diff)
+        raise
+
+    _save_index(index_path, index_meta, diff_path, index, report)
+    return report
+
+
+def reprocess_file_job(
+    input_path: str,
+    output_path: str,
+    diff_path: str,
+    correction_path: str,
+    shielding_path: str,
+    index_path: str,
+    index_meta: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    在工作进程中按上次的索引增量处理
+
+    Returns:
+        处理报告，无法增量处理时返回 None
+    """
+    processor = engine_registry.load(correction_path, shielding_path)
+    return _reprocess_file(processor, input_path, output_path, diff_path, index_path, index_meta)
+
+
+async def run_job(executor: Executor, fn: Callable[..., Any], *args: Any) -> Any:
+    """
+    在进程池中执行作业并等待结果
+
+    进程中的作业无法中断：等待的协程被取消（如任务超时）时，尚未开始的作业直接取消，
+    已在运行的作业等它结束后才抛出 CancelledError。调用方因此在作业结束前不会退出，
+    调度器也不会提前释放并发名额
+    """
+    concurrent_future = executor.submit(fn, *args)
+    future = asyncio.wrap_future(concurrent_future)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if not concurrent_future.cancel():
+            await asyncio.wait([future])
+        raise
+
+
+async def process_large_file(
+    executor: Executor,
+    input_path: str,
+    output_path: str,
+    diff_path: str,
+    correction_path: str,
+    shielding_path: str,
+    index_path: Optional[str] = None,
+    index_meta: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    并行处理大文件
+
+    按字幕块边界把文件切分为多个字节区间，各区间在工作进程中解析、处理并写出分块结果，
+    最后由一个工作进程合并。服务进程只在线程中查找切分位置，不解析字幕、不生成差异数据，
+    也不调用引擎。参数与 process_file_job 相同；被取消时同 run_job，等运行中的作业结束后才退出
+
+    Returns:
+        处理报告（不含 diff_data）
+    """
+    if index_path is not None:
+        report = await run_job(
+            executor, reprocess_file_job, input_path, output_path, diff_path,
+            correction_path, shielding_path, index_path, index_meta
+        )
+        if report is not None:
+            return report
+
+    ranges = await asyncio.to_thread(_split_file, input_path)
+
+    if len(ranges) <= 1:
+        return await run_job(
+            executor, process_file_job, input_path, output_path, diff_path,
+            correction_path, shielding_path, index_path, index_meta
+        )
+
+    logger.info(f"拆分为 {len(ranges)} 个分块并行处理: {input_path}")
+
+    record_index = index_path is not None
+    parts = [
+        (
+            _temp_path(output_path),
+            _temp_path(diff_path),
+            _temp_path(index_path) if record_index else None
+        )
+        for _ in ranges
+    ]
+
+    try:
+        # return_exceptions: 某个分块失败或任务被取消时，也等全部分块作业结束后才返回，
+        # 之后才删除分块文件
+        reports = await asyncio.gather(*(
+            run_job(
+                executor, process_range_job, input_path, start, end, *part,
+                correction_path, shielding_path
+            )
+            for (start, end), part in zip(ranges, parts)
+        ), return_exceptions=True)
+        for report in reports:
+            if isinstance(report, BaseException):
+                raise report
+
+        return await run_job(
+            executor,
+            merge_parts_job,
+            [(*part, report) for part, report in zip(parts, reports)],
+            output_path, diff_path, correction_path, shielding_path, index_path, index_meta
+        )
+
+    finally:
+        for part in parts:
+            _remove_files(*part)
+
+
+def _split_file(input_path: str) -> List[Tuple[int, int]]:
+    """按字幕块边界把文件切分为字节区间（按块读取，不读入整个文件）"""
+    with open(input_path, 'rb') as f:
+        return SRTParser.split_ranges(f, get_pool_size() * 2, settings.PARALLEL_CHUNK_MIN_ENTRIES)
+
+
+def process_range_job(
+    input_path: str,
+    start: int,
+    end: int,
+    output_path: str,
+    diff_path: str,
+    index_path: Optional[str],
+    correction_path: str,
+    shielding_path: str
+) -> Dict[str, Any]:
+    """
+    在工作进程中处理文件的一个字节区间（SRTParser.split_ranges 的结果），
+    写出该分块的处理结果、差异数据与索引（index_path 为 None 时不记录索引）
+
+    Returns:
+        分块的处理报告
+    """
+    processor = engine_registry.load(correction_path, shielding_path)
+
+    with open(input_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    index = TermIndexBuilder() if index_path is not None else None
+    with open(output_path, 'w', encoding='utf-8') as dst, \
+            open(diff_path, 'w', encoding='utf-8') as diff:
+        report = processor.process_stream(io.BytesIO(data), dst, diff_output=diff, index=index)
+
+    if index is not None and index.valid:
+        save_term_index(index_path, {}, index.to_dict())
+    return report
+
+
+def merge_parts_job(
+    parts: List[Tuple[str, str, Optional[str], Dict[str, Any]]],
+    output_path: str,
+    diff_path: str,
+    correction_path: str,
+    shielding_path: str,
+    index_path: Optional[str] = None,
+    index_meta: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    在工作进程中按顺序合并各分块的结果，写出处理后的文件、差异数据与索引
+
+    Args:
+        parts: [(分块输出路径, 分块差异数据路径, 分块索引路径, 分块报告)]
+
+    Returns:
+        处理报告（不含 diff_data）
+    """
+    processor = engine_registry.load(correction_path, shielding_path)
+
+    merged_parts = []
+    for part_output, part_diff, part_index_path, report in parts:
+        loaded = load_term_index(part_index_path) if part_index_path is not None else None
+        merged_parts.append((part_output, part_diff, report, loaded[1] if loaded else None))
+
+    index = TermIndexBuilder() if index_path is not None else None
+    temp_output = _temp_path(output_path)
+    temp_diff = _temp_path(diff_path)
+
+    try:
+        with open(temp_output, 'w', encoding='utf-8') as dst, \
+                open(temp_diff, 'w', encoding='utf-8') as diff:
+            report = processor.merge_parts(merged_parts, dst, diff, index=index)
+
+        os.replace(temp_output, output_path)
+        os.replace(temp_diff, diff_path)
+
+    except BaseException:
+        _remove_files(temp_output, temp_diff)
+        raise
+
+    _save_index(index_path, index_meta, diff_path, index, report)
+    return report
+
+
+def _reprocess_file(
+    processor,
+    input_path: str,
+    output_path: str,
+    diff_path: str,
+    index_path: str,
+    index_meta: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    按上次处理留下的索引增量处理
+
+    Returns:
+        处理报告，没有可用的索引或无法增量处理时返回 None
+    """
+    loaded = load_term_index(index_path)
+    if loaded is None:
+        return None
+    meta, previous_index = loaded
+    # 上次的差异数据属于上次的任务，任务被淘汰后不再可用
+    previous_diff_path = meta.get('diff_path')
+    if not previous_diff_path or not os.path.exists(previous_diff_path):
+        return None
+    if (meta.get('input_digest'), meta.get('options')) != (index_meta['input_digest'], index_meta['options']):
+        return None
+
+    snapshot = engine_registry.snapshot(meta['version'])
+    if snapshot is None:
+        return None
+    try:
+        previous = engine_registry.load(snapshot.correction_path, snapshot.shielding_path)
+    except FileNotFoundError:
+        # 快照在加载前被清理
+        return None
+
+    temp_output = _temp_path(output_path)
+    temp_diff = _temp_path(diff_path)
+    index = TermIndexBuilder()
+
+    try:
+        with open(input_path, 'r', encoding='utf-8') as src, \
+                open(previous_diff_path, 'r', encoding='utf-8') as previous_diff, \
+                open(temp_output, 'w', encoding='utf-8') as dst, \
+                open(temp_diff, 'w', encoding='utf-8') as diff:
+            report = processor.reprocess_stream(
+                src, previous_diff, previous_index, previous.engine.plan, dst, diff, index
+            )
+
+        if report is not None:
+            os.replace(temp_output, output_path)
+            os.replace(temp_diff, diff_path)
+
+    finally:
+        _remove_files(temp_output, temp_diff)
+
+    if report is not None:
+        _save_index(index_path, index_meta, diff_path, index, report)
+    return report
+
+
+def _save_index(
+    index_path: Optional[str],
+    index_meta: Optional[Dict[str, Any]],
+    diff_path: str,
+    index: Optional[TermIndexBuilder],
+    report: Dict[str, Any]
+) -> None:
+    """保存与本次差异数据对应的索引（未记录或记录失败时保留上次的索引）"""
+    if index_path is None or index is None or not index.valid:
+        return
+    save_term_index(
+        index_path,
+        {**index_meta, 'diff_path': diff_path},
+        {**index.to_dict(), 'diff_rules': report['diff_rules']}
+    )
+
+
+def _remove_files(*paths: Optional[str]) -> None:
+    for path in paths:
+        if path is not None and os.path.exists(path):
+            os.remove(path)
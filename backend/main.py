@@ -5,12 +5,18 @@ LinguistCG Backend - FastAPI Application
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from app.api import files, processing, dictionaries
 from app.core.config import settings
+from app.core.stats_manager import flush_stats, stats_aggregator
+from app.core.task_store import task_store
+from app.core.term_search import warm_up_search
+from app.core.worker_pool import shutdown_process_pool, warm_up_process_pool
 
 # 配置日志
 logging.basicConfig(
@@ -31,9 +37,28 @@ async def lifespan(app: FastAPI):
     settings.DICTIONARIES_DIR.mkdir(parents=True, exist_ok=True)
     settings.UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
+    # 上次运行时未完成的任务标记为中断
+    task_store.fail_interrupted()
+
+    # 预先编译当前版本的字典并启动工作进程
+    await asyncio.to_thread(warm_up_process_pool)
+
+    # 在后台建立字典检索索引
+    asyncio.get_running_loop().run_in_executor(None, warm_up_search)
+
+    # 加载累计统计，之后定期把内存中的增量写入文件
+    await asyncio.to_thread(flush_stats)
+    stats_flusher = asyncio.create_task(stats_aggregator.run_periodic_flush())
+
     yield
 
     logger.info("👋 LinguistCG Backend 关闭中...")
+    await processing.scheduler.shutdown()
+    shutdown_process_pool()
+
+    stats_flusher.cancel()
+    await asyncio.gather(stats_flusher, return_exceptions=True)
+    await asyncio.to_thread(flush_stats)
 
 
 # 创建 FastAPI 应用
@@ -53,6 +78,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩（已压缩的响应与 zip 等格式不会重复压缩）
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
+
 
 # 健康检查端点
 @app.get("/health")
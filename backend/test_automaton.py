@@ -0,0 +1,252 @@
+"""
+测试脚本 - 验证 Aho-Corasick 自动机与修正规则的替换语义
+"""
+
+import random
+
+from app.core.automaton import AhoCorasick
+from app.core.engine import SubtitleEngine
+
+
+def test_automaton_finds_overlapping_matches():
+    """自动机应找出全部（可重叠的）关键词"""
+    automaton = AhoCorasick(['he', 'she', 'his', 'hers', ''])
+
+    matches = sorted(automaton.iter_matches('ushers'))
+
+    assert matches == [(1, 1), (2, 0), (2, 3)]
+    assert automaton.matched_ids('ushers') == {0, 1, 3}
+    assert automaton.matched_ids('ushers', 0, 3) == set()
+
+
+def test_updated_automaton_matches_fresh_build():
+    """增删、调整顺序后增量更新的自动机与重新构建的一致，上一版本不受影响"""
+    rng = random.Random(0)
+
+    def word():
+        return ''.join(rng.choice('abcd') for _ in range(rng.randint(1, 5)))
+
+    for _ in range(100):
+        patterns = [word() for _ in range(rng.randint(0, 12))]
+        automaton = AhoCorasick(patterns)
+        versions = []
+        for _ in range(5):
+            versions.append((automaton, patterns))
+            patterns = list(patterns)
+            for _ in range(rng.randint(1, 4)):
+                if patterns and rng.random() < 0.4:
+                    patterns.pop(rng.randrange(len(patterns)))
+                else:
+                    patterns.insert(rng.randint(0, len(patterns)), word())
+            automaton = automaton.updated(patterns)
+        versions.append((automaton, patterns))
+
+        for version, version_patterns in versions:
+            fresh = AhoCorasick(version_patterns)
+            for _ in range(5):
+                text = ''.join(rng.choice('abcde') for _ in range(rng.randint(0, 16)))
+                assert sorted(version.iter_matches(text)) == sorted(fresh.iter_matches(text))
+                assert version.matched_ids(text) == fresh.matched_ids(text)
+            assert version.max_length == fresh.max_length
+
+
+def test_corrections_keep_longest_first_and_boundaries():
+    """长词优先、英文边界与替换计数应与逐条正则替换一致"""
+    engine = SubtitleEngine(
+        correction_terms=[
+            {'source': 'Key', 'target': '键'},
+            {'source': 'Keyframe', 'target': '关键帧'},
+            {'source': '关键帧动画', 'target': '关键帧动画制作'},
+        ],
+        protected_words=[],
+        noise_patterns=[]
+    )
+
+    text, stats = engine.process('Keyframe动画 Key Keys Key')
+
+    # Keyframe 先替换为 关键帧，随后级联命中 "关键帧动画"；Keys 不满足边界
+    assert text == '关键帧动画制作 键 Keys 键'
+    assert stats.term_corrections == 4
+    assert {d['source']: d['count'] for d in stats.replacement_details} == {
+        'Keyframe': 1,
+        '关键帧动画': 1,
+        'Key': 2,
+    }
+
+
+def test_protected_words_keep_each_match_casing():
+    """保护词单次扫描：长词优先，且每处匹配保留各自的大小写"""
+    engine = SubtitleEngine(
+        correction_terms=[
+            {'source': 'Maya', 'target': '玛雅'},
+            {'source': '5', 'target': '五'},
+        ],
+        protected_words=['maya', 'UE', 'UE 5'],
+        noise_patterns=[]
+    )
+
+    text, stats = engine.process('MAYA and maya, Mayas UE 5')
+
+    assert text == 'MAYA and maya, Mayas UE 5'
+    assert stats.term_corrections == 0
+    assert sorted(engine.shield_map.values()) == ['MAYA', 'UE 5', 'maya']
+
+
+def test_bilingual_annotation_is_kept():
+    """双语标注 target(source) 保持原样，其余位置正常替换"""
+    engine = SubtitleEngine(
+        correction_terms=[
+            {'source': 'Threshold', 'target': '阈值'},
+            {'source': 'Level of Detail (LOD)', 'target': '细节层次'},
+        ],
+        protected_words=[],
+        noise_patterns=[]
+    )
+
+    text, stats = engine.process(
+        '阈值(Threshold) 阈值（Threshold） Threshold 细节层次(Level of Detail (LOD))'
+    )
+
+    assert text == '阈值(Threshold) 阈值（Threshold） 阈值 细节层次(Level of Detail (LOD))'
+    assert stats.term_corrections == 1
+
+
+def test_placeholders_are_not_matched_by_rules():
+    """修正规则与噪音模式不会匹配占位符，保护词与双语标注原样还原"""
+    terms = [
+        {'source': '0', 'target': '零'},
+        {'source': 'Threshold', 'target': '阈值'},
+    ]
+    for source in ('SHIELD', 'BILINGUAL', '#', '_'):
+        terms.append({'source': source, 'target': 'X'})
+    engine = SubtitleEngine(
+        correction_terms=terms,
+        protected_words=['maya'],
+        noise_patterns=[r'\d', '#+', '_']
+    )
+
+    text, _ = engine.process('use maya 0 here 阈值(Threshold)')
+    outputs, _ = engine.process_many(['use maya 0 here', '阈值(Threshold) maya'])
+
+    assert text == 'use maya 零 here 阈值(Threshold)'
+    assert outputs == ['use maya 零 here', '阈值(Threshold) maya']
+
+
+def test_noise_patterns_are_fused_with_per_pattern_counts():
+    """噪音模式合并为单个正则，次数仍归属到各模式；含反向引用的模式回退执行"""
+    engine = SubtitleEngine(
+        correction_terms=[],
+        protected_words=[],
+        noise_patterns=[r'\(音乐\)', r'\[订阅\]', r'(啊)\1']
+    )
+
+    text, stats = engine.process('Hello (音乐) World  [订阅]\n\n\n(音乐)啊啊')
+
+    assert engine.plan.noise_matcher.fallback[0].pattern == r'(啊)\1'
+    assert text == 'Hello World \n\n'
+    assert stats.noise_removals == 4
+    assert stats.noise_details == {r'\(音乐\)': 2, r'\[订阅\]': 1, r'(啊)\1': 1}
+
+
+def test_fused_noise_removal_repeats_until_stable():
+    """移除噪音后露出的噪音同样被移除，与模式的先后顺序无关"""
+    noise_patterns = [r'\(静音\)', r'\(字幕\)']
+    engine = SubtitleEngine(correction_terms=[], protected_words=[], noise_patterns=noise_patterns)
+
+    text, stats = engine.process('(字(静音)幕) 你好 ((字幕)静音)')
+    outputs, batch_stats = engine.process_many(['(字(静音)幕)', '你好 ((字幕)静音)'])
+
+    assert text == ' 你好 '
+    assert outputs == ['', '你好 ']
+    assert stats.noise_details == {r'\(静音\)': 2, r'\(字幕\)': 2}
+    assert batch_stats.noise_details == stats.noise_details
+
+
+def test_process_many_matches_per_entry_processing():
+    """批量处理的逐条输出与累计统计应与逐条调用 process 一致"""
+    engine = SubtitleEngine(
+        correction_terms=[
+            {'source': 'Keyframe', 'target': '关键帧'},
+            {'source': 'Threshold', 'target': '阈值'},
+        ],
+        protected_words=['maya'],
+        noise_patterns=[r'（音乐）']
+    )
+    texts = [
+        'Keyframe in Maya',
+        '阈值(Threshold)  Threshold（音乐）',
+        '',
+        'Maya Keyframe\n\n\nKeyframe',
+    ]
+
+    expected = [engine.process(text)[0] for text in texts]
+    outputs, stats = engine.process_many(texts)
+
+    assert outputs == expected
+    assert stats.term_corrections == 4
+    assert stats.noise_removals == 1
+    assert {d['source']: d['count'] for d in stats.replacement_details} == {
+        'Keyframe': 3,
+        'Threshold': 1,
+    }
+
+
+def test_merged_chunk_stats_match_whole_batch():
+    """分块处理后合并的统计信息应与整体批量处理一致"""
+    engine = SubtitleEngine(
+        correction_terms=[
+            {'source': 'Key', 'target': '键'},
+            {'source': 'Keyframe', 'target': '关键帧'},
+        ],
+        protected_words=[],
+        noise_patterns=[r'（音乐）']
+    )
+    texts = ['Key', 'Keyframe（音乐）', 'Key Keyframe', 'Keyframe']
+
+    outputs, whole = engine.process_many(texts)
+    whole_details = list(whole.replacement_details)
+
+    chunk_stats = []
+    chunk_outputs = []
+    for chunk in (texts[:1], texts[1:]):
+        chunk_output, stats = engine.process_many(chunk)
+        chunk_outputs.extend(chunk_output)
+        chunk_stats.append(stats)
+
+    merged = engine.merge_stats(chunk_stats)
+
+    assert chunk_outputs == outputs
+    assert merged.replacement_details == whole_details
+    assert merged.total_replacements == whole.total_replacements
+    assert merged.noise_details == whole.noise_details
+
+
+def test_entry_memo_reuses_repeated_entries():
+    """使用条目记忆时输出与统计信息不变，重复的条目（批次内与跨批次）不再处理"""
+    kwargs = dict(
+        correction_terms=[
+            {'source': 'Keyframe', 'target': '关键帧'},
+            {'source': 'Threshold', 'target': '阈值'},
+        ],
+        protected_words=['maya'],
+        noise_patterns=[r'（音乐）']
+    )
+    plain = SubtitleEngine(**kwargs)
+    memoized = SubtitleEngine(**kwargs, memo_size=10)
+    texts = [
+        'Keyframe in Maya（音乐）',
+        '阈值(Threshold)  Threshold',
+        'Keyframe in Maya（音乐）',
+        '',
+    ]
+
+    # 第一批中重复的一条直接使用结果，第二批全部来自记忆
+    for expected_hits, expected_misses in ((1, 3), (4, 0)):
+        expected, expected_stats = plain.process_many(texts)
+        outputs, stats = memoized.process_many(texts)
+
+        assert outputs == expected
+        assert stats.replacement_details == expected_stats.replacement_details
+        assert stats.noise_details == expected_stats.noise_details
+        assert stats.total_replacements == expected_stats.total_replacements
+        assert (stats.memo_hits, stats.memo_misses) == (expected_hits, expected_misses)
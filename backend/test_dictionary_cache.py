@@ -0,0 +1,75 @@
+"""
+测试脚本 - 验证字典缓存的版本、分类索引与预先压缩的响应体
+"""
+
+import gzip
+import json
+import os
+
+from app.core.dictionary_cache import DictionaryCache
+
+
+def test_cache_reuses_version_until_file_changes(tmp_path):
+    """文件未变化时返回同一份缓存，改写后版本随内容变化"""
+    path = tmp_path / "correction_dict.json"
+    data = {'terms': [
+        {'source': 'octane', 'target': 'Octane', 'category': '软件'},
+        {'source': '阀值', 'target': '阈值'},
+        {'source': 'redshift', 'target': 'Redshift', 'category': '软件'},
+    ]}
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+
+    cache = DictionaryCache()
+    cached = cache.get(path)
+
+    assert cache.get(path) is cached
+    assert cached.data == data
+    assert cached.etag == f'"{cached.version}"'
+    assert [t['source'] for t in cached.terms_by_category()['软件']] == ['octane', 'redshift']
+    assert [t['source'] for t in cached.terms_by_category()['术语映射']] == ['阀值']
+
+    body, encoding = cached.encoded_body('gzip, deflate')
+    assert encoding == 'gzip'
+    assert gzip.decompress(body) == cached.body
+    assert cached.encoded_body('identity') == (cached.body, None)
+
+    data['terms'].pop()
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    os.utime(path, ns=(0, 0))
+
+    updated = cache.get(path)
+    assert updated.version != cached.version
+    assert updated.data == data
+    assert cache.get(tmp_path / "missing.json") is None
+
+
+def test_stats_computed_once_per_version(tmp_path):
+    """统计信息随缓存按版本保存，文件改写后重新计算"""
+    path = tmp_path / "correction_dict.json"
+    data = {
+        'terms': [
+            {'source': 'octane', 'target': 'Octane', 'category': '软件'},
+            {'source': '阀值', 'target': '阈值'},
+        ],
+        'noise_patterns': ['嗯+'],
+        'revision': 3
+    }
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+
+    cache = DictionaryCache()
+    stats = cache.get(path).stats()
+    assert stats == {
+        'version': cache.get(path).version,
+        'revision': 3,
+        'terms': 2,
+        'categories': {'软件': 1, '术语映射': 1},
+        'noise_patterns': 1,
+        'protected_words': 0
+    }
+    assert cache.get(path).stats() is stats
+
+    data['terms'].append({'source': 'redshift', 'target': 'Redshift', 'category': '软件'})
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    cache.invalidate(path)
+
+    assert cache.get(path).stats()['categories'] == {'软件': 2, '术语映射': 1}
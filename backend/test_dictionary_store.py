@@ -0,0 +1,123 @@
+"""
+测试脚本 - 验证按条目修改字典的修订号、修改日志与规则计划的增量编译
+"""
+
+import json
+
+import pytest
+
+from app.core.dictionary_store import (
+    CorrectionStore,
+    DictionaryStore,
+    DuplicateTermError,
+    RevisionConflictError,
+    ShieldingStore,
+    TermNotFoundError,
+)
+from app.core.rule_plan import compile_rule_plan
+
+
+def _store(tmp_path, cls, data):
+    path = tmp_path / "dict.json"
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    return cls(path, tmp_path / "journal" / "dict.jsonl"), path
+
+
+def test_apply_edits_terms_with_revision_check(tmp_path):
+    """修改按修订号检查冲突，一组操作全部生效或全部不生效，修改日志可按修订号同步"""
+    store, path = _store(tmp_path, CorrectionStore, {
+        'terms': [
+            {'source': 'octane', 'target': 'Octane', 'category': '软件'},
+            {'source': '阀值', 'target': '阈值', 'category': '术语映射'},
+        ],
+        'noise_patterns': ['x']
+    })
+
+    result = store.apply([
+        {'op': 'update', 'key': 'octane', 'value': {'target': 'OctaneRender'}},
+        {'op': 'add', 'value': {'source': 'redshift', 'target': 'Redshift'}},
+        {'op': 'delete', 'key': '阀值'},
+    ], revision=0)
+
+    assert result['revision'] == 1
+    data = json.loads(path.read_text(encoding='utf-8'))
+    assert data == {
+        'terms': [
+            {'source': 'octane', 'target': 'OctaneRender', 'category': '软件'},
+            {'source': 'redshift', 'target': 'Redshift', 'category': '术语映射'},
+        ],
+        'noise_patterns': ['x'],
+        'revision': 1
+    }
+
+    with pytest.raises(RevisionConflictError) as conflict:
+        store.apply([{'op': 'delete', 'key': 'octane'}], revision=0)
+    assert conflict.value.revision == 1
+    with pytest.raises(TermNotFoundError):
+        store.apply([{'op': 'delete', 'key': 'octane'}, {'op': 'delete', 'key': '阀值'}], revision=1)
+    with pytest.raises(DuplicateTermError):
+        store.apply([{'op': 'update', 'key': 'octane', 'value': {'source': 'redshift'}}], revision=1)
+    assert json.loads(path.read_text(encoding='utf-8')) == data
+
+    store.apply([{'op': 'delete', 'key': 'redshift'}], revision=1)
+    changes = store.changes_since(0)
+    assert [entry['revision'] for entry in changes] == [1, 2]
+    assert changes[1]['operations'] == [{'op': 'delete', 'key': 'redshift', 'value': None}]
+
+    assert store.replace({'terms': [], 'revision': 2}) == 3
+    assert store.changes_since(2) is None
+    assert store.changes_since(3) == []
+
+
+def test_shielding_store_keeps_item_format(tmp_path):
+    """保护词按词定位，字符串与对象格式的条目修改后保持原格式"""
+    store, path = _store(tmp_path, ShieldingStore, {
+        'protected_words': ['maya', {'word': 'houdini', 'category': '软件'}]
+    })
+
+    store.apply([
+        {'op': 'update', 'key': 'maya', 'value': ' Maya '},
+        {'op': 'update', 'key': 'houdini', 'value': 'Houdini'},
+        {'op': 'add', 'value': 'blender'},
+    ], revision=0)
+
+    assert json.loads(path.read_text(encoding='utf-8'))['protected_words'] == [
+        'Maya', {'word': 'Houdini', 'category': '软件'}, 'blender'
+    ]
+
+
+def test_dictionary_store_requires_key_and_item_builder(tmp_path):
+    """基类没有条目的键与构造方法，不能直接使用"""
+    with pytest.raises(TypeError):
+        DictionaryStore(tmp_path / "dict.json", tmp_path / "journal" / "dict.jsonl")
+
+
+def test_compile_rule_plan_reuses_unchanged_parts():
+    """只修改 target 时复用自动机，只修改保护词时复用修正规则的编译结果，结果与重新编译一致"""
+    terms = [{'source': 'octane', 'target': 'Octane'}, {'source': '阀值', 'target': '阈值'}]
+    base = compile_rule_plan(terms, ['maya'], [r'\(音乐\)'])
+
+    retargeted = [{'source': 'octane', 'target': 'OctaneRender'}, terms[1]]
+    plan = compile_rule_plan(retargeted, ['maya'], [r'\(音乐\)'], base=base)
+    assert plan.automaton is base.automaton
+    assert plan.bilingual_index is not base.bilingual_index
+    assert plan.protected_pattern is base.protected_pattern
+    assert plan.terms == compile_rule_plan(retargeted, ['maya'], [r'\(音乐\)']).terms
+
+    protected_words = ['maya', 'houdini']
+    plan = compile_rule_plan(terms, protected_words, [r'\(音乐\)'], base=base)
+    assert plan.automaton is base.automaton
+    assert plan.bilingual_index is base.bilingual_index
+    assert plan.protected_pattern == compile_rule_plan(terms, protected_words, []).protected_pattern
+
+    # 新增、删除规则时在 base 的自动机与双语标注索引上增量更新，结果与重新编译一致
+    edited = [{'source': 'redshift', 'target': 'Redshift'}, terms[1], {'source': '阀', 'target': '阈'}]
+    plan = compile_rule_plan(edited, ['maya'], [r'\(音乐\)'], base=base)
+    fresh = compile_rule_plan(edited, ['maya'], [r'\(音乐\)'])
+    assert plan.automaton is not base.automaton
+    assert len(plan.automaton) == 3
+    text = 'octane redshift 阀值(阀值) 阈(阀)'
+    assert plan.automaton.matched_ids(text) == fresh.automaton.matched_ids(text) == {0, 1, 2}
+    assert plan.bilingual_index.find(text) == fresh.bilingual_index.find(text)
+    assert base.automaton.matched_ids(text) == {0, 1}
+
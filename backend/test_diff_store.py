@@ -0,0 +1,94 @@
+"""
+测试脚本 - 验证紧凑差异数据的编辑操作与游标分页
+"""
+
+import json
+
+import pytest
+
+from app.core.diff_store import DiffWriter, read_diff_page
+from app.core.edit_script import apply_edit_ops, build_edit_ops
+from app.core.rule_plan import compile_rule_plan
+
+
+def _write_all(items, output):
+    writer = DiffWriter(output)
+    for item in items:
+        writer.write(item)
+    writer.flush()
+    return writer.rules
+
+
+def _read_all(path, limit, changed_only=False):
+    entries, cursor, pages = [], 0, 0
+    while cursor is not None:
+        page, cursor = read_diff_page(path, cursor, limit, changed_only)
+        entries.extend(page)
+        pages += 1
+    return entries, pages
+
+
+def test_edit_ops_cover_whole_terms_and_name_their_rules():
+    """术语替换合并为完整的操作并标注规则，噪音移除标注噪音模式"""
+    plan = compile_rule_plan(
+        [{'source': 'octane', 'target': 'Octane'}, {'source': '阀值', 'target': '阈值'}],
+        [],
+        [r'\(音乐\)']
+    )
+    original = 'octane 阀值(音乐)'
+    modified = 'Octane 阈值'
+
+    ops = build_edit_ops(original, modified, plan)
+
+    assert ops == [
+        [0, 6, 'Octane', {'source': 'octane', 'target': 'Octane'}],
+        [7, 9, '阈值', {'source': '阀值', 'target': '阈值'}],
+        [9, 13, '', {'noise': r'\(音乐\)'}],
+    ]
+    assert apply_edit_ops(original, ops) == modified
+    assert build_edit_ops(original, original, plan) == []
+
+
+def test_read_diff_page_walks_compact_items_with_cursor(tmp_path):
+    """未修改的条目合并为引用区间，规则写为规则表下标，逐页读取不返回多余的游标"""
+    rule = {'source': 'a', 'target': 'b'}
+    items = []
+    for i in range(1, 11):
+        if i % 3 == 0:
+            items.append({
+                'type': 'changed', 'index': i, 'time': '', 'original': 'a',
+                'ops': [[0, 1, 'b', rule]]
+            })
+        else:
+            items.append({'type': 'unchanged', 'index': i})
+
+    path = tmp_path / "diff.jsonl"
+    with open(path, 'w', encoding='utf-8') as f:
+        assert _write_all(items, f) == [rule]
+
+    lines = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert lines[0] == {'type': 'unchanged', 'first': 1, 'last': 2, 'count': 2}
+    assert lines[1]['ops'] == [[0, 1, 'b', 0]]
+    assert lines[-1] == {'type': 'unchanged', 'first': 10, 'last': 10, 'count': 1}
+
+    entries, pages = _read_all(path, limit=4)
+    assert entries == lines
+    assert pages == 2
+
+    changed, pages = _read_all(path, limit=3, changed_only=True)
+    assert [entry['index'] for entry in changed] == [3, 6, 9]
+    assert pages == 1
+
+
+def test_read_diff_page_rejects_cursor_inside_a_line(tmp_path):
+    """游标不在行首或超出文件大小时报错，而不是解析半行数据"""
+    path = tmp_path / "diff.jsonl"
+    with open(path, 'w', encoding='utf-8') as f:
+        _write_all([{'type': 'unchanged', 'index': i} for i in (1, 3, 5)], f)
+    size = path.stat().st_size
+
+    for cursor in (5, size + 1, -1):
+        with pytest.raises(ValueError):
+            read_diff_page(str(path), cursor)
+
+    assert read_diff_page(str(path), size) == ([], None)
@@ -0,0 +1,106 @@
+"""
+测试脚本 - 验证引擎注册表的版本缓存与失效
+"""
+
+import os
+import json
+
+import pytest
+
+from app.core.engine_registry import EngineRegistry
+
+
+def _write(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def test_registry_reuses_processor_until_dictionary_changes(tmp_path):
+    """字典未变化时复用处理器；更新后切换版本，旧快照仍可供进行中的任务使用"""
+    correction_path = tmp_path / "Correction.json"
+    shielding_path = tmp_path / "shielding.json"
+    _write(correction_path, {'terms': [{'source': 'Maya', 'target': '玛雅'}]})
+    _write(shielding_path, {'protected_words': []})
+
+    registry = EngineRegistry(correction_path, shielding_path, tmp_path / "snapshots")
+
+    old_snapshot = registry.current()
+    assert registry.current() is old_snapshot
+    # 服务进程只建立快照，不编译处理器
+    assert not registry._processors
+
+    old_processor = registry.load(old_snapshot.correction_path, old_snapshot.shielding_path)
+    assert registry.load(old_snapshot.correction_path, old_snapshot.shielding_path) is old_processor
+
+    _write(correction_path, {'terms': [{'source': 'Maya', 'target': 'MAYA'}]})
+    new_snapshot = registry.rebuild()
+    assert registry.current() is new_snapshot
+
+    assert new_snapshot.version != old_snapshot.version
+    new_processor = registry.load(new_snapshot.correction_path, new_snapshot.shielding_path)
+    assert new_processor.engine.process('Maya')[0] == 'MAYA'
+
+    # 进行中的任务按旧快照加载，仍得到旧版本的结果
+    stale = registry.load(old_snapshot.correction_path, old_snapshot.shielding_path)
+    assert stale.engine.process('Maya')[0] == '玛雅'
+
+
+def test_pinned_snapshots_survive_pruning(tmp_path, monkeypatch):
+    """运行中的任务固定的快照不被清理；已清理的快照加载时报错，而不是按空字典处理"""
+    monkeypatch.setattr('app.core.engine_registry._MAX_SNAPSHOTS', 2)
+    correction_path = tmp_path / "Correction.json"
+    shielding_path = tmp_path / "shielding.json"
+    _write(shielding_path, {'protected_words': []})
+
+    def edit(target):
+        _write(correction_path, {'terms': [{'source': 'Maya', 'target': target}]})
+        registry.invalidate()
+
+    registry = EngineRegistry(correction_path, shielding_path, tmp_path / "snapshots")
+    edit('v0')
+    pinned, pin = registry.acquire()
+    edit('v1')
+    released, released_pin = registry.acquire()
+    registry.release(released_pin)
+    for i in range(2, 5):
+        edit(f'v{i}')
+        registry.current()
+
+    assert registry.snapshot(pinned.version) == pinned
+    assert registry.snapshot(released.version) is None
+    with pytest.raises(FileNotFoundError):
+        EngineRegistry(correction_path, shielding_path, tmp_path / "snapshots").load(
+            released.correction_path, released.shielding_path
+        )
+
+    # 解除固定后按正常规则清理
+    registry.release(pin)
+    edit('v5')
+    registry.current()
+    assert registry.snapshot(pinned.version) is None
+
+
+def test_snapshot_temp_files_are_unique(tmp_path, monkeypatch):
+    """多个服务进程建立同一版本的快照时各自使用唯一的临时文件"""
+    correction_path = tmp_path / "Correction.json"
+    shielding_path = tmp_path / "shielding.json"
+    _write(correction_path, {'terms': [{'source': 'Maya', 'target': '玛雅'}]})
+    _write(shielding_path, {'protected_words': []})
+    snapshot_dir = tmp_path / "snapshots"
+
+    temp_paths = []
+    real_replace = os.replace
+
+    def record(src, dst):
+        temp_paths.append(src)
+        real_replace(src, dst)
+
+    monkeypatch.setattr('app.core.engine_registry.os.replace', record)
+    for _ in range(2):
+        snapshot = EngineRegistry(correction_path, shielding_path, snapshot_dir).current()
+        os.unlink(snapshot.correction_path)
+        os.unlink(snapshot.shielding_path)
+
+    assert len(temp_paths) == 4
+    assert len(set(temp_paths)) == 4
+    assert not list(snapshot_dir.glob('*.tmp'))
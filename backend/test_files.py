@@ -0,0 +1,100 @@
+"""
+测试脚本 - 验证上传文件的大小限制、不完整文件的清理与摘要
+"""
+
+import asyncio
+import hashlib
+import io
+
+import pytest
+from fastapi import FastAPI, HTTPException, UploadFile
+
+from app.api import files
+from app.core.config import settings
+
+
+def _upload(data, size=None):
+    return UploadFile(io.BytesIO(data), filename='a.srt', size=size)
+
+
+def _post(app, body, headers):
+    """直接调用 ASGI 应用，返回 (状态码, 读取的请求体分块数)"""
+    chunks = [body[i:i + 1024] for i in range(0, len(body), 1024)] or [b'']
+    reads = 0
+    statuses = []
+
+    async def receive():
+        nonlocal reads
+        reads += 1
+        chunk = chunks[reads - 1]
+        return {'type': 'http.request', 'body': chunk, 'more_body': reads < len(chunks)}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+        'scheme': 'http', 'path': '/api/files/upload', 'raw_path': b'/api/files/upload',
+        'query_string': b'', 'root_path': '', 'server': ('test', 80), 'client': ('test', 1),
+        'headers': [(name.encode(), value.encode()) for name, value in headers.items()],
+    }
+    asyncio.run(app(scope, receive, send))
+    return statuses[0], reads
+
+
+def test_save_upload_writes_file_and_digest(tmp_path, monkeypatch):
+    """分块写入的文件内容、大小与 SHA-256 正确"""
+    monkeypatch.setattr(settings, 'MAX_UPLOAD_SIZE', 200 * 1024)
+    data = bytes(range(256)) * 600
+    path = tmp_path / "a.srt"
+
+    size, digest = asyncio.run(files._save_upload(_upload(data), path))
+
+    assert size == len(data)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert path.read_bytes() == data
+
+
+def test_save_upload_rejects_large_files_and_removes_partial_file(tmp_path, monkeypatch):
+    """超过单个文件上限时返回 413，已写入的部分被删除；已知大小时不写入"""
+    monkeypatch.setattr(settings, 'MAX_UPLOAD_SIZE', 100 * 1024)
+    data = b'x' * (300 * 1024)
+    path = tmp_path / "a.srt"
+
+    for upload in (_upload(data), _upload(data, size=len(data))):
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(files._save_upload(upload, path))
+        assert excinfo.value.status_code == 413
+        assert not path.exists()
+
+
+def test_upload_request_limit_applies_before_body_is_parsed(tmp_path, monkeypatch):
+    """声明的大小超过上限时不读取请求体；未声明大小时接收超过上限即中止"""
+    monkeypatch.setattr(settings, 'MAX_UPLOAD_REQUEST_SIZE', 4 * 1024)
+    monkeypatch.setattr(settings, 'UPLOADS_DIR', tmp_path)
+    app = FastAPI()
+    app.include_router(files.router, prefix="/api/files")
+
+    boundary = 'boundary'
+    content_type = f'multipart/form-data; boundary={boundary}'
+
+    def multipart(data):
+        return (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="a.srt"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'
+        ).encode() + data + f'\r\n--{boundary}--\r\n'.encode()
+
+    status, _ = _post(app, multipart(b'x' * 1024), {'content-type': content_type})
+    assert status == 200
+    for path in tmp_path.iterdir():
+        path.unlink()
+
+    body = multipart(b'x' * (64 * 1024))
+    status, reads = _post(app, body, {'content-type': content_type, 'content-length': str(len(body))})
+    assert (status, reads) == (413, 0)
+
+    status, reads = _post(app, body, {'content-type': content_type})
+    assert status == 413
+    assert reads == 5
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,78 @@
+"""
+测试脚本 - 验证处理结果缓存的命中、淘汰与跨实例复用
+"""
+
+import hashlib
+import os
+
+from app.core.result_cache import ResultCache, cache_key, save_file_digest, stored_file_digest
+
+
+def _write_result(directory, name, size):
+    output_path = directory / f"{name}_processed.srt"
+    diff_path = directory / f"{name}_diff.jsonl"
+    output_path.write_text('x' * size, encoding='utf-8')
+    diff_path.write_text('{}\n', encoding='utf-8')
+    return output_path, diff_path
+
+
+def test_cache_key_depends_on_content_version_and_options():
+    """输入内容、字典版本、处理选项任一不同都得到不同的键"""
+    key = cache_key('abc', 'v1', {'use_correction': True})
+    assert key == cache_key('abc', 'v1', {'use_correction': True})
+    assert key != cache_key('abd', 'v1', {'use_correction': True})
+    assert key != cache_key('abc', 'v2', {'use_correction': True})
+    assert key != cache_key('abc', 'v1', {'use_correction': False})
+
+
+def test_cache_hit_restores_outputs_and_counts(tmp_path):
+    """命中时恢复处理后的文件与差异数据，新实例（重启或其他 worker）可复用已有条目"""
+    cache = ResultCache(tmp_path / "cache", max_bytes=1024 * 1024)
+    output_path, diff_path = _write_result(tmp_path, 'f1', 10)
+    report = {'replacement_stats': {'total_replacements': 2}}
+
+    assert cache.get('k1', tmp_path / "out.srt", tmp_path / "diff.jsonl") is None
+    cache.put('k1', output_path, diff_path, report)
+
+    reopened = ResultCache(tmp_path / "cache", max_bytes=1024 * 1024)
+    restored_output = tmp_path / "f2_processed.srt"
+    restored_diff = tmp_path / "f2_diff.jsonl"
+    assert reopened.get('k1', restored_output, restored_diff) == report
+    assert restored_output.read_text(encoding='utf-8') == 'x' * 10
+    assert restored_diff.read_text(encoding='utf-8') == '{}\n'
+
+    assert cache.stats()['misses'] == 1
+    stats = reopened.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 0, 1)
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    """超出大小上限时淘汰最久未使用的条目"""
+    cache = ResultCache(tmp_path / "cache", max_bytes=2500)
+    for name in ('a', 'b'):
+        cache.put(name, *_write_result(tmp_path, name, 1000), {})
+
+    # 访问 a 后，b 成为最久未使用的条目
+    assert cache.get('a', tmp_path / "out.srt", tmp_path / "diff.jsonl") == {}
+    cache.put('c', *_write_result(tmp_path, 'c', 1000), {})
+
+    assert cache.get('b', tmp_path / "out.srt", tmp_path / "diff.jsonl") is None
+    assert cache.get('a', tmp_path / "out.srt", tmp_path / "diff.jsonl") == {}
+    assert cache.get('c', tmp_path / "out.srt", tmp_path / "diff.jsonl") == {}
+    assert not (tmp_path / "cache" / "b").exists()
+    assert cache.stats()['evictions'] == 1
+
+
+def test_stored_file_digest_reuses_upload_digest(tmp_path, monkeypatch):
+    """上传时保存的摘要直接使用，不重新读取文件；文件之后被修改时重新计算"""
+    path = tmp_path / "a.srt"
+    path.write_bytes(b'subtitle')
+    assert stored_file_digest(path) == hashlib.sha256(b'subtitle').hexdigest()
+
+    save_file_digest(path, 'f' * 64)
+    monkeypatch.setattr('app.core.result_cache.file_digest', lambda p: 'rehashed')
+    assert stored_file_digest(path) == 'f' * 64
+
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert stored_file_digest(path) == 'rehashed'
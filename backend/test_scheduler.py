@@ -0,0 +1,114 @@
+"""
+测试脚本 - 验证任务调度器的并发上限、公平调度与超时
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.core.scheduler import JobScheduler, QueueFullError
+from app.core.worker_pool import run_job
+
+
+def test_scheduler_limits_concurrency_and_prefers_small_jobs():
+    """超过并发上限的任务排队，按虚拟截止时间出队；队列满时拒绝"""
+
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1, max_queued=2, timeout=5, cost_weight=100)
+        started = []
+        gate = asyncio.Event()
+
+        def job(name):
+            async def run():
+                started.append(name)
+                await gate.wait()
+            return run
+
+        assert scheduler.submit('first', job('first')) == 0
+        assert scheduler.submit('big', job('big'), cost=10) == 1
+        # 后提交的小任务截止时间更早，排到大任务前面
+        assert scheduler.submit('small', job('small'), cost=0.1) == 1
+        assert scheduler.queue_position('big') == 2
+
+        with pytest.raises(QueueFullError):
+            scheduler.submit('overflow', job('overflow'))
+
+        await asyncio.sleep(0)
+        assert scheduler.running_count() == 1
+
+        gate.set()
+        while scheduler.running_count() or scheduler.queued_count():
+            await asyncio.sleep(0.01)
+
+        return started
+
+    assert asyncio.run(scenario()) == ['first', 'small', 'big']
+
+
+def test_scheduler_enforces_timeout():
+    """运行超时的任务被取消并触发回调，随后的任务照常运行"""
+
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1, max_queued=5, timeout=0.05)
+        events = []
+
+        async def slow():
+            await asyncio.sleep(10)
+            events.append('slow finished')
+
+        async def quick():
+            events.append('quick')
+
+        scheduler.submit('slow', slow, on_timeout=lambda: events.append('timeout'))
+        scheduler.submit('quick', quick)
+
+        while scheduler.running_count() or scheduler.queued_count():
+            await asyncio.sleep(0.01)
+
+        return events
+
+    assert asyncio.run(scenario()) == ['timeout', 'quick']
+
+
+def test_timed_out_job_holds_slot_until_running_work_finishes():
+    """超时的任务等运行中的作业结束后才释放名额，尚未开始的作业被取消"""
+    release = threading.Event()
+    events = []
+
+    def blocking(name):
+        events.append(f'{name} started')
+        release.wait(5)
+        time.sleep(0.05)
+        events.append(f'{name} finished')
+
+    async def scenario():
+        scheduler = JobScheduler(max_concurrent=1, max_queued=5, timeout=0.05)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            async def slow():
+                await asyncio.gather(
+                    run_job(executor, blocking, 'a'), run_job(executor, blocking, 'b'),
+                    return_exceptions=True
+                )
+
+            async def on_timeout():
+                events.append('timeout')
+
+            async def quick():
+                events.append('quick')
+
+            scheduler.submit('slow', slow, on_timeout=on_timeout)
+            scheduler.submit('quick', quick)
+
+            await asyncio.sleep(0.2)
+            assert events == ['a started']
+            release.set()
+
+            while scheduler.running_count() or scheduler.queued_count():
+                await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert events == ['a started', 'a finished', 'timeout', 'quick']
@@ -0,0 +1,101 @@
+"""
+测试脚本 - 验证流式 SRT 解析与写出、按字幕块边界切分与分块结果合并
+"""
+
+import io
+
+from app.core.processor import SubtitleProcessor
+from app.core.srt_parser import SRTParser, _BLANK_LINE_PATTERN
+from app.core.term_index import TermIndexBuilder
+
+SAMPLE = (
+    "1\n00:00:01,000 --> 00:00:02,000\nHello\n\n"
+    "bad block\n\n"
+    "2\n00:00:03,000 --> 00:00:04,000\n第一行\n第二行\n \n\t\n"
+    "x\n00:00:05,000 --> 00:00:06,000\n序号无效\n\n"
+    "3\n00:00:07,000 --> 00:00:08,000\nEnd"
+)
+
+
+def test_iter_parse_matches_parse_for_text_and_byte_chunks():
+    """流式解析的结果与一次性解析一致，无效字幕块同样被跳过"""
+    expected = SRTParser.parse(SAMPLE)
+    raw = SAMPLE.encode('utf-8')
+
+    assert [e.index for e in expected] == [1, 2, 3]
+    assert list(SRTParser.iter_parse(io.StringIO(SAMPLE))) == expected
+    # 字节块在多字节字符中间切分
+    chunks = [raw[i:i + 5] for i in range(0, len(raw), 5)]
+    assert list(SRTParser.iter_parse(iter(chunks))) == expected
+
+
+def test_write_matches_generate():
+    """流式写出与 generate 的结果一致"""
+    entries = SRTParser.parse(SAMPLE)
+    output = io.StringIO()
+
+    assert SRTParser.write(iter(entries), output) == 3
+    assert output.getvalue() == SRTParser.generate(entries)
+
+
+def test_split_ranges_parse_like_whole_file():
+    """只在空行之后切分，各区间分别解析的结果拼接后与整体解析一致（含 CRLF 与空白行）"""
+    raw = (SAMPLE.replace('\n', '\r\n') * 20 + SAMPLE * 20).encode('utf-8')
+    expected = list(SRTParser.iter_parse(io.BytesIO(raw)))
+
+    ranges = SRTParser.split_ranges(io.BytesIO(raw), max_parts=8, min_entries=10)
+    assert len(ranges) == 8
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(raw)
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+
+    parsed = []
+    for start, end in ranges:
+        parsed.extend(SRTParser.iter_parse(io.BytesIO(raw[start:end])))
+    assert parsed == expected
+    assert SRTParser.split_ranges(io.BytesIO(raw), max_parts=8, min_entries=1000) == [(0, len(raw))]
+
+    # 按小块读取时，跨越块边界的空行也能找到，切分位置与整体查找一致
+    ranges = SRTParser.split_ranges(io.BytesIO(raw), max_parts=8, min_entries=10, block_size=len(raw) // 3)
+    assert len(ranges) == 8
+    for block_size in (1, 2, 5, 64):
+        for position in range(0, len(raw), 37):
+            match = _BLANK_LINE_PATTERN.search(raw, position)
+            expected_end = match.end() if match else None
+            assert SRTParser._next_boundary(io.BytesIO(raw), position, block_size) == expected_end
+
+
+def test_merged_parts_match_whole_stream(tmp_path):
+    """各分块分别流式处理后合并，输出、差异数据、报告与索引与整体流式处理一致"""
+    text = (
+        "{i}\n00:00:01,000 --> 00:00:02,000\n"
+        "Welcome to Octane, adjust the F曲线 (音乐) in Maya\n\n"
+        "{j}\n00:00:03,000 --> 00:00:04,000\n这一条不需要修改\n\n"
+    )
+    raw = ''.join(text.format(i=2 * k + 1, j=2 * k + 2) for k in range(30)).encode('utf-8')
+    processor = SubtitleProcessor()
+
+    def run(source):
+        output, diff, index = io.StringIO(), io.StringIO(), TermIndexBuilder()
+        report = processor.process_stream(io.BytesIO(source), output, diff_output=diff, index=index)
+        return output.getvalue(), diff.getvalue(), report, index
+
+    expected_output, expected_diff, expected_report, expected_index = run(raw)
+
+    parts = []
+    for n, (start, end) in enumerate(SRTParser.split_ranges(io.BytesIO(raw), max_parts=4, min_entries=10)):
+        output, diff, report, index = run(raw[start:end])
+        (tmp_path / f"{n}.srt").write_text(output, encoding='utf-8')
+        (tmp_path / f"{n}.jsonl").write_text(diff, encoding='utf-8')
+        parts.append((str(tmp_path / f"{n}.srt"), str(tmp_path / f"{n}.jsonl"), report, index.to_dict()))
+    assert len(parts) == 4
+
+    output, diff, index = io.StringIO(), io.StringIO(), TermIndexBuilder()
+    report = processor.merge_parts(parts, output, diff, index=index)
+
+    # 条目记忆在分块之间共享，命中次数不同
+    report.pop('entry_memo')
+    expected_report.pop('entry_memo')
+    assert output.getvalue() == expected_output
+    assert diff.getvalue() == expected_diff
+    assert report == expected_report
+    assert index.to_dict() == expected_index.to_dict()
@@ -0,0 +1,56 @@
+"""
+测试脚本 - 验证内存统计聚合器的批量写出
+"""
+
+import json
+
+from app.core.stats_manager import StatsAggregator
+
+
+def test_stats_aggregator_serves_reads_from_memory_and_merges_flushes(tmp_path):
+    """记录只更新内存；多个进程（聚合器）先后写出时各自的增量都被保留"""
+    path = tmp_path / "replacement_stats.json"
+    first = StatsAggregator(path)
+    second = StatsAggregator(path)
+
+    first.record([{"source": "阀值", "count": 2}, {"source": "octane", "count": 1}])
+    second.record([{"source": "阀值", "count": 3}])
+
+    assert not path.exists()
+    assert first.top_terms(1) == [{"source": "阀值", "count": 2}]
+
+    assert first.flush() is True
+    assert second.flush() is True
+    assert second.flush() is False
+
+    saved = json.loads(path.read_text(encoding='utf-8'))
+    assert saved["total_files_processed"] == 2
+    assert saved["term_counts"] == {"阀值": 5, "octane": 1}
+
+    # 写出后内存刷新为文件中的合并结果
+    overall = second.overall()
+    assert overall["total_replacements"] == 6
+    assert overall["top_terms"][0] == {"source": "阀值", "count": 5}
+    assert StatsAggregator(path).overall()["unique_terms"] == 2
+
+
+def test_top_terms_index_matches_full_sort(tmp_path):
+    """增量维护的排行与对全部次数稳定排序的结果一致（含同次数的先后顺序）"""
+    aggregator = StatsAggregator(tmp_path / "replacement_stats.json")
+    for i in range(200):
+        aggregator.record([
+            {"source": f"term{(i * 7) % 31}", "count": i % 4},
+            {"source": f"term{(i * 3) % 17}", "count": 1},
+        ])
+        if i == 100:
+            aggregator.flush()
+
+    term_counts = aggregator._stats["term_counts"]
+    expected = sorted(
+        [{"source": k, "count": v} for k, v in term_counts.items()],
+        key=lambda x: x["count"],
+        reverse=True
+    )
+
+    assert aggregator.top_terms(1000) == expected
+    assert aggregator.top_terms(5) == expected[:5]
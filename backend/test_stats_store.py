@@ -0,0 +1,37 @@
+"""
+测试脚本 - 验证分时段替换统计的记录、范围查询与清理
+"""
+
+import time
+
+from app.core.stats_store import StatsStore
+
+
+def test_stats_store_answers_range_queries_from_buckets(tmp_path):
+    """每个文件的全部规则都被记录；按小时与按天的分桶都能回答范围查询"""
+    store = StatsStore(tmp_path / "stats.db", hourly_retention_days=30)
+    now = time.time()
+
+    store.record_files([
+        [{"source": "阀值", "target": "阈值", "count": 2}, {"source": "octane", "target": "Octane", "count": 1}],
+        [{"source": "阀值", "target": "阈值", "count": 3}],
+    ], timestamp=now)
+    store.record_files([[{"source": "octane", "target": "Octane", "count": 9}]], timestamp=now - 10 * 86400)
+    store.record_files([[{"source": "render", "target": "Render", "count": 4}]], timestamp=now - 60 * 86400)
+
+    # 最近 7 天：按小时统计，只包含当前的一批
+    assert store.top_terms(now - 7 * 86400) == [
+        {"source": "阀值", "target": "阈值", "count": 5},
+        {"source": "octane", "target": "Octane", "count": 1},
+    ]
+    totals = store.totals(now - 7 * 86400)
+    assert totals["granularity"] == "hour"
+    assert (totals["total_files_processed"], totals["total_replacements"], totals["unique_terms"]) == (2, 6, 2)
+
+    # 超出按小时分桶的保留期后按天统计，清理按小时分桶不影响按天的结果
+    store.prune(now)
+    assert store.top_terms(now - 90 * 86400, limit=1) == [
+        {"source": "octane", "target": "Octane", "count": 10}
+    ]
+    assert store.totals(now - 90 * 86400)["total_files_processed"] == 4
+    assert store.top_terms(now - 20 * 86400, now - 5 * 86400)[0]["count"] == 9
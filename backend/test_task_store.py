@@ -0,0 +1,76 @@
+"""
+测试脚本 - 验证任务存储的持久化与淘汰策略
+"""
+
+import time
+
+from app.core.task_store import TaskStore
+
+
+def test_task_store_persists_and_loads_results_lazily(tmp_path):
+    """任务状态与结果可由新的存储实例读取（模拟重启或其他 worker）"""
+    store = TaskStore(tmp_path / "tasks.db", tmp_path / "results", ttl=3600, max_tasks=10)
+    store.create('t1', total_files=2)
+    store.update('t1', status='processing', processed_files=1, progress=50)
+
+    files = [{'file_id': 'f1', 'diff_data': [{'index': 1, 'changed': True}]}]
+    store.complete('t1', files, {'total_replacements': 3})
+
+    reopened = TaskStore(tmp_path / "tasks.db", tmp_path / "results")
+    task = reopened.get('t1')
+
+    assert task['status'] == 'completed'
+    assert task['progress'] == 100
+    assert task['statistics'] == {'total_replacements': 3}
+    assert 'files' not in task
+    assert reopened.load_files('t1') == files
+    assert reopened.get('missing') is None
+
+
+def test_task_store_evicts_least_recently_used_finished_tasks(tmp_path):
+    """超出数量上限时淘汰最久未访问的已结束任务，运行中的任务不受影响"""
+    store = TaskStore(
+        tmp_path / "tasks.db", tmp_path / "results", ttl=3600, max_tasks=2,
+        processed_dir=tmp_path / "processed"
+    )
+
+    store.create('running', total_files=1)
+    for task_id in ('a', 'b'):
+        store.create(task_id, total_files=1)
+        store.output_dir(task_id).mkdir(parents=True)
+        (store.output_dir(task_id) / "f1_processed.srt").write_text('x', encoding='utf-8')
+        store.complete(task_id, [], {})
+        time.sleep(0.01)
+
+    # 读取 a 的结果后，b 成为最久未访问的任务；只查询状态不算访问
+    store.get('b')
+    store.get('a', touch=True)
+    store.create('c', total_files=1)
+    store.complete('c', [], {})
+    store.evict()
+
+    assert store.get('b') is None
+    assert not (tmp_path / "results" / "b.json").exists()
+    assert not store.output_dir('b').exists()
+    assert (store.output_dir('a') / "f1_processed.srt").exists()
+    assert store.get('a') is not None
+    assert store.get('c') is not None
+    assert store.get('running')['status'] == 'pending'
+
+
+def test_queue_position_is_shared_through_the_database(tmp_path):
+    """排队位置按数据库中的排序键计算，其他 worker 的存储实例也能查到；开始运行后不再排队"""
+    store = TaskStore(tmp_path / "tasks.db", tmp_path / "results", ttl=3600, max_tasks=10)
+    for task_id in ('running', 'late', 'early', 'tie'):
+        store.create(task_id, total_files=1)
+    store.update('running', status='processing')
+    store.set_queue_key('late', 20.0, 1)
+    store.set_queue_key('early', 10.0, 2)
+    store.set_queue_key('tie', 20.0, 3)
+
+    other_worker = TaskStore(tmp_path / "tasks.db", tmp_path / "results")
+    assert [other_worker.queue_position(t) for t in ('early', 'late', 'tie')] == [1, 2, 3]
+    assert other_worker.queue_position('running') is None
+
+    store.update('early', status='processing')
+    assert [other_worker.queue_position(t) for t in ('early', 'late', 'tie')] == [None, 1, 2]
@@ -0,0 +1,98 @@
+"""
+测试脚本 - 验证规则命中索引与字典修改后的增量处理
+"""
+
+import io
+import json
+
+from app.core.processor import SubtitleProcessor
+from app.core.term_index import TermIndexBuilder, dictionary_changes
+
+
+TERMS = [
+    {'source': 'Keyframe', 'target': '关键帧', 'category': '术语'},
+    {'source': '关键帧动画', 'target': '关键帧动画制作', 'category': '术语'},
+    {'source': 'octane', 'target': 'Octane', 'category': '软件'},
+    {'source': '阀值', 'target': '阈值', 'category': '术语映射'},
+]
+
+SRT = ''.join(
+    f"{i}\n00:00:{i:02d},000 --> 00:00:{i:02d},500\n{text}\n\n"
+    for i, text in enumerate([
+        'Keyframe动画 很重要',
+        '打开 octane 渲染器',
+        '调整阀值 [音乐]',
+        '这一条不需要修改',
+        'octane 和 Keyframe',
+        '打开 octane 渲染器',
+    ], 1)
+).encode('utf-8')
+
+
+def _processor(tmp_path, name, terms, protected_words=()):
+    correction_path = tmp_path / f"{name}_correction.json"
+    shielding_path = tmp_path / f"{name}_shielding.json"
+    correction_path.write_text(
+        json.dumps({'terms': terms, 'noise_patterns': [r'\[音乐\]']}, ensure_ascii=False),
+        encoding='utf-8'
+    )
+    shielding_path.write_text(
+        json.dumps({'protected_words': list(protected_words)}, ensure_ascii=False),
+        encoding='utf-8'
+    )
+    return SubtitleProcessor(correction_path, shielding_path)
+
+
+def _process(processor):
+    output, diff, index = io.StringIO(), io.StringIO(), TermIndexBuilder()
+    report = processor.process_stream(io.BytesIO(SRT), output, diff_output=diff, index=index)
+    return output.getvalue(), diff.getvalue(), report, index
+
+
+def test_incremental_reprocess_matches_full_run(tmp_path):
+    """字典修改后增量处理的输出、差异数据、报告与索引与完整处理一致"""
+    old = _processor(tmp_path, 'old', TERMS)
+    _, old_diff, old_report, old_index = _process(old)
+    previous_index = {**old_index.to_dict(), 'diff_rules': old_report['diff_rules']}
+
+    terms = [dict(term) for term in TERMS]
+    terms[2]['target'] = 'OctaneRender'
+    terms.append({'source': '渲染器', 'target': '渲染引擎', 'category': '术语'})
+    new = _processor(tmp_path, 'new', terms, protected_words=['重要'])
+    expected_output, expected_diff, expected_report, expected_index = _process(new)
+
+    output, diff, index = io.StringIO(), io.StringIO(), TermIndexBuilder()
+    report = new.reprocess_stream(
+        io.BytesIO(SRT), io.StringIO(old_diff), previous_index, old.engine.plan, output, diff, index
+    )
+
+    # 只有含 octane、渲染器 或 重要 的条目被重新处理
+    assert report.pop('incremental') == {'reprocessed_entries': 4, 'total_entries': 6}
+    report.pop('entry_memo')
+    expected_report.pop('entry_memo')
+    assert output.getvalue() == expected_output
+    assert diff.getvalue() == expected_diff
+    assert report == expected_report
+    assert index.to_dict() == expected_index.to_dict()
+
+
+def test_dictionary_changes_requires_full_run_when_unsafe(tmp_path):
+    """噪音模式变化、未修改规则的优先级变化时无法按条目判断影响范围"""
+    old = _processor(tmp_path, 'old', TERMS).engine.plan
+
+    changes = dictionary_changes(old, _processor(tmp_path, 'edit', TERMS[:3]).engine.plan)
+    assert changes.terms == {('阀值', '阈值', '术语映射')}
+    assert changes.protected_words == set()
+
+    # 新增规则不改变原有规则之间的相对顺序，仍可按条目判断
+    longer = TERMS + [{'source': 'Keyframe动画', 'target': '关键帧动画', 'category': '术语'}]
+    assert dictionary_changes(old, _processor(tmp_path, 'longer', longer).engine.plan) is not None
+
+    # source 长度相同的规则按字典中的顺序执行，调换顺序即改变优先级
+    same_length = [
+        {'source': 'ab', 'target': 'X', 'category': '术语'},
+        {'source': 'bc', 'target': 'Y', 'category': '术语'},
+    ]
+    swapped = _processor(tmp_path, 'swap_a', same_length).engine.plan
+    reordered = _processor(tmp_path, 'swap_b', same_length[::-1]).engine.plan
+    assert dictionary_changes(swapped, reordered) is None
@@ -0,0 +1,124 @@
+"""
+测试脚本 - 验证字典检索索引的前缀、子串、模糊匹配与增量同步
+"""
+
+import json
+import random
+import statistics
+import time
+
+from app.core.config import settings
+from app.core.term_search import TermSearchIndex, edit_distance
+
+
+TERMS = [
+    {'source': 'octane', 'target': 'Octane', 'category': '软件'},
+    {'source': '奥克丹', 'target': 'Octane', 'category': '软件'},
+    {'source': 'redshift', 'target': 'Redshift', 'category': '软件'},
+    {'source': 'houdini', 'target': 'Houdini', 'category': '软件'},
+    {'source': '阀值', 'target': '阈值', 'category': '术语映射'},
+]
+
+
+def _build(items):
+    index = TermSearchIndex('correction', ('source', 'target'))
+    index.sync(items, 'v1')
+    return index
+
+
+def _sources(results):
+    return [result['item']['source'] for _, result in results]
+
+
+def test_prefix_and_substring_ranking():
+    """完全匹配排在最前，子串匹配按出现位置与长度排序"""
+    index = _build(TERMS)
+
+    total, results = index.search('oct', 'prefix', 10)
+    assert total == 2
+    assert _sources(results) == ['octane', '奥克丹']
+
+    total, results = index.search('octane', 'prefix', 10)
+    assert results[0][1]['field'] == 'source' and _sources(results)[0] == 'octane'
+
+    total, results = index.search('shift', 'substring', 10)
+    assert total == 1
+    assert _sources(results) == ['redshift']
+
+    total, results = index.search('值', 'substring', 1)
+    assert total == 1
+    assert _sources(results) == ['阀值']
+
+
+def test_fuzzy_matches_within_distance():
+    """模糊匹配返回编辑距离内的条目，按距离排序"""
+    index = _build(TERMS)
+
+    total, results = index.search('houdni', 'fuzzy', 10)
+    assert _sources(results) == ['houdini']
+    assert results[0][1]['distance'] == 1
+
+    total, results = index.search('redshfit', 'fuzzy', 10)
+    assert _sources(results) == ['redshift']
+    assert results[0][1]['distance'] == 2
+
+    assert index.search('blender', 'fuzzy', 10) == (0, [])
+
+
+def test_incremental_sync_matches_fresh_build():
+    """增量同步后的检索结果与重新建立的索引一致"""
+    index = _build(TERMS)
+    updated = [dict(term) for term in TERMS[1:]]
+    updated[0]['target'] = 'OctaneRender'
+    updated.append({'source': 'blender', 'target': 'Blender', 'category': '软件'})
+    index.sync(updated, 'v2')
+
+    fresh = _build(updated)
+    for query, mode in [('oct', 'prefix'), ('render', 'substring'), ('blendr', 'fuzzy'), ('octane', 'fuzzy')]:
+        total, results = index.search(query, mode, 10)
+        fresh_total, fresh_results = fresh.search(query, mode, 10)
+        # 排序键中的内部 ID 不同，只比较结果本身
+        assert total == fresh_total
+        assert [result for _, result in results] == [result for _, result in fresh_results]
+    assert 'octane' not in _sources(index.search('octane', 'prefix', 10)[1])
+
+
+def test_edit_distance_matches_reference():
+    """带上限的编辑距离与完整动态规划一致（超过上限时返回 上限 + 1）"""
+    def reference(a, b):
+        previous = list(range(len(b) + 1))
+        for i, ca in enumerate(a, 1):
+            current = [i]
+            for j, cb in enumerate(b, 1):
+                current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+            previous = current
+        return previous[-1]
+
+    rng = random.Random(0)
+    for _ in range(2000):
+        a = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 7)))
+        b = ''.join(rng.choice('abc') for _ in range(rng.randint(0, 7)))
+        limit = rng.randint(0, 3)
+        assert edit_distance(a, b, limit) == min(reference(a, b), limit + 1)
+
+
+def test_fuzzy_search_is_exact_and_fast_on_full_dictionary():
+    """完整字典上的模糊匹配与逐条计算编辑距离的结果一致，短查询也在 5 毫秒以内"""
+    with open(settings.CORRECTION_DICT_PATH, 'r', encoding='utf-8') as f:
+        index = _build(json.load(f)['terms'])
+    values = index._values
+
+    for query in ('render', 'camera', 'shader', 'nromal', 'rendr', 'subsurfce scatering'):
+        limit = min(2, len(query) // 3)
+        expected = {
+            posting for posting, value in values.items()
+            if edit_distance(query, value, limit) <= limit
+        }
+        assert {(key[2], key[3]) for key in index._fuzzy(query, None)} == expected
+
+        timings = []
+        for _ in range(11):
+            start = time.perf_counter()
+            index.search(query, 'fuzzy', 50)
+            timings.append(time.perf_counter() - start)
+        assert statistics.median(timings) < 0.005, (query, statistics.median(timings))
@@ -13,13 +13,24 @@ interface CorrectionTerm {
 
 interface ShieldingData {
   protected_words: string[]
+  revision?: number
 }
 
 interface CorrectionData {
   terms: CorrectionTerm[]
   noise_patterns: string[]
+  revision?: number
 }
 
+// 单条修改操作，key 为修正规则的 source 或保护词
+interface DictionaryOperation {
+  op: 'add' | 'update' | 'delete'
+  key?: string
+  value?: CorrectionTerm | string
+}
+
+type DictionaryType = 'correction' | 'shielding'
+
 interface Stats {
   correction_terms: number
   protected_words: number
@@ -34,6 +45,8 @@ export default function DictionaryPage() {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const [searchTerm, setSearchTerm] = useState('')
+  // 服务端检索命中的条目（source / 保护词），为 null 时在本地过滤
+  const [searchKeys, setSearchKeys] = useState<Set<string> | null>(null)
   const [editingIndex, setEditingIndex] = useState<number | null>(null)
   const [editingData, setEditingData] = useState<CorrectionTerm | null>(null)
   const [editingShieldIndex, setEditingShieldIndex] = useState<number | null>(null)
@@ -43,60 +56,104 @@ export default function DictionaryPage() {
   const [isSaving, setIsSaving] = useState(false)
   const [saveStatus, setSaveStatus] = useState<'idle' | 'saving' | 'saved' | 'error'>('idle')
   const [hasUnsavedChanges, setHasUnsavedChanges] = useState(false)
-  const saveTimeoutRef = useRef<NodeJS.Timeout | null>(null)
   const initialLoadDone = useRef(false)
 
-  // 自动保存函数
-  const autoSave = useCallback(async (type: 'correction' | 'shielding', data: any) => {
+  // 各字典的当前修订号；增量保存依次执行，每次使用上一次保存后的修订号
+  const revisionsRef = useRef<Record<DictionaryType, number>>({ correction: 0, shielding: 0 })
+  const saveQueueRef = useRef<Promise<void>>(Promise.resolve())
+
+  // 记录保存后的修订号
+  const setRevision = useCallback((type: DictionaryType, revision: number) => {
+    revisionsRef.current[type] = revision
+    if (type === 'correction') {
+      setCorrectionData(prev => ({ ...prev, revision }))
+    } else {
+      setShieldingData(prev => ({ ...prev, revision }))
+    }
+  }, [])
+
+  // 修订号冲突：字典已被他人修改，重新加载最新内容
+  const handleConflict = () => {
+    alert('字典已被其他人修改，将重新加载最新内容')
+    loadData()
+  }
+
+  // 增量保存：只提交本次修改的条目
+  const saveOperations = (type: DictionaryType, operations: DictionaryOperation[]) => {
+    saveQueueRef.current = saveQueueRef.current.then(() => submitOperations(type, operations))
+  }
+
+  const submitOperations = async (type: DictionaryType, operations: DictionaryOperation[]) => {
     setIsSaving(true)
     setSaveStatus('saving')
+    setHasUnsavedChanges(true)
     try {
       const res = await fetch(`${API_BASE}/dictionaries/${type}`, {
-        method: 'PUT',
+        method: 'PATCH',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(data)
+        body: JSON.stringify({ revision: revisionsRef.current[type], operations })
       })
 
+      if (res.status === 409) {
+        const detail = (await res.json()).detail
+        if (typeof detail === 'object') {
+          setSaveStatus('error')
+          handleConflict()
+          return
+        }
+        throw new Error(detail)
+      }
       if (!res.ok) {
-        throw new Error('保存失败')
+        throw new Error((await res.json()).detail || '保存失败')
       }
 
+      const result = await res.json()
+      setRevision(type, result.revision)
       setSaveStatus('saved')
       setHasUnsavedChanges(false)
       // 3秒后恢复idle状态
       setTimeout(() => setSaveStatus('idle'), 3000)
     } catch (err) {
       setSaveStatus('error')
-      console.error('自动保存失败:', err)
+      alert(err instanceof Error ? err.message : '保存失败')
     } finally {
       setIsSaving(false)
     }
-  }, [])
-
-  // 触发自动保存（带防抖）
-  const triggerAutoSave = useCallback((type: 'correction' | 'shielding', data: any) => {
-    setHasUnsavedChanges(true)
-    if (saveTimeoutRef.current) {
-      clearTimeout(saveTimeoutRef.current)
-    }
-    saveTimeoutRef.current = setTimeout(() => {
-      autoSave(type, data)
-    }, 1000) // 1秒后自动保存
-  }, [autoSave])
+  }
 
   // 获取数据
   useEffect(() => {
     loadData()
   }, [activeTab])
 
-  // 清理timeout
+  // 搜索词变化后（防抖）使用服务端索引检索，请求失败时退回本地过滤
   useEffect(() => {
-    return () => {
-      if (saveTimeoutRef.current) {
-        clearTimeout(saveTimeoutRef.current)
+    const query = searchTerm.trim()
+    setSearchKeys(null)
+    if (!query) return
+
+    const controller = new AbortController()
+    const timer = setTimeout(async () => {
+      try {
+        const params = new URLSearchParams({ q: query, dictionary: activeTab, mode: 'substring', limit: '500' })
+        const res = await fetch(`${API_BASE}/dictionaries/search?${params}`, { signal: controller.signal })
+        if (!res.ok) return
+        const result = await res.json()
+        // 命中超过返回上限时本地过滤，保证列表完整
+        if (result.total > result.results.length) return
+        setSearchKeys(new Set(result.results.map((hit: any) =>
+          typeof hit.item === 'string' ? hit.item : (hit.item.source ?? hit.item.word)
+        )))
+      } catch {
+        // 已取消或网络错误，保持本地过滤
       }
+    }, 150)
+
+    return () => {
+      clearTimeout(timer)
+      controller.abort()
     }
-  }, [])
+  }, [searchTerm, activeTab])
 
   const loadData = async () => {
     setLoading(true)
@@ -115,6 +172,7 @@ export default function DictionaryPage() {
       const dictData = await dictRes.json()
 
       setStats(statsData)
+      revisionsRef.current[activeTab] = dictData.revision ?? 0
       if (activeTab === 'correction') {
         setCorrectionData(dictData)
       } else {
@@ -128,17 +186,15 @@ export default function DictionaryPage() {
   }
 
   const handleSave = async () => {
-    // 清除任何待处理的自动保存
-    if (saveTimeoutRef.current) {
-      clearTimeout(saveTimeoutRef.current)
-    }
-
     setIsSaving(true)
     setSaveStatus('saving')
 
     try {
       const endpoint = activeTab === 'correction' ? 'correction' : 'shielding'
-      const data = activeTab === 'correction' ? correctionData : shieldingData
+      const data = {
+        ...(activeTab === 'correction' ? correctionData : shieldingData),
+        revision: revisionsRef.current[endpoint]
+      }
 
       const res = await fetch(`${API_BASE}/dictionaries/${endpoint}`, {
         method: 'PUT',
@@ -146,10 +202,16 @@ export default function DictionaryPage() {
         body: JSON.stringify(data)
       })
 
+      if (res.status === 409) {
+        setSaveStatus('error')
+        handleConflict()
+        return
+      }
       if (!res.ok) {
         throw new Error('保存失败')
       }
 
+      setRevision(endpoint, (await res.json()).revision)
       setSaveStatus('saved')
       setHasUnsavedChanges(false)
       setTimeout(() => setSaveStatus('idle'), 3000)
@@ -184,7 +246,7 @@ export default function DictionaryPage() {
     setShieldingData(newData)
     setIsAddingShield(false)
     setNewShieldWord('')
-    triggerAutoSave('shielding', newData)
+    saveOperations('shielding', [{ op: 'add', value: newShieldWord.trim() }])
   }
 
   const handleCancelAddShield = () => {
@@ -199,13 +261,16 @@ export default function DictionaryPage() {
 
   const handleSaveShieldEdit = () => {
     if (editingShieldIndex === null || !editingShieldWord.trim()) return
+    const oldWord = shieldingData.protected_words[editingShieldIndex]
     const newWords = [...shieldingData.protected_words]
     newWords[editingShieldIndex] = editingShieldWord.trim()
     const newData = { ...shieldingData, protected_words: newWords }
     setShieldingData(newData)
     setEditingShieldIndex(null)
     setEditingShieldWord('')
-    triggerAutoSave('shielding', newData)
+    if (oldWord !== newWords[editingShieldIndex]) {
+      saveOperations('shielding', [{ op: 'update', key: oldWord, value: newWords[editingShieldIndex] }])
+    }
   }
 
   const handleCancelShieldEdit = () => {
@@ -217,19 +282,24 @@ export default function DictionaryPage() {
     if (!confirm('确定要删除吗？')) return
 
     if (activeTab === 'correction') {
+      const term = correctionData.terms[index]
       const newData = {
         ...correctionData,
         terms: correctionData.terms.filter((_, i) => i !== index)
       }
       setCorrectionData(newData)
-      triggerAutoSave('correction', newData)
+      // 尚未保存的新规则只需从列表中移除
+      if (term.source) {
+        saveOperations('correction', [{ op: 'delete', key: term.source }])
+      }
     } else {
+      const word = shieldingData.protected_words[index]
       const newData = {
         ...shieldingData,
         protected_words: shieldingData.protected_words.filter((_, i) => i !== index)
       }
       setShieldingData(newData)
-      triggerAutoSave('shielding', newData)
+      saveOperations('shielding', [{ op: 'delete', key: word }])
     }
   }
 
@@ -249,13 +319,19 @@ export default function DictionaryPage() {
       return
     }
 
+    // 原 source 为空的是新添加的规则
+    const original = correctionData.terms[editingIndex]
+    const operation: DictionaryOperation = original.source
+      ? { op: 'update', key: original.source, value: editingData }
+      : { op: 'add', value: editingData }
+
     const newTerms = [...correctionData.terms]
     newTerms[editingIndex] = editingData
     const newData = { ...correctionData, terms: newTerms }
     setCorrectionData(newData)
     setEditingIndex(null)
     setEditingData(null)
-    triggerAutoSave('correction', newData)
+    saveOperations('correction', [operation])
   }
 
   const handleCancelEdit = () => {
@@ -265,12 +341,16 @@ export default function DictionaryPage() {
 
   const filteredTerms = activeTab === 'correction'
     ? correctionData.terms.filter(term =>
-        term.source.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        term.target.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        term.category.toLowerCase().includes(searchTerm.toLowerCase())
+        searchKeys
+          ? searchKeys.has(term.source) || term.category.toLowerCase().includes(searchTerm.toLowerCase())
+          : term.source.toLowerCase().includes(searchTerm.toLowerCase()) ||
+            term.target.toLowerCase().includes(searchTerm.toLowerCase()) ||
+            term.category.toLowerCase().includes(searchTerm.toLowerCase())
       )
     : shieldingData.protected_words.filter(word =>
-        word && word.trim() && word.toLowerCase().includes(searchTerm.toLowerCase())
+        word && word.trim() && (searchKeys
+          ? searchKeys.has(word)
+          : word.toLowerCase().includes(searchTerm.toLowerCase()))
       )
 
   if (loading) {
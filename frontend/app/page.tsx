@@ -133,7 +133,8 @@ export default function HomePage() {
       })
 
       if (!res.ok) {
-        throw new Error('启动处理失败')
+        const error = await res.json().catch(() => null)
+        throw new Error(error?.detail || '启动处理失败')
       }
 
       const data = await res.json()
@@ -171,8 +172,9 @@ export default function HomePage() {
               return {
                 ...file,
                 status: 'completed',
+                task_id: tid,
                 statistics: processedFile.statistics,
-                diff_data: processedFile.diff_data,
+                srt_stats: processedFile.srt_stats,
                 output_path: processedFile.output_path
               }
             }
@@ -195,7 +197,7 @@ export default function HomePage() {
         setIsProcessing(false)
       } else if (status.status === 'failed') {
         setIsProcessing(false)
-        alert('处理失败')
+        alert('处理失败' + (status.error ? ': ' + status.error : ''))
       } else {
         // 继续轮询
         setTimeout(() => pollProcessingStatus(tid), 1000)
@@ -272,6 +274,15 @@ export default function HomePage() {
               </p>
             </div>
 
+            {/* 排队位置：状态为 pending 即在排队，位置可能暂时未知（null） */}
+            {processingStatus?.status === 'pending' ? (
+              <p className="text-xs text-gray-500 text-center font-bold mb-2">
+                {processingStatus.queue_position
+                  ? `排队中，前面还有 ${processingStatus.queue_position - 1} 个任务`
+                  : '排队中...'}
+              </p>
+            ) : null}
+
             {/* 文件处理进度 */}
             {processingStatus?.processed_files !== undefined && (
               <p className="text-xs text-gray-500 text-center font-bold">
@@ -1,100 +1,193 @@
 'use client'
 
-import { FileText, Download, Copy, CheckCircle2, AlertCircle } from 'lucide-react'
-import { useState, useMemo } from 'react'
-import { diffChars } from 'diff'
+import { FileText, Download, Copy, CheckCircle2, AlertCircle, Loader2 } from 'lucide-react'
+import { Fragment, useState, useEffect, useCallback, useRef } from 'react'
+import { API_BASE } from '@/lib/config'
 
-interface DiffEntry {
+// 每页加载的字幕条数
+const PAGE_SIZE = 200
+
+// 编辑操作中引用的规则：修正规则或噪音模式
+type DiffRule = { source: string; target: string } | { noise: string }
+
+// 原文上的编辑操作 [起点, 终点, 替换文本, 规则编号]
+type EditOp = [number, number, string, number | null]
+
+// 修改过的字幕：原文 + 编辑操作
+interface ChangedEntry {
+  type: 'changed'
   index: number
   time: string
   original: string
-  modified: string
-  changed: boolean
+  ops: EditOp[]
 }
 
+// 连续未修改的字幕只返回引用区间
+interface UnchangedRun {
+  type: 'unchanged'
+  first: number
+  last: number
+  count: number
+}
+
+type DiffEntry = ChangedEntry | UnchangedRun
+
 interface DiffViewerProps {
   file: any
 }
 
-// 计算两个字符串的差异并返回高亮的 JSX（字符级别对比，适合中文）
-function renderDiff(original: string, modified: string) {
-  const changes = diffChars(original, modified)
+function describeRule(rule?: DiffRule) {
+  if (!rule) return '空白清理'
+  return 'noise' in rule ? `噪音: ${rule.noise}` : `${rule.source} → ${rule.target}`
+}
 
-  // 合并连续的相同类型变更，使显示更紧凑
-  const mergedChanges: Array<{ type: 'added' | 'removed' | 'unchanged'; value: string }> = []
+// 按编辑操作渲染原文与修改后文本的差异（side 指定只渲染某一侧）
+function renderOps(
+  entry: ChangedEntry,
+  rules: Record<string, DiffRule>,
+  side: 'both' | 'original' | 'modified' = 'both'
+) {
+  const parts: JSX.Element[] = []
+  let last = 0
 
-  for (const part of changes) {
-    const type = part.added ? 'added' : part.removed ? 'removed' : 'unchanged'
-    const last = mergedChanges[mergedChanges.length - 1]
+  entry.ops.forEach(([start, end, replacement, ruleId], index) => {
+    const title = describeRule(ruleId === null ? undefined : rules[ruleId])
 
-    if (last && last.type === type) {
-      last.value += part.value
-    } else {
-      mergedChanges.push({ type, value: part.value })
+    if (start > last) {
+      parts.push(<span key={`eq-${index}`}>{entry.original.slice(last, start)}</span>)
     }
-  }
+    if (end > start && side !== 'modified') {
+      parts.push(
+        <span
+          key={`del-${index}`}
+          title={title}
+          className="bg-red-200 text-red-700 line-through mx-0.5"
+        >
+          {entry.original.slice(start, end)}
+        </span>
+      )
+    }
+    if (replacement && side !== 'original') {
+      parts.push(
+        <span
+          key={`ins-${index}`}
+          title={title}
+          className="bg-green-300 text-green-900 font-black border-b-2 border-green-600 mx-0.5"
+        >
+          {replacement}
+        </span>
+      )
+    }
+    last = end
+  })
+  parts.push(<span key="eq-end">{entry.original.slice(last)}</span>)
 
+  return <span>{parts}</span>
+}
+
+// 未修改区间的折叠显示
+function renderUnchangedRun(run: UnchangedRun) {
   return (
-    <span>
-      {mergedChanges.map((part, index) => {
-        if (part.type === 'added') {
-          return (
-            <span
-              key={index}
-              className="bg-green-300 text-green-900 font-black border-b-2 border-green-600 mx-0.5"
-            >
-              {part.value}
-            </span>
-          )
-        }
-        if (part.type === 'removed') {
-          return (
-            <span
-              key={index}
-              className="bg-red-200 text-red-700 line-through mx-0.5"
-            >
-              {part.value}
-            </span>
-          )
-        }
-        return <span key={index}>{part.value}</span>
-      })}
-    </span>
+    <div className="border-2 border-dashed border-black p-3 bg-white text-sm font-bold text-gray-500">
+      {run.first === run.last ? `#${run.first}` : `#${run.first} – #${run.last}`}
+      {` · ${run.count} 条字幕未修改`}
+    </div>
   )
 }
 
 export function DiffViewer({ file }: DiffViewerProps) {
   const [copied, setCopied] = useState(false)
   const [viewMode, setViewMode] = useState<'inline' | 'side'>('inline')
+  const [changedOnly, setChangedOnly] = useState(false)
+  const [diffData, setDiffData] = useState<DiffEntry[]>([])
+  const [rules, setRules] = useState<Record<string, DiffRule>>({})
+  const [nextCursor, setNextCursor] = useState<number | null>(null)
+  const [isLoading, setIsLoading] = useState(false)
+  // 进行中的请求；切换筛选条件或文件时取消，过期的响应不会覆盖新数据
+  const requestRef = useRef<AbortController | null>(null)
+
+  // 差异数据按页从后端获取
+  const loadPage = useCallback(async (cursor: number, reset: boolean) => {
+    if (!file.task_id || !file.file_id) return
+
+    requestRef.current?.abort()
+    const request = new AbortController()
+    requestRef.current = request
+
+    setIsLoading(true)
+    try {
+      const params = new URLSearchParams({
+        cursor: String(cursor),
+        limit: String(PAGE_SIZE),
+        changed_only: String(changedOnly)
+      })
+      const res = await fetch(
+        `${API_BASE}/processing/result/${file.task_id}/files/${file.file_id}/diff?${params}`,
+        { signal: request.signal }
+      )
+      if (!res.ok) throw new Error('获取差异数据失败')
+
+      const page = await res.json()
+      if (request.signal.aborted) return
+      setDiffData(prev => (reset ? page.entries : [...prev, ...page.entries]))
+      setRules(prev => (reset ? page.rules : { ...prev, ...page.rules }))
+      setNextCursor(page.next_cursor)
+    } catch (error) {
+      if (!request.signal.aborted) console.error('获取差异数据失败:', error)
+    } finally {
+      if (requestRef.current === request) {
+        requestRef.current = null
+        setIsLoading(false)
+      }
+    }
+  }, [file.task_id, file.file_id, changedOnly])
 
-  // 使用实际的 diff_data
-  const diffData: DiffEntry[] = file.diff_data || []
+  useEffect(() => {
+    setDiffData([])
+    setRules({})
+    setNextCursor(null)
+    loadPage(0, true)
+    return () => requestRef.current?.abort()
+  }, [loadPage])
 
-  const handleCopy = () => {
-    const modifiedText = diffData
-      .map(d => `${d.index}\n${d.time}\n${d.modified}`)
-      .join('\n\n')
-    navigator.clipboard.writeText(modifiedText)
-    setCopied(true)
-    setTimeout(() => setCopied(false), 2000)
+  // 复制与下载使用后端保存的本任务的处理结果（同一文件之后再次处理不影响）
+  const fetchModifiedContent = async () => {
+    const res = await fetch(
+      `${API_BASE}/processing/result/${file.task_id}/files/${file.file_id}/download`
+    )
+    if (!res.ok) throw new Error('获取处理结果失败')
+    return res.text()
   }
 
-  const handleDownload = () => {
-    const content = diffData
-      .map(d => `${d.index}\n${d.time}\n${d.modified}\n`)
-      .join('\n')
-    const blob = new Blob([content], { type: 'text/plain;charset=utf-8' })
-    const url = URL.createObjectURL(blob)
-    const a = document.createElement('a')
-    a.href = url
-    a.download = file.name || 'subtitle.srt'
-    a.click()
-    URL.revokeObjectURL(url)
+  const handleCopy = async () => {
+    try {
+      navigator.clipboard.writeText(await fetchModifiedContent())
+      setCopied(true)
+      setTimeout(() => setCopied(false), 2000)
+    } catch (error) {
+      console.error('复制失败:', error)
+    }
   }
 
-  const changedCount = diffData.filter(d => d.changed).length
+  const handleDownload = async () => {
+    try {
+      const content = await fetchModifiedContent()
+      const blob = new Blob([content], { type: 'text/plain;charset=utf-8' })
+      const url = URL.createObjectURL(blob)
+      const a = document.createElement('a')
+      a.href = url
+      a.download = file.name || 'subtitle.srt'
+      a.click()
+      URL.revokeObjectURL(url)
+    } catch (error) {
+      console.error('下载失败:', error)
+    }
+  }
+
+  const changedCount = file.srt_stats?.modified_entries ?? 0
+  const totalCount = file.srt_stats?.total_entries ?? 0
 
-  if (diffData.length === 0) {
+  if (!file.task_id) {
     return (
       <div className="bg-white border-4 border-black p-6 h-full flex items-center justify-center shadow-brutal-lg">
         <div className="text-center">
@@ -119,12 +212,23 @@ export function DiffViewer({ file }: DiffViewerProps) {
                 {file.name}
               </h2>
               <p className="text-sm text-black font-bold mt-1">
-                {changedCount} / {diffData.length} 条字幕被修改
+                {changedCount} / {totalCount} 条字幕被修改
               </p>
             </div>
           </div>
         </div>
         <div className="flex items-center gap-2">
+          {/* 只显示修改过的字幕 */}
+          <button
+            onClick={() => setChangedOnly(prev => !prev)}
+            className={`px-3 py-2 border-4 border-black font-bold text-sm uppercase ${
+              changedOnly
+                ? 'bg-neo-secondary text-black'
+                : 'bg-white text-black hover:bg-neo-muted'
+            }`}
+          >
+            仅看修改
+          </button>
           {/* View Mode Toggle */}
           <div className="flex border-4 border-black">
             <button
@@ -179,42 +283,34 @@ export function DiffViewer({ file }: DiffViewerProps) {
         {viewMode === 'inline' ? (
           // Inline View - 直观显示差异
           <div className="space-y-4">
-            {diffData.map((entry, index) => (
-              <div
-                key={index}
-                className={`border-4 border-black p-4 ${
-                  entry.changed
-                    ? 'bg-yellow-50 border-l-8 border-l-neo-accent'
-                    : 'bg-white'
-                }`}
-              >
-                <div className="flex items-center justify-between mb-3">
-                  <div className="flex items-center gap-3">
-                    <span className="px-2 py-1 bg-black text-white font-black text-sm">
-                      #{entry.index}
-                    </span>
-                    <span className="text-xs font-bold text-gray-600 uppercase tracking-widest">
-                      {entry.time}
-                    </span>
-                  </div>
-                  {entry.changed && (
+            {diffData.map((entry, index) =>
+              entry.type === 'unchanged' ? (
+                <div key={index}>{renderUnchangedRun(entry)}</div>
+              ) : (
+                <div
+                  key={index}
+                  className="border-4 border-black p-4 bg-yellow-50 border-l-8 border-l-neo-accent"
+                >
+                  <div className="flex items-center justify-between mb-3">
+                    <div className="flex items-center gap-3">
+                      <span className="px-2 py-1 bg-black text-white font-black text-sm">
+                        #{entry.index}
+                      </span>
+                      <span className="text-xs font-bold text-gray-600 uppercase tracking-widest">
+                        {entry.time}
+                      </span>
+                    </div>
                     <span className="px-2 py-1 bg-neo-secondary border-2 border-black text-xs font-black uppercase">
                       已修改
                     </span>
-                  )}
-                </div>
+                  </div>
 
-                {entry.changed ? (
                   <div className="text-base leading-relaxed font-medium">
-                    {renderDiff(entry.original, entry.modified)}
+                    {renderOps(entry, rules)}
                   </div>
-                ) : (
-                  <div className="text-base leading-relaxed font-medium text-gray-600">
-                    {entry.original}
-                  </div>
-                )}
-              </div>
-            ))}
+                </div>
+              )
+            )}
           </div>
         ) : (
           // Side by Side View
@@ -233,32 +329,42 @@ export function DiffViewer({ file }: DiffViewerProps) {
               </h3>
             </div>
 
-            {diffData.map((entry, index) => (
-              <>
-                <div
-                  key={`orig-${index}`}
-                  className={`border-2 border-black p-3 ${
-                    entry.changed ? 'bg-red-50' : 'bg-white'
-                  }`}
-                >
-                  <div className="text-xs font-bold text-gray-500 mb-2">
-                    #{entry.index} | {entry.time}
-                  </div>
-                  <div className="text-sm font-medium">{entry.original}</div>
+            {diffData.map((entry, index) =>
+              entry.type === 'unchanged' ? (
+                <div key={index} className="col-span-2">
+                  {renderUnchangedRun(entry)}
                 </div>
-                <div
-                  key={`mod-${index}`}
-                  className={`border-2 border-black p-3 ${
-                    entry.changed ? 'bg-green-50' : 'bg-white'
-                  }`}
-                >
-                  <div className="text-xs font-bold text-gray-500 mb-2">
-                    #{entry.index} | {entry.time}
+              ) : (
+                <Fragment key={index}>
+                  <div className="border-2 border-black p-3 bg-red-50">
+                    <div className="text-xs font-bold text-gray-500 mb-2">
+                      #{entry.index} | {entry.time}
+                    </div>
+                    <div className="text-sm font-medium">{renderOps(entry, rules, 'original')}</div>
                   </div>
-                  <div className="text-sm font-medium">{entry.modified}</div>
-                </div>
-              </>
-            ))}
+                  <div className="border-2 border-black p-3 bg-green-50">
+                    <div className="text-xs font-bold text-gray-500 mb-2">
+                      #{entry.index} | {entry.time}
+                    </div>
+                    <div className="text-sm font-medium">{renderOps(entry, rules, 'modified')}</div>
+                  </div>
+                </Fragment>
+              )
+            )}
+          </div>
+        )}
+
+        {/* 加载更多 */}
+        {(nextCursor !== null || isLoading) && (
+          <div className="mt-4 flex justify-center">
+            <button
+              onClick={() => nextCursor !== null && loadPage(nextCursor, false)}
+              disabled={isLoading}
+              className="px-4 py-2 bg-white border-4 border-black text-black font-bold uppercase tracking-wide shadow-brutal hover:bg-neo-muted disabled:opacity-50 flex items-center gap-2 text-sm"
+            >
+              {isLoading && <Loader2 className="w-4 h-4 animate-spin" />}
+              <span>{isLoading ? '加载中...' : '加载更多'}</span>
+            </button>
           </div>
         )}
       </div>